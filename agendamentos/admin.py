@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Agendamento, FilaEspera
+from .models import Agendamento, FilaEspera, ResumoDiario, VagaLiberada
 
 @admin.register(Agendamento)
 class AgendamentoAdmin(admin.ModelAdmin):
@@ -15,3 +15,19 @@ class FilaEsperaAdmin(admin.ModelAdmin):
     list_filter = ["empresa", "servico", "notificado", "ativo", "data_desejada"]
     search_fields = ["cliente__nome", "servico__nome"]
     raw_id_fields = ["empresa", "cliente", "servico", "funcionario_preferido"]
+
+@admin.register(VagaLiberada)
+class VagaLiberadaAdmin(admin.ModelAdmin):
+    list_display = ["funcionario", "data_hora_inicio", "motivo", "status", "clientes_notificados", "data_preenchimento", "empresa"]
+    list_filter = ["status", "motivo", "empresa"]
+    search_fields = ["funcionario__nome"]
+    raw_id_fields = ["empresa", "funcionario", "servico", "agendamento", "agendamento_preenchimento"]
+    date_hierarchy = "data_hora_inicio"
+
+@admin.register(ResumoDiario)
+class ResumoDiarioAdmin(admin.ModelAdmin):
+    list_display = ["funcionario", "data", "confirmados", "concluidos", "cancelados", "nao_compareceu", "receita", "minutos_reservados", "empresa"]
+    list_filter = ["empresa", "funcionario"]
+    raw_id_fields = ["empresa", "funcionario"]
+    date_hierarchy = "data"
+    readonly_fields = ["data_atualizacao"]
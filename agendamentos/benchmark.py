@@ -0,0 +1,46 @@
+"""
+Utilitários de medição usados pelos comandos de benchmark
+(benchmark_indices, benchmark_agenda).
+"""
+import time
+from typing import Callable, Dict, List
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Comandos de controle de transação emitidos pelo próprio benchmark (atomic
+# aninhado, rollback), que não contam como consultas da operação medida
+_CONTROLE_TRANSACAO = ("BEGIN", "SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Retorna o percentil p (0-100) de uma lista de valores (método do posto mais próximo)."""
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def medir(funcao: Callable[[int], object], repeticoes: int) -> Dict[str, float]:
+    """
+    Executa funcao(i) para i em range(repeticoes), medindo tempo e consultas.
+
+    Returns:
+        Dicionário com "p50" e "p95" (ms), "consultas" (média) e "consultas_max"
+    """
+    tempos = []
+    consultas = []
+    for i in range(repeticoes):
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            funcao(i)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(sum(
+            1 for consulta in capturadas.captured_queries
+            if not consulta["sql"].startswith(_CONTROLE_TRANSACAO)
+        ))
+
+    return {
+        "p50": percentil(tempos, 50),
+        "p95": percentil(tempos, 95),
+        "consultas": sum(consultas) / len(consultas),
+        "consultas_max": max(consultas),
+    }
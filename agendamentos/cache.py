@@ -0,0 +1,223 @@
+"""
+Cache de disponibilidade por funcionário e dia.
+
+Cada dia de agenda de um funcionário possui uma versão, assim como os
+parâmetros de cada empresa. As entradas do cache incluem essas versões na
+chave: alterar um agendamento, uma disponibilidade ou os parâmetros da
+empresa gera uma nova versão e torna as entradas antigas inalcançáveis, sem
+precisar localizá-las. As versões são carimbos de tempo (time.time_ns) e
+portanto também indicam quando a agenda foi alterada pela última vez.
+
+As versões só são vistas por todos os processos (workers, importar_dados,
+processar_vagas) num cache compartilhado. Com um cache local ao processo
+(CACHE_COMPARTILHADO=False, o padrão com locmem) uma alteração feita em
+outro processo não invalidaria as entradas deste, e o cache fica desativado.
+"""
+import hashlib
+import time as relogio
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# Tempo máximo (segundos) que uma entrada permanece no cache. 0 desativa o cache.
+TTL_PADRAO = 600
+
+# Tempo máximo (segundos) que navegadores e proxies reutilizam uma resposta HTTP
+HTTP_MAX_AGE_PADRAO = 60
+
+Chave = Tuple[int, date]
+
+
+def cache_compartilhado() -> bool:
+    """Indica se o cache padrão é visto por todos os processos (ver CACHE_COMPARTILHADO)."""
+    return getattr(settings, "CACHE_COMPARTILHADO", False)
+
+
+def _get_ttl_maximo() -> int:
+    if not cache_compartilhado():
+        return 0
+    return getattr(settings, "DISPONIBILIDADE_CACHE_TTL", TTL_PADRAO)
+
+
+def _get_http_max_age() -> int:
+    return getattr(settings, "DISPONIBILIDADE_HTTP_MAX_AGE", HTTP_MAX_AGE_PADRAO)
+
+
+def _chave_versao_dia(funcionario_id: int, dia: date) -> str:
+    return f"disp:v:f{funcionario_id}:{dia.isoformat()}"
+
+
+def _chave_versao_empresa(empresa_id: int) -> str:
+    return f"disp:v:e{empresa_id}"
+
+
+def invalidar_dia(funcionario_id: int, dia: date) -> None:
+    """Gera uma nova versão para a agenda do funcionário no dia."""
+    cache.set(_chave_versao_dia(funcionario_id, dia), relogio.time_ns(), None)
+
+
+def invalidar_empresa(empresa_id: int) -> None:
+    """Gera uma nova versão para todas as agendas da empresa."""
+    cache.set(_chave_versao_empresa(empresa_id), relogio.time_ns(), None)
+
+
+def get_versoes(chaves: Iterable[str]) -> Dict[str, int]:
+    """
+    Obtém as versões atuais, criando as que ainda não existem.
+
+    As versões ausentes são criadas com add(), de modo que processos
+    concorrentes acabam usando o mesmo valor.
+    """
+    chaves = list(chaves)
+    versoes = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in versoes:
+            agora = relogio.time_ns()
+            if not cache.add(chave, agora, None):
+                agora = cache.get(chave, agora)
+            versoes[chave] = agora
+    return versoes
+
+
+class CacheDisponibilidade:
+    """
+    Cache dos horários disponíveis de um serviço, por funcionário e dia.
+
+    As versões lidas em obter() são as usadas em salvar(), de modo que um
+    resultado calculado enquanto a agenda era alterada nunca é gravado sob
+    a versão nova.
+    """
+
+    def __init__(self, empresa_id: int, servico_id: int, antecedencia_minima: int):
+        self.empresa_id = empresa_id
+        self.servico_id = servico_id
+        self.antecedencia_minima = antecedencia_minima
+        self.ttl_maximo = _get_ttl_maximo()
+        self._chaves: Dict[Chave, str] = {}
+
+    @property
+    def ativo(self) -> bool:
+        return self.ttl_maximo > 0
+
+    def obter(self, funcionario_ids: Iterable[int], dias: Iterable[date]) -> Dict[Chave, List[datetime]]:
+        """
+        Busca os horários em cache para cada (funcionário, dia).
+
+        Returns:
+            Dicionário {(funcionario_id, dia): horários} apenas com as entradas encontradas
+        """
+        if not self.ativo:
+            return {}
+
+        pares = [(funcionario_id, dia) for funcionario_id in funcionario_ids for dia in dias]
+        chave_empresa = _chave_versao_empresa(self.empresa_id)
+        versoes = get_versoes(
+            [chave_empresa] + [_chave_versao_dia(funcionario_id, dia) for funcionario_id, dia in pares]
+        )
+
+        self._chaves = {
+            (funcionario_id, dia): (
+                f"disp:e{self.empresa_id}:{versoes[chave_empresa]}:s{self.servico_id}"
+                f":f{funcionario_id}:{dia.isoformat()}:{versoes[_chave_versao_dia(funcionario_id, dia)]}"
+            )
+            for funcionario_id, dia in pares
+        }
+        encontrados = cache.get_many(self._chaves.values())
+        return {
+            par: encontrados[chave]
+            for par, chave in self._chaves.items()
+            if chave in encontrados
+        }
+
+    def salvar(self, horarios: Dict[Chave, List[datetime]]) -> None:
+        """
+        Grava os horários calculados para pares previamente consultados em obter().
+
+        Cada entrada expira quando o primeiro horário deixa de respeitar a
+        antecedência mínima, limitado ao TTL máximo configurado.
+        """
+        if not self.ativo:
+            return
+
+        agora = timezone.now()
+        antecedencia = timedelta(minutes=self.antecedencia_minima)
+        for par, lista in horarios.items():
+            chave = self._chaves.get(par)
+            if chave is None:
+                continue
+            ttl = self.ttl_maximo
+            if lista:
+                ttl = min(ttl, int((min(lista) - antecedencia - agora).total_seconds()))
+            if ttl > 0:
+                cache.set(chave, lista, ttl)
+
+
+class ValidadorHttp(NamedTuple):
+    """Cabeçalhos de cache HTTP de uma consulta de disponibilidade."""
+    etag: str
+    ultima_alteracao: datetime
+    # Segundos em que a resposta pode ser reutilizada sem revalidação
+    max_age: int
+
+
+def get_validador_http(
+    empresa_id: int,
+    funcionario_id: int,
+    dias: List[date],
+    antecedencia_minima: int,
+    identificacao: Iterable = ()
+) -> ValidadorHttp:
+    """
+    Calcula ETag, Last-Modified e validade da resposta de disponibilidade de
+    um funcionário nos dias, apenas com as versões em cache, sem calcular os
+    horários.
+
+    Além das versões, a resposta depende do corte da antecedência mínima
+    (agora + antecedência): horários anteriores a ele não são oferecidos.
+    Como os horários começam em minutos inteiros, a resposta só muda quando
+    o corte, arredondado para cima ao minuto, muda de valor dentro do
+    período; antes do período o corte não afeta nenhum dia e depois dele
+    todos os dias estão vazios. A validade termina na próxima mudança do
+    corte, limitada a DISPONIBILIDADE_HTTP_MAX_AGE.
+
+    Args:
+        identificacao: Demais valores que compõem a resposta (ids, nomes),
+            incluídos no ETag
+    """
+    agora = timezone.now()
+    antecedencia = timedelta(minutes=antecedencia_minima)
+    limite = timezone.localtime(agora + antecedencia)
+    primeiro, ultimo = min(dias), max(dias)
+
+    chaves = [_chave_versao_empresa(empresa_id)] + [_chave_versao_dia(funcionario_id, dia) for dia in dias]
+    versoes = get_versoes(chaves)
+    ultima_alteracao = datetime.fromtimestamp(max(versoes.values()) / 1e9, tz=dt_timezone.utc)
+
+    max_age = _get_http_max_age()
+    if limite.date() < primeiro:
+        corte = "futuro"
+        # O corte entra no período à meia-noite do primeiro dia
+        mudanca = timezone.make_aware(datetime.combine(primeiro, time.min)) - antecedencia
+    elif limite.date() > ultimo:
+        corte = "passado"
+        mudanca = None
+        ultima_alteracao = max(
+            ultima_alteracao,
+            timezone.make_aware(datetime.combine(ultimo + timedelta(days=1), time.min)) - antecedencia
+        )
+    else:
+        minuto = limite.replace(second=0, microsecond=0)
+        if minuto < limite:
+            minuto += timedelta(minutes=1)
+        corte = minuto.isoformat()
+        mudanca = minuto - antecedencia
+        ultima_alteracao = max(ultima_alteracao, mudanca - timedelta(minutes=1))
+    if mudanca is not None:
+        max_age = min(max_age, int((mudanca - agora).total_seconds()))
+
+    conteudo = [versoes[chave] for chave in chaves] + [corte] + list(identificacao)
+    etag = hashlib.sha1(repr(conteudo).encode()).hexdigest()
+    return ValidadorHttp(etag, ultima_alteracao, max(max_age, 0))
@@ -0,0 +1,154 @@
+"""
+Catálogo de cada empresa: parâmetros de funcionamento, a matriz de preço e
+duração efetivos de cada par funcionário x serviço e as regras semanais de
+disponibilidade dos funcionários.
+
+São dados que mudam poucas vezes por mês e são lidos em toda consulta de
+disponibilidade e em todo agendamento. O catálogo é guardado em dois níveis,
+na memória do processo e no cache compartilhado, sob uma versão por empresa.
+Os sinais geram uma nova versão quando um dos dados acima é alterado, de
+modo que cada leitura custa apenas a consulta da versão no cache. Num cache
+local ao processo (ver CACHE_COMPARTILHADO) as novas versões geradas por
+outros processos não chegam a este, e o catálogo é lido do banco a cada uso.
+"""
+import time as relogio
+from decimal import Decimal
+from collections import defaultdict
+from datetime import date, time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.core.cache import cache
+
+from core.models import ParametrosEmpresa
+from funcionarios.models import RegraDisponibilidade
+from servicos.models import FuncionarioServico
+from .cache import cache_compartilhado, get_versoes
+
+# O catálogo só muda por invalidação; a expiração apenas libera memória do cache
+TTL_CATALOGO = 24 * 60 * 60
+
+NOMES_DIAS = ("seg", "ter", "qua", "qui", "sex", "sab", "dom")
+
+
+class Vinculo(NamedTuple):
+    """Duração (minutos) e preço efetivos de um serviço para um funcionário."""
+    duracao: int
+    preco: Decimal
+
+
+class RegraSemanal(NamedTuple):
+    """Período de uma regra semanal de disponibilidade (mesmos atributos de DisponibilidadeFuncionario)."""
+    horario_inicio: time
+    horario_fim: time
+    tipo: str
+    valido_de: Optional[date]
+    valido_ate: Optional[date]
+
+
+class Catalogo:
+    """Parâmetros da empresa e vínculos funcionário-serviço, já processados."""
+
+    def __init__(
+        self,
+        parametros: ParametrosEmpresa,
+        vinculos: Dict[Tuple[int, int], Vinculo],
+        regras: Optional[Dict[Tuple[int, int], List[RegraSemanal]]] = None
+    ):
+        self.empresa_id = parametros.empresa_id
+        self.horario_abertura = parametros.horario_abertura
+        self.horario_fechamento = parametros.horario_fechamento
+        self.intervalo_agendamento = parametros.intervalo_agendamento
+        self.antecedencia_minima = parametros.antecedencia_minima
+        self.antecedencia_cancelamento = parametros.antecedencia_cancelamento
+        self.dias_funcionamento = frozenset(parametros.get_dias_funcionamento_list())
+        self.dias_semana = frozenset(
+            indice for indice, nome in enumerate(NOMES_DIAS) if nome in self.dias_funcionamento
+        )
+        self.vinculos = vinculos
+        # {(funcionario_id, dia da semana): regras ordenadas por horário}
+        self.regras = regras or {}
+
+    def funciona_em(self, data: date) -> bool:
+        """Verifica se a empresa funciona no dia da semana da data."""
+        return data.weekday() in self.dias_semana
+
+    def get_vinculo(self, funcionario_id: int, servico_id: int) -> Optional[Vinculo]:
+        """Retorna duração e preço do serviço para o funcionário, ou None se ele não o oferece."""
+        return self.vinculos.get((funcionario_id, servico_id))
+
+    def get_regras(self, funcionario_id: int, data: date) -> List[RegraSemanal]:
+        """Retorna as regras semanais do funcionário válidas na data, ordenadas por horário."""
+        return [
+            regra for regra in self.regras.get((funcionario_id, data.weekday()), ())
+            if (regra.valido_de is None or regra.valido_de <= data)
+            and (regra.valido_ate is None or data <= regra.valido_ate)
+        ]
+
+
+# Catálogos já carregados neste processo: {empresa_id: (versão, catálogo)}
+_catalogos: Dict[int, Tuple[int, Catalogo]] = {}
+
+
+def _chave_versao(empresa_id: int) -> str:
+    return f"catalogo:v:e{empresa_id}"
+
+
+def carregar_catalogo(empresa_id: int) -> Catalogo:
+    """
+    Monta o catálogo a partir do banco (três consultas).
+
+    Raises:
+        ParametrosEmpresa.DoesNotExist: se a empresa não possui parâmetros
+    """
+    parametros = ParametrosEmpresa.objects.get(empresa_id=empresa_id)
+    vinculos = {
+        (funcionario_id, servico_id): Vinculo(
+            duracao_especifica or duracao,
+            preco_especifico if preco_especifico else preco
+        )
+        for funcionario_id, servico_id, duracao_especifica, preco_especifico, duracao, preco
+        in FuncionarioServico.objects.filter(servico__empresa_id=empresa_id).values_list(
+            "funcionario_id", "servico_id", "duracao_especifica", "preco_especifico",
+            "servico__duracao", "servico__preco"
+        )
+    }
+    regras = defaultdict(list)
+    for regra in RegraDisponibilidade.objects.filter(
+        funcionario__empresa_id=empresa_id
+    ).order_by("horario_inicio"):
+        regras[(regra.funcionario_id, regra.dia_semana)].append(RegraSemanal(
+            regra.horario_inicio, regra.horario_fim, regra.tipo, regra.valido_de, regra.valido_ate
+        ))
+    return Catalogo(parametros, vinculos, dict(regras))
+
+
+def get_catalogo(empresa_id: int) -> Catalogo:
+    """
+    Retorna o catálogo atual da empresa: da memória do processo, do cache
+    compartilhado ou, na falta de ambos, do banco.
+
+    Raises:
+        ParametrosEmpresa.DoesNotExist: se a empresa não possui parâmetros
+    """
+    if not cache_compartilhado():
+        return carregar_catalogo(empresa_id)
+
+    chave_versao = _chave_versao(empresa_id)
+    versao = get_versoes([chave_versao])[chave_versao]
+
+    local = _catalogos.get(empresa_id)
+    if local is not None and local[0] == versao:
+        return local[1]
+
+    chave = f"catalogo:e{empresa_id}:{versao}"
+    catalogo = cache.get(chave)
+    if catalogo is None:
+        catalogo = carregar_catalogo(empresa_id)
+        cache.set(chave, catalogo, TTL_CATALOGO)
+    _catalogos[empresa_id] = (versao, catalogo)
+    return catalogo
+
+
+def invalidar_catalogo(empresa_id: int) -> None:
+    """Gera uma nova versão do catálogo da empresa."""
+    cache.set(_chave_versao(empresa_id), relogio.time_ns(), None)
@@ -0,0 +1,89 @@
+"""
+Exportação de agendamentos para relatórios (contabilidade), em CSV ou NDJSON.
+
+As linhas são lidas com values_list (nomes de empresa, funcionário, cliente e
+serviço por JOIN, sem instanciar modelos) e .iterator(chunk_size), e escritas
+uma a uma por um gerador. Tanto a view (StreamingHttpResponse) quanto o
+comando `manage.py exportar_agendamentos` usam memória constante,
+independente do tamanho do período exportado.
+"""
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+from django.utils import timezone
+
+from .models import Agendamento
+
+# Linhas lidas do banco por vez
+TAMANHO_LOTE = 2000
+
+# (nome da coluna, campo em values_list)
+COLUNAS = [
+    ("id", "id"),
+    ("empresa", "empresa__nome"),
+    ("empresa_cnpj", "empresa__cnpj"),
+    ("funcionario", "funcionario__nome"),
+    ("cliente", "cliente__nome"),
+    ("cliente_email", "cliente__email"),
+    ("servico", "servico__nome"),
+    ("data_hora_inicio", "data_hora_inicio"),
+    ("data_hora_fim", "data_hora_fim"),
+    ("status", "status"),
+    ("preco_cobrado", "preco_cobrado"),
+]
+
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def consultar(data_inicio: date, data_fim: date, empresa_id: Optional[int] = None):
+    """
+    Retorna as linhas dos agendamentos iniciados no período (datas inclusive),
+    na ordem de empresa e horário, como tuplas na ordem de COLUNAS.
+    """
+    inicio = timezone.make_aware(datetime.combine(data_inicio, time.min))
+    fim = timezone.make_aware(datetime.combine(data_fim + timedelta(days=1), time.min))
+    agendamentos = Agendamento.objects.filter(data_hora_inicio__gte=inicio, data_hora_inicio__lt=fim)
+    if empresa_id is not None:
+        agendamentos = agendamentos.filter(empresa_id=empresa_id)
+    return agendamentos.order_by("empresa_id", "data_hora_inicio", "id").values_list(
+        *(campo for _, campo in COLUNAS)
+    )
+
+
+def _formatar(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat()
+    return valor if valor is None or isinstance(valor, (int, str)) else str(valor)
+
+
+class _Eco:
+    """Arquivo que devolve o que recebe, para o csv.writer escrever em um gerador."""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(linhas) -> Iterator[str]:
+    """Gera o cabeçalho e uma linha CSV por agendamento."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([nome for nome, _ in COLUNAS])
+    for linha in linhas.iterator(chunk_size=TAMANHO_LOTE):
+        yield escritor.writerow([_formatar(valor) for valor in linha])
+
+
+def gerar_ndjson(linhas) -> Iterator[str]:
+    """Gera um objeto JSON por linha para cada agendamento."""
+    nomes = [nome for nome, _ in COLUNAS]
+    for linha in linhas.iterator(chunk_size=TAMANHO_LOTE):
+        yield json.dumps(dict(zip(nomes, map(_formatar, linha))), ensure_ascii=False) + "\n"
+
+
+def exportar(formato: str, data_inicio: date, data_fim: date, empresa_id: Optional[int] = None) -> Iterator[str]:
+    """Gera a exportação do período no formato ("csv" ou "ndjson")."""
+    linhas = consultar(data_inicio, data_fim, empresa_id)
+    return gerar_csv(linhas) if formato == "csv" else gerar_ndjson(linhas)
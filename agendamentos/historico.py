@@ -0,0 +1,87 @@
+"""
+Histórico de agendamentos de um cliente, paginado por cursor (keyset).
+
+Os agendamentos são ordenados do mais recente para o mais antigo por
+(data_hora_inicio, id). Cada página é lida a partir da posição do último
+agendamento da página anterior, guardada no cursor, em vez de OFFSET: a
+consulta percorre o índice agendamento_cli_inicio_idx (cliente,
+data_hora_inicio, id) a partir do cursor e lê apenas as linhas da página,
+de modo que o custo é o mesmo na primeira página ou na centésima, para um
+cliente com 5 ou 5.000 agendamentos.
+"""
+import binascii
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Agendamento
+
+TAMANHO_PAGINA = 20
+TAMANHO_MAXIMO = 100
+
+
+class CursorInvalido(ValueError):
+    """Cursor de paginação malformado."""
+
+
+class PaginaHistorico(NamedTuple):
+    agendamentos: List[Agendamento]
+    # Cursor da página seguinte (mais antiga), ou None na última página
+    proximo_cursor: Optional[str]
+
+
+def codificar_cursor(agendamento: Agendamento) -> str:
+    """Cursor opaco com a posição (data_hora_inicio, id) do agendamento."""
+    return urlsafe_base64_encode(f"{agendamento.data_hora_inicio.isoformat()}|{agendamento.id}".encode())
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        inicio, agendamento_id = force_str(urlsafe_base64_decode(cursor)).split("|")
+        inicio = parse_datetime(inicio)
+        agendamento_id = int(agendamento_id)
+    except (ValueError, TypeError, UnicodeDecodeError, binascii.Error):
+        raise CursorInvalido("Cursor inválido")
+    if inicio is None:
+        raise CursorInvalido("Cursor inválido")
+    return inicio, agendamento_id
+
+
+def pagina_historico(
+    cliente_id: int,
+    cursor: Optional[str] = None,
+    tamanho: int = TAMANHO_PAGINA
+) -> PaginaHistorico:
+    """
+    Retorna uma página do histórico do cliente, do mais recente para o mais
+    antigo, com serviço, funcionário e empresa carregados por JOIN.
+
+    Args:
+        cursor: proximo_cursor da página anterior; None para a primeira página
+        tamanho: agendamentos por página (limitado a TAMANHO_MAXIMO)
+
+    Raises:
+        CursorInvalido: se o cursor não foi gerado por esta função
+    """
+    tamanho = max(1, min(tamanho, TAMANHO_MAXIMO))
+    agendamentos = Agendamento.objects.filter(cliente_id=cliente_id)
+    if cursor:
+        inicio, agendamento_id = decodificar_cursor(cursor)
+        # O limite data_hora_inicio <= inicio permite ao SQLite posicionar a
+        # leitura do índice no cursor; o OR desempata agendamentos no mesmo horário
+        agendamentos = agendamentos.filter(
+            Q(data_hora_inicio__lt=inicio) | Q(data_hora_inicio=inicio, id__lt=agendamento_id),
+            data_hora_inicio__lte=inicio
+        )
+    # Um agendamento a mais indica se há outra página
+    linhas = list(
+        agendamentos
+        .select_related("servico", "funcionario", "empresa")
+        .order_by("-data_hora_inicio", "-id")[:tamanho + 1]
+    )
+    proximo_cursor = codificar_cursor(linhas[tamanho - 1]) if len(linhas) > tamanho else None
+    return PaginaHistorico(linhas[:tamanho], proximo_cursor)
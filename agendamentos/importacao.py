@@ -0,0 +1,434 @@
+"""
+Importação em massa de clientes, agendamentos e disponibilidades (migração de
+outro sistema), usada pelo comando `manage.py importar_dados`.
+
+O arquivo (CSV com cabeçalho ou JSONL, um objeto por linha) é lido como fluxo
+e processado em lotes: as chaves estrangeiras são resolvidas por mapas em
+memória (funcionários, serviços e catálogo da empresa, carregados uma vez;
+clientes, por lote), cada lote é validado de uma vez e gravado com um único
+bulk_create dentro de uma transação. Model.save() não é usado: ele valida
+datas no passado e consulta o catálogo linha a linha.
+
+Como bulk_create não dispara sinais, o resumo diário dos agendamentos é
+atualizado na transação de cada lote e o cache de disponibilidade da empresa
+é invalidado ao final de cada lote gravado.
+"""
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+from clientes.models import Cliente
+from clientes.services import normalizar_email, normalizar_telefone
+from core.models import Empresa
+from funcionarios.models import DisponibilidadeFuncionario, Funcionario
+from servicos.models import Servico
+from . import cache as cache_disponibilidade
+from . import resumos
+from .catalogo import get_catalogo
+from .models import Agendamento
+from .signals import _dias_agendamento
+
+# (número da linha no arquivo, registro)
+Registro = Tuple[int, Dict[str, str]]
+
+
+class ErroImportacao(ValueError):
+    """Registro rejeitado na validação."""
+
+
+def _emails_do_lote(registros: List[Dict], campo: str) -> set:
+    """E-mails de clientes do lote, normalizados, para a busca com email__in."""
+    emails = {normalizar_email(str(registro.get(campo) or "")) for registro in registros}
+    emails.discard("")
+    return emails
+
+
+def ler_registros(arquivo, formato: str) -> Iterator[Registro]:
+    """
+    Lê o arquivo como fluxo, um registro por vez.
+
+    Linhas JSONL inválidas geram o registro {"_erro": mensagem}, que é
+    rejeitado na validação sem interromper a leitura.
+    """
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo)
+        for registro in leitor:
+            yield leitor.line_num, registro
+        return
+
+    for numero, linha in enumerate(arquivo, start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as e:
+            registro = {"_erro": f"JSON inválido: {e}"}
+        if not isinstance(registro, dict):
+            registro = {"_erro": "Cada linha deve conter um objeto JSON"}
+        yield numero, registro
+
+
+def em_lotes(registros: Iterable[Registro], tamanho: int) -> Iterator[List[Registro]]:
+    """Agrupa os registros em listas de até `tamanho` itens."""
+    registros = iter(registros)
+    while True:
+        lote = list(islice(registros, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def _texto(registro: Dict, campo: str, obrigatorio: bool = True) -> str:
+    valor = registro.get(campo)
+    valor = "" if valor is None else str(valor).strip()
+    if obrigatorio and not valor:
+        raise ErroImportacao(f"Campo obrigatório ausente: {campo}")
+    return valor
+
+
+def _data(registro: Dict, campo: str, obrigatorio: bool = True) -> Optional[date]:
+    valor = _texto(registro, campo, obrigatorio)
+    if not valor:
+        return None
+    try:
+        data = parse_date(valor)
+    except ValueError:
+        data = None
+    if data is None:
+        raise ErroImportacao(f"Data inválida em {campo}: {valor}")
+    return data
+
+
+def _horario(registro: Dict, campo: str) -> time:
+    valor = _texto(registro, campo)
+    try:
+        horario = parse_time(valor)
+    except ValueError:
+        horario = None
+    if horario is None:
+        raise ErroImportacao(f"Horário inválido em {campo}: {valor}")
+    return horario
+
+
+def _data_hora(registro: Dict, campo: str, obrigatorio: bool = True) -> Optional[datetime]:
+    valor = _texto(registro, campo, obrigatorio)
+    if not valor:
+        return None
+    try:
+        data_hora = parse_datetime(valor)
+    except ValueError:
+        data_hora = None
+    if data_hora is None:
+        raise ErroImportacao(f"Data e hora inválidas em {campo}: {valor}")
+    # Horários sem fuso são do fuso da aplicação
+    return timezone.make_aware(data_hora) if timezone.is_naive(data_hora) else data_hora
+
+
+def _decimal(registro: Dict, campo: str) -> Optional[Decimal]:
+    valor = _texto(registro, campo, obrigatorio=False).replace(",", ".")
+    if not valor:
+        return None
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise ErroImportacao(f"Valor inválido em {campo}: {valor}")
+
+
+def _escolha(registro: Dict, campo: str, escolhas, padrao: str) -> str:
+    valor = _texto(registro, campo, obrigatorio=False) or padrao
+    if valor not in dict(escolhas):
+        raise ErroImportacao(f"Valor inválido em {campo}: {valor}")
+    return valor
+
+
+class Importador:
+    """
+    Importador de um tipo de registro.
+
+    As subclasses definem o modelo e o método converter(), que valida um
+    registro e devolve a instância a gravar (ou levanta ErroImportacao).
+    preparar_lote() pode ser estendido para carregar, com uma consulta por
+    lote, os dados necessários à conversão.
+    """
+    modelo = None
+
+    def __init__(self, empresa: Optional[Empresa] = None):
+        self.empresa = empresa
+
+    def preparar_lote(self, registros: List[Dict]) -> None:
+        """Carrega os dados que a conversão do lote precisa."""
+
+    def converter(self, registro: Dict):
+        raise NotImplementedError
+
+    def validar_lote(self, lote: List[Registro]) -> Tuple[list, List[Tuple[int, Dict, str]]]:
+        """
+        Converte e valida o lote.
+
+        Returns:
+            Tupla (instâncias válidas, rejeitados), com rejeitados no formato
+            (linha, registro, erro)
+        """
+        self.preparar_lote([registro for _, registro in lote])
+        objetos, rejeitados = [], []
+        for linha, registro in lote:
+            try:
+                if "_erro" in registro:
+                    raise ErroImportacao(registro["_erro"])
+                objetos.append(self.converter(registro))
+            except ErroImportacao as e:
+                rejeitados.append((linha, registro, str(e)))
+        return objetos, rejeitados
+
+    def gravar(self, objetos: list) -> int:
+        """Grava as instâncias com um único bulk_create e retorna quantas foram gravadas."""
+        self.modelo.objects.bulk_create(objetos)
+        return len(objetos)
+
+    def apos_gravar(self, objetos: list) -> None:
+        """Executado após o commit de cada lote gravado."""
+
+
+class ImportadorClientes(Importador):
+    """Campos: nome, email, telefone, data_nascimento, endereco, observacoes."""
+    modelo = Cliente
+
+    def __init__(self, empresa: Optional[Empresa] = None):
+        super().__init__(empresa)
+        # E-mails já vistos neste arquivo, para rejeitar duplicados entre lotes
+        self.emails_arquivo = set()
+
+    def preparar_lote(self, registros):
+        self.emails_cadastrados = set(
+            Cliente.objects.filter(
+                email__in=_emails_do_lote(registros, "email")
+            ).values_list("email", flat=True)
+        )
+
+    def converter(self, registro):
+        email = normalizar_email(_texto(registro, "email"))
+        if "@" not in email:
+            raise ErroImportacao(f"E-mail inválido: {email}")
+        if email in self.emails_cadastrados or email in self.emails_arquivo:
+            raise ErroImportacao(f"E-mail já cadastrado: {email}")
+        cliente = Cliente(
+            nome=_texto(registro, "nome"),
+            email=email,
+            telefone=normalizar_telefone(_texto(registro, "telefone", obrigatorio=False)),
+            data_nascimento=_data(registro, "data_nascimento", obrigatorio=False),
+            endereco=_texto(registro, "endereco", obrigatorio=False),
+            observacoes=_texto(registro, "observacoes", obrigatorio=False)
+        )
+        self.emails_arquivo.add(email)
+        return cliente
+
+
+class ImportadorFuncionarioMixin:
+    """Resolve o funcionário da empresa pelo e-mail (campo funcionario_email)."""
+
+    def carregar_funcionarios(self):
+        self.funcionarios = {
+            email.lower(): funcionario_id
+            for funcionario_id, email in Funcionario.objects.filter(
+                empresa=self.empresa
+            ).values_list("id", "email")
+        }
+
+    def get_funcionario_id(self, registro) -> int:
+        email = _texto(registro, "funcionario_email").lower()
+        try:
+            return self.funcionarios[email]
+        except KeyError:
+            raise ErroImportacao(f"Funcionário não encontrado na empresa: {email}")
+
+
+class ImportadorAgendamentos(ImportadorFuncionarioMixin, Importador):
+    """
+    Campos: cliente_email, funcionario_email, servico (nome), data_hora_inicio,
+    data_hora_fim, status, preco_cobrado, observacoes.
+
+    Sem data_hora_fim ou preco_cobrado, usa a duração e o preço do serviço
+    para o funcionário. Status padrão: "concluido" para horários passados e
+    "confirmado" para futuros.
+    """
+    modelo = Agendamento
+
+    def __init__(self, empresa: Empresa):
+        super().__init__(empresa)
+        self.carregar_funcionarios()
+        self.servicos = {
+            nome.lower(): servico_id
+            for servico_id, nome in Servico.objects.filter(empresa=empresa).values_list("id", "nome")
+        }
+        self.catalogo = get_catalogo(empresa.pk)
+        self.agora = timezone.now()
+
+    def preparar_lote(self, registros):
+        self.clientes = {
+            email: cliente_id
+            for cliente_id, email in Cliente.objects.filter(
+                email__in=_emails_do_lote(registros, "cliente_email")
+            ).values_list("id", "email")
+        }
+
+    def converter(self, registro):
+        email = normalizar_email(_texto(registro, "cliente_email"))
+        cliente_id = self.clientes.get(email)
+        if cliente_id is None:
+            raise ErroImportacao(f"Cliente não encontrado: {email}")
+        funcionario_id = self.get_funcionario_id(registro)
+        nome_servico = _texto(registro, "servico")
+        servico_id = self.servicos.get(nome_servico.lower())
+        if servico_id is None:
+            raise ErroImportacao(f"Serviço não encontrado na empresa: {nome_servico}")
+        vinculo = self.catalogo.get_vinculo(funcionario_id, servico_id)
+        if vinculo is None:
+            raise ErroImportacao(f"O funcionário não oferece o serviço {nome_servico}")
+
+        inicio = _data_hora(registro, "data_hora_inicio")
+        fim = _data_hora(registro, "data_hora_fim", obrigatorio=False)
+        if fim is None:
+            fim = inicio + timedelta(minutes=vinculo.duracao)
+        if inicio >= fim:
+            raise ErroImportacao("Data/hora de início deve ser anterior à data/hora de fim.")
+        preco = _decimal(registro, "preco_cobrado")
+
+        return Agendamento(
+            empresa=self.empresa,
+            cliente_id=cliente_id,
+            funcionario_id=funcionario_id,
+            servico_id=servico_id,
+            data_hora_inicio=inicio,
+            data_hora_fim=fim,
+            status=_escolha(
+                registro, "status", Agendamento.STATUS_CHOICES,
+                "concluido" if inicio < self.agora else "confirmado"
+            ),
+            preco_cobrado=vinculo.preco if preco is None else preco,
+            observacoes=_texto(registro, "observacoes", obrigatorio=False)
+        )
+
+    def gravar(self, objetos):
+        gravadas = super().gravar(objetos)
+        resumos.aplicar(depois=[resumos.contribuicao(agendamento) for agendamento in objetos])
+        return gravadas
+
+    def apos_gravar(self, objetos):
+        # Todos os dias ocupados, inclusive o seguinte nos que atravessam a meia-noite
+        dias = {dia for agendamento in objetos for dia in _dias_agendamento(agendamento)}
+        for funcionario_id, dia in dias:
+            cache_disponibilidade.invalidar_dia(funcionario_id, dia)
+
+
+class ImportadorDisponibilidades(ImportadorFuncionarioMixin, Importador):
+    """Campos: funcionario_email, data, horario_inicio, horario_fim, tipo, observacao."""
+    modelo = DisponibilidadeFuncionario
+
+    def __init__(self, empresa: Empresa):
+        super().__init__(empresa)
+        self.carregar_funcionarios()
+        # Períodos já vistos neste arquivo (restrição única do modelo)
+        self.chaves_arquivo = set()
+
+    def preparar_lote(self, registros):
+        datas = set()
+        for registro in registros:
+            try:
+                datas.add(_data(registro, "data"))
+            except ErroImportacao:
+                pass
+        self.chaves_cadastradas = set(
+            DisponibilidadeFuncionario.objects.filter(
+                funcionario__empresa=self.empresa, data__in=datas
+            ).values_list("funcionario_id", "data", "horario_inicio", "horario_fim")
+        )
+
+    def converter(self, registro):
+        disponibilidade = DisponibilidadeFuncionario(
+            funcionario_id=self.get_funcionario_id(registro),
+            data=_data(registro, "data"),
+            horario_inicio=_horario(registro, "horario_inicio"),
+            horario_fim=_horario(registro, "horario_fim"),
+            tipo=_escolha(registro, "tipo", DisponibilidadeFuncionario.TIPO_CHOICES, "trabalho"),
+            observacao=_texto(registro, "observacao", obrigatorio=False)
+        )
+        if disponibilidade.horario_inicio >= disponibilidade.horario_fim:
+            raise ErroImportacao("Horário de início deve ser anterior ao horário de fim.")
+        chave = (
+            disponibilidade.funcionario_id, disponibilidade.data,
+            disponibilidade.horario_inicio, disponibilidade.horario_fim
+        )
+        if chave in self.chaves_cadastradas or chave in self.chaves_arquivo:
+            raise ErroImportacao("Período já cadastrado para o funcionário na data")
+        self.chaves_arquivo.add(chave)
+        return disponibilidade
+
+    def apos_gravar(self, objetos):
+        for disponibilidade in objetos:
+            cache_disponibilidade.invalidar_dia(disponibilidade.funcionario_id, disponibilidade.data)
+
+
+IMPORTADORES = {
+    "clientes": ImportadorClientes,
+    "agendamentos": ImportadorAgendamentos,
+    "disponibilidades": ImportadorDisponibilidades,
+}
+
+
+def importar(
+    importador: Importador,
+    registros: Iterable[Registro],
+    tamanho_lote: int = 2000,
+    simular: bool = False,
+    ao_rejeitar=None,
+    ao_gravar_lote=None
+) -> Dict[str, int]:
+    """
+    Valida e grava os registros em lotes, cada lote em uma transação.
+
+    Args:
+        importador: Importador do tipo de registro
+        registros: Fluxo de (linha, registro), ver ler_registros()
+        tamanho_lote: Registros por lote
+        simular: Valida e grava, mas desfaz cada lote
+        ao_rejeitar: Função chamada com (linha, registro, erro) para cada rejeitado
+        ao_gravar_lote: Função chamada com os contadores após cada lote
+
+    Returns:
+        Contadores {"lidas": n, "importadas": n, "rejeitadas": n}
+    """
+    totais = {"lidas": 0, "importadas": 0, "rejeitadas": 0}
+    for lote in em_lotes(registros, tamanho_lote):
+        totais["lidas"] += len(lote)
+        objetos, rejeitados = importador.validar_lote(lote)
+        if objetos:
+            try:
+                with transaction.atomic():
+                    gravadas = importador.gravar(objetos)
+                    if simular:
+                        transaction.set_rollback(True)
+                    else:
+                        transaction.on_commit(lambda objetos=objetos: importador.apos_gravar(objetos))
+                totais["importadas"] += gravadas
+            except IntegrityError as e:
+                # Conflito não detectado na validação (ex: gravação concorrente):
+                # todos os registros válidos do lote são rejeitados
+                linhas_rejeitadas = {linha for linha, _, _ in rejeitados}
+                rejeitados.extend(
+                    (linha, registro, f"Lote rejeitado: {e}")
+                    for linha, registro in lote if linha not in linhas_rejeitadas
+                )
+        totais["rejeitadas"] += len(rejeitados)
+        if ao_rejeitar:
+            for rejeitado in rejeitados:
+                ao_rejeitar(*rejeitado)
+        if ao_gravar_lote:
+            ao_gravar_lote(totais)
+    return totais
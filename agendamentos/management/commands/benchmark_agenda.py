@@ -0,0 +1,161 @@
+import random
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from agendamentos import views
+from agendamentos.benchmark import medir
+from agendamentos.models import Agendamento
+from agendamentos.services import AgendamentoService, DisponibilidadeService, FilaEsperaService
+from clientes.models import Cliente
+from core.models import Empresa
+from servicos.models import FuncionarioServico
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede p50/p95 e o número de consultas das principais operações de agenda "
+        "(disponibilidade, reserva, agenda semanal e mensal do barbeiro, meus "
+        "agendamentos e fila de espera) sobre os dados do banco. Operações que "
+        "gravam são desfeitas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeticoes", type=int, default=50,
+            help="Execuções de cada operação (padrão: 50)"
+        )
+        parser.add_argument(
+            "--empresa", type=int,
+            help="ID da empresa medida (padrão: a primeira com funcionários)"
+        )
+        parser.add_argument(
+            "--dias", type=int, default=14,
+            help="Dias à frente sorteados para as consultas (padrão: 14)"
+        )
+        parser.add_argument("--semente", type=int, default=42, help="Semente do gerador aleatório")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.filter(funcionarios__isnull=False).select_related("parametros")
+        if options["empresa"]:
+            empresas = empresas.filter(id=options["empresa"])
+        empresa = empresas.order_by("id").first()
+        if empresa is None:
+            raise CommandError("Nenhuma empresa com funcionários. Execute popular_dados antes.")
+
+        self.rnd = random.Random(options["semente"])
+        self.empresa = empresa
+        self.vinculos = list(
+            FuncionarioServico.objects.filter(funcionario__empresa=empresa, funcionario__ativo=True)
+            .select_related("funcionario__user", "servico")
+        )
+        self.clientes = list(Cliente.objects.filter(agendamentos__empresa=empresa).distinct()[:500])
+        if not self.vinculos or not self.clientes:
+            raise CommandError("A empresa precisa de funcionários com serviços e de clientes com agendamentos.")
+
+        hoje = timezone.localdate()
+        self.dias = [hoje + timedelta(days=i) for i in range(1, options["dias"] + 1)]
+        repeticoes = options["repeticoes"]
+
+        self.stdout.write(
+            f"Empresa: {empresa.nome} | Agendamentos no banco: {Agendamento.objects.count()} | "
+            f"Repetições: {repeticoes}\n"
+        )
+        self.stdout.write(f"{'Operação':<42}{'p50 (ms)':>10}{'p95 (ms)':>10}{'Consultas (média/máx)':>24}")
+
+        amostras = [self._sortear() for _ in range(repeticoes)]
+        with override_settings(DISPONIBILIDADE_CACHE_TTL=0):
+            self._relatar("get_horarios_disponiveis (sem cache)", medir(
+                lambda i: self._horarios(*amostras[i]), repeticoes
+            ))
+        # Cache quente: as mesmas consultas, depois de uma primeira passada
+        for amostra in amostras:
+            self._horarios(*amostra)
+        self._relatar("get_horarios_disponiveis (cache quente)", medir(
+            lambda i: self._horarios(*amostras[i]), repeticoes
+        ))
+
+        reservas = self._preparar_reservas(repeticoes)
+        if reservas:
+            self._relatar("criar_agendamento", medir(
+                lambda i: self._reservar(*reservas[i % len(reservas)]), repeticoes
+            ))
+
+        funcionarios = [v.funcionario for v in self.vinculos if v.funcionario.user_id]
+        if funcionarios:
+            fabrica = RequestFactory()
+            self._relatar("agenda_barbeiro (view)", medir(
+                lambda i: self._agenda_barbeiro(fabrica, self.rnd.choice(funcionarios)), repeticoes
+            ))
+            self._relatar("agenda_barbeiro_mes (view)", medir(
+                lambda i: self._agenda_barbeiro_mes(fabrica, self.rnd.choice(funcionarios)), repeticoes
+            ))
+        else:
+            self.stdout.write("agenda_barbeiro: nenhum funcionário com usuário, ignorado")
+
+        fabrica = RequestFactory()
+        self._relatar("meus_agendamentos (view)", medir(
+            lambda i: views.meus_agendamentos(
+                fabrica.get("/meus_agendamentos/", {"email": self.rnd.choice(self.clientes).email})
+            ).content, repeticoes
+        ))
+
+        self._relatar("verificar_e_notificar_fila", medir(
+            lambda i: self._notificar_fila(*amostras[i]), repeticoes
+        ))
+
+    def _relatar(self, nome, resultado):
+        consultas = f"{resultado['consultas']:.1f} / {resultado['consultas_max']}"
+        self.stdout.write(f"{nome:<42}{resultado['p50']:>10.2f}{resultado['p95']:>10.2f}{consultas:>24}")
+
+    def _sortear(self):
+        """Sorteia um (funcionário, serviço, dia)."""
+        vinculo = self.rnd.choice(self.vinculos)
+        return vinculo.funcionario, vinculo.servico, self.rnd.choice(self.dias)
+
+    def _horarios(self, funcionario, servico, dia):
+        return DisponibilidadeService(self.empresa).get_horarios_disponiveis(funcionario, servico, dia)
+
+    def _preparar_reservas(self, quantidade):
+        """Sorteia horários livres para as reservas medidas (fora da medição)."""
+        reservas = []
+        for _ in range(quantidade * 3):
+            funcionario, servico, dia = self._sortear()
+            horarios = self._horarios(funcionario, servico, dia)
+            if horarios:
+                reservas.append((self.rnd.choice(self.clientes), funcionario, servico, self.rnd.choice(horarios)))
+            if len(reservas) == quantidade:
+                break
+        return reservas
+
+    def _reservar(self, cliente, funcionario, servico, horario):
+        with transaction.atomic():
+            sucesso, mensagem, _ = AgendamentoService(self.empresa).criar_agendamento(
+                cliente, funcionario, servico, horario
+            )
+            transaction.set_rollback(True)
+        if not sucesso:
+            raise CommandError(f"Reserva falhou durante o benchmark: {mensagem}")
+
+    def _agenda_barbeiro(self, fabrica, funcionario):
+        dia = self.rnd.choice(self.dias)
+        request = fabrica.get("/barbeiro/agenda/")
+        request.user = funcionario.user
+        return views.agenda_barbeiro(request, dia.year, dia.month, dia.day).content
+
+    def _agenda_barbeiro_mes(self, fabrica, funcionario):
+        dia = self.rnd.choice(self.dias)
+        request = fabrica.get("/barbeiro/agenda/mes/")
+        request.user = funcionario.user
+        return views.agenda_barbeiro_mes(request, dia.year, dia.month).content
+
+    def _notificar_fila(self, funcionario, servico, dia):
+        horario = timezone.make_aware(
+            datetime.combine(dia, self.empresa.parametros.horario_abertura)
+        )
+        with transaction.atomic():
+            FilaEsperaService(self.empresa).verificar_e_notificar_fila(funcionario, horario, servico)
+            transaction.set_rollback(True)
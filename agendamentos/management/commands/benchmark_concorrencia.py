@@ -0,0 +1,203 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+from django.utils import timezone
+
+from agendamentos.benchmark import percentil
+from agendamentos.services import AgendamentoService, DisponibilidadeService
+from clientes.models import Cliente
+from core.models import Empresa
+from servicos.models import FuncionarioServico
+
+# Configurações comparadas: (descrição, OPTIONS do banco; None usa settings.DATABASES)
+CENARIOS = {
+    "padrao": (
+        "Padrão do SQLite (rollback journal, synchronous=FULL, BEGIN DEFERRED, timeout 5s)",
+        {"init_command": "PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL", "timeout": 5},
+    ),
+    "imediato": (
+        "Rollback journal com BEGIN IMMEDIATE",
+        {
+            "init_command": "PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL",
+            "timeout": 5,
+            "transaction_mode": "IMMEDIATE",
+        },
+    ),
+    "wal": (
+        "Recomendado em produção (SQLITE_JOURNAL_MODE=WAL: synchronous=NORMAL, timeout 20s)",
+        {
+            "init_command": (
+                "PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;PRAGMA mmap_size=268435456;"
+                "PRAGMA cache_size=-65536;PRAGMA temp_store=MEMORY"
+            ),
+            "timeout": 20,
+        },
+    ),
+    # Sem SQLITE_* no ambiente, equivale a "padrao" com timeout de 20s
+    "configurado": ("settings.DATABASES (SQLITE_* do ambiente)", None),
+}
+
+
+def _copiar_banco(origem, destino, init_command):
+    """Copia o banco e aplica o modo de journal do cenário antes de abrir os processos."""
+    with sqlite3.connect(origem) as fonte, sqlite3.connect(destino) as copia:
+        fonte.backup(copia)
+    copia = sqlite3.connect(destino)
+    for comando in init_command.split(";"):
+        if comando.strip().lower().startswith("pragma journal_mode"):
+            copia.execute(comando)
+    copia.close()
+
+
+def _trabalhar(papel, indice, caminho, opcoes, empresa_id, segundos, barreira, resultados):
+    """Executa reservas ("escritor") ou consultas de disponibilidade ("leitor") até o fim do tempo."""
+    connection.settings_dict["NAME"] = caminho
+    connection.settings_dict["OPTIONS"] = opcoes
+    rnd = random.Random(indice)
+
+    empresa = Empresa.objects.select_related("parametros").get(pk=empresa_id)
+    vinculos = list(
+        FuncionarioServico.objects.filter(funcionario__empresa=empresa, funcionario__ativo=True)
+        .select_related("funcionario", "servico")
+    )
+    clientes = list(Cliente.objects.filter(agendamentos__empresa=empresa).distinct()[:200])
+    parametros = empresa.parametros
+    hoje = timezone.localdate()
+    dias = [hoje + timedelta(days=i) for i in range(1, 15)]
+    abertura = datetime.combine(hoje, parametros.horario_abertura)
+    fechamento = datetime.combine(hoje, parametros.horario_fechamento)
+    passos = int((fechamento - abertura).total_seconds() // 60 // parametros.intervalo_agendamento)
+    connection.close()
+
+    def reservar():
+        vinculo = rnd.choice(vinculos)
+        inicio = timezone.make_aware(datetime.combine(rnd.choice(dias), parametros.horario_abertura))
+        inicio += timedelta(minutes=parametros.intervalo_agendamento * rnd.randrange(passos))
+        sucesso, _, _ = AgendamentoService(empresa).criar_agendamento(
+            rnd.choice(clientes), vinculo.funcionario, vinculo.servico, inicio
+        )
+        return sucesso
+
+    def consultar():
+        vinculo = rnd.choice(vinculos)
+        DisponibilidadeService(empresa).get_horarios_disponiveis(
+            vinculo.funcionario, vinculo.servico, rnd.choice(dias)
+        )
+        return True
+
+    operacao = reservar if papel == "escritor" else consultar
+    tempos, ocupados, bloqueados = [], 0, 0
+    barreira.wait()
+    fim = time.perf_counter() + segundos
+    with override_settings(DISPONIBILIDADE_CACHE_TTL=0):
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                if not operacao():
+                    ocupados += 1
+            except OperationalError:
+                # "database is locked": o timeout do SQLite esgotou
+                bloqueados += 1
+                connection.close()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    connection.close()
+    resultados.put((papel, tempos, ocupados, bloqueados))
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede reservas e consultas de disponibilidade executadas ao mesmo tempo em "
+        "vários processos, sobre uma cópia do banco SQLite, comparando os padrões do "
+        "SQLite, o modo WAL recomendado em produção e a configuração de settings.DATABASES."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escritores", type=int, default=4, help="Processos fazendo reservas (padrão: 4)")
+        parser.add_argument(
+            "--leitores", type=int, default=4,
+            help="Processos consultando horários disponíveis, sem cache (padrão: 4)"
+        )
+        parser.add_argument("--segundos", type=float, default=5, help="Duração de cada cenário (padrão: 5)")
+        parser.add_argument(
+            "--empresa", type=int,
+            help="ID da empresa medida (padrão: a primeira com funcionários)"
+        )
+        parser.add_argument(
+            "--cenarios", nargs="+", choices=list(CENARIOS), default=list(CENARIOS),
+            help="Cenários medidos (padrão: todos)"
+        )
+
+    def handle(self, *args, **options):
+        banco = settings.DATABASES["default"]
+        if banco["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("O benchmark de concorrência é específico para SQLite.")
+
+        empresas = Empresa.objects.filter(funcionarios__isnull=False, parametros__isnull=False)
+        if options["empresa"]:
+            empresas = empresas.filter(id=options["empresa"])
+        empresa_id = empresas.order_by("id").values_list("id", flat=True).first()
+        if empresa_id is None:
+            raise CommandError("Nenhuma empresa com funcionários. Execute popular_dados antes.")
+
+        self.stdout.write(
+            f"Escritores: {options['escritores']} | Leitores: {options['leitores']} | "
+            f"{options['segundos']:.0f}s por cenário"
+        )
+        for nome in options["cenarios"]:
+            self.stdout.write(f"  {nome}: {CENARIOS[nome][0]}")
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'Cenário':<14}{'Papel':<10}{'ops/s':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}"
+            f"{'p99 (ms)':>10}{'ocupado':>9}{'locked':>8}"
+        )
+        with tempfile.TemporaryDirectory() as diretorio:
+            for nome in options["cenarios"]:
+                opcoes = CENARIOS[nome][1]
+                if opcoes is None:
+                    opcoes = banco.get("OPTIONS", {})
+                caminho = os.path.join(diretorio, f"{nome}.sqlite3")
+                _copiar_banco(str(banco["NAME"]), caminho, opcoes.get("init_command", ""))
+                self._relatar(nome, self._medir(caminho, opcoes, empresa_id, options), options["segundos"])
+
+    def _medir(self, caminho, opcoes, empresa_id, options):
+        # Os processos filhos não podem herdar a conexão aberta
+        connections.close_all()
+        contexto = multiprocessing.get_context("fork")
+        papeis = ["escritor"] * options["escritores"] + ["leitor"] * options["leitores"]
+        barreira = contexto.Barrier(len(papeis))
+        resultados = contexto.Queue()
+        processos = [
+            contexto.Process(
+                target=_trabalhar,
+                args=(papel, indice, caminho, opcoes, empresa_id, options["segundos"], barreira, resultados)
+            )
+            for indice, papel in enumerate(papeis)
+        ]
+        for processo in processos:
+            processo.start()
+        coletados = [resultados.get() for _ in processos]
+        for processo in processos:
+            processo.join()
+        return coletados
+
+    def _relatar(self, nome, coletados, segundos):
+        for papel in ("escritor", "leitor"):
+            do_papel = [resultado for resultado in coletados if resultado[0] == papel]
+            tempos = [tempo for _, lista, _, _ in do_papel for tempo in lista]
+            if not tempos:
+                continue
+            ocupados = sum(resultado[2] for resultado in do_papel)
+            bloqueados = sum(resultado[3] for resultado in do_papel)
+            self.stdout.write(
+                f"{nome:<14}{papel:<10}{len(tempos) / segundos:>8.0f}{percentil(tempos, 50):>10.1f}"
+                f"{percentil(tempos, 95):>10.1f}{percentil(tempos, 99):>10.1f}{ocupados:>9}{bloqueados:>8}"
+            )
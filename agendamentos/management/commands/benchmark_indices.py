@@ -0,0 +1,164 @@
+import time
+from datetime import datetime, timedelta
+from datetime import time as hora
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from agendamentos.benchmark import percentil
+from agendamentos.models import Agendamento, FilaEspera
+from agendamentos.services import _inicio_antes_de
+from clientes.models import Cliente
+from funcionarios.models import DisponibilidadeFuncionario, Funcionario
+from servicos.models import FuncionarioServico
+
+# Slots de 30 minutos entre 9h e 18h usados nos agendamentos sintéticos
+SLOTS_POR_DIA = 18
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra o plano de execução (EXPLAIN) e a latência das consultas de agenda "
+        "mais frequentes. Com --gerar, insere um histórico sintético de agendamentos "
+        "antes da medição e o descarta ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeticoes", type=int, default=200,
+            help="Execuções de cada consulta (padrão: 200)"
+        )
+        parser.add_argument(
+            "--gerar", type=int, default=0,
+            help="Agendamentos sintéticos (passados) a inserir antes da medição; são descartados ao final"
+        )
+        parser.add_argument(
+            "--lote", type=int, default=5000,
+            help="Tamanho dos lotes do bulk_create (padrão: 5000)"
+        )
+        parser.add_argument(
+            "--funcionario", type=int,
+            help="ID do funcionário usado nas consultas (padrão: o primeiro que oferece algum serviço)"
+        )
+
+    def handle(self, *args, **options):
+        vinculos = FuncionarioServico.objects.select_related("funcionario__empresa", "servico")
+        if options["funcionario"]:
+            vinculos = vinculos.filter(funcionario_id=options["funcionario"])
+        vinculo = vinculos.order_by("funcionario_id", "servico_id").first()
+        if vinculo is None:
+            raise CommandError("Nenhum funcionário com serviço cadastrado.")
+
+        with transaction.atomic():
+            if options["gerar"]:
+                self._gerar_historico(options["gerar"], options["lote"])
+            self._medir(vinculo, options["repeticoes"])
+            # Os dados sintéticos não devem permanecer no banco
+            transaction.set_rollback(True)
+
+    def _gerar_historico(self, total, tamanho_lote):
+        """Insere `total` agendamentos passados, distribuídos entre os funcionários."""
+        vinculos = {}
+        for vinculo in FuncionarioServico.objects.select_related("funcionario", "servico"):
+            vinculos.setdefault(vinculo.funcionario_id, vinculo)
+        clientes = {}
+        for cliente_id, empresa_id in Agendamento.objects.values_list("cliente_id", "empresa_id").distinct():
+            clientes.setdefault(empresa_id, cliente_id)
+        cliente_padrao = Cliente.objects.values_list("id", flat=True).first()
+        if cliente_padrao is None:
+            raise CommandError("É necessário ao menos um cliente para gerar agendamentos.")
+
+        funcionarios = list(vinculos.values())
+        hoje = timezone.make_aware(datetime.combine(timezone.localdate(), hora(9, 0)))
+        inicio_medicao = time.perf_counter()
+        lote = []
+        for i in range(total):
+            vinculo = funcionarios[i % len(funcionarios)]
+            posicao = i // len(funcionarios)
+            inicio = (
+                hoje
+                - timedelta(days=posicao // SLOTS_POR_DIA + 1)
+                + timedelta(minutes=30 * (posicao % SLOTS_POR_DIA))
+            )
+            lote.append(Agendamento(
+                empresa_id=vinculo.funcionario.empresa_id,
+                cliente_id=clientes.get(vinculo.funcionario.empresa_id, cliente_padrao),
+                funcionario_id=vinculo.funcionario_id,
+                servico_id=vinculo.servico_id,
+                data_hora_inicio=inicio,
+                data_hora_fim=inicio + timedelta(minutes=30),
+                status="cancelado" if i % 10 == 0 else "concluido",
+                preco_cobrado=vinculo.get_preco_final()
+            ))
+            if len(lote) >= tamanho_lote:
+                Agendamento.objects.bulk_create(lote)
+                lote = []
+        if lote:
+            Agendamento.objects.bulk_create(lote)
+
+        self.stdout.write(
+            f"{total} agendamentos sintéticos inseridos em "
+            f"{time.perf_counter() - inicio_medicao:.1f}s (serão descartados ao final)\n"
+        )
+
+    def _consultas(self, vinculo):
+        """Consultas equivalentes às feitas pelos serviços de agenda."""
+        funcionario = vinculo.funcionario
+        dia = timezone.localdate() + timedelta(days=1)
+        inicio_dia = timezone.make_aware(datetime.combine(dia, hora.min))
+        inicio_slot = inicio_dia + timedelta(hours=10)
+        fim_slot = inicio_slot + timedelta(minutes=vinculo.get_duracao_final())
+
+        return [
+            ("Agendamentos da semana (disponibilidade)", Agendamento.objects.filter(
+                _inicio_antes_de(inicio_dia + timedelta(days=7)),
+                funcionario_id__in=[funcionario.id],
+                data_hora_fim__gt=inicio_dia,
+                status__in=Agendamento.STATUS_OCUPAM_AGENDA
+            ).order_by().values_list("funcionario_id", "data_hora_inicio", "data_hora_fim")),
+            ("Conflito de horário (reserva)", Agendamento.objects.filter(
+                _inicio_antes_de(fim_slot),
+                funcionario=funcionario,
+                data_hora_fim__gt=inicio_slot,
+                status__in=Agendamento.STATUS_OCUPAM_AGENDA
+            ).order_by().values("id")[:1]),
+            ("Agenda do funcionário (7 dias)", Funcionario.get_agendamentos_periodo(
+                funcionario, dia, dia + timedelta(days=6)
+            )),
+            ("Disponibilidades do dia", DisponibilidadeFuncionario.objects.filter(
+                funcionario=funcionario,
+                data=dia
+            ).order_by("horario_inicio")),
+            ("Vínculo funcionário-serviço", FuncionarioServico.objects.filter(
+                funcionario=funcionario,
+                servico=vinculo.servico
+            )),
+            ("Fila de espera", FilaEspera.objects.filter(
+                empresa=funcionario.empresa,
+                notificado=False,
+                ativo=True,
+                data_desejada__lte=dia
+            ).filter(
+                Q(servico=vinculo.servico) | Q(servico__isnull=True)
+            ).order_by("prioridade", "data_solicitacao")),
+        ]
+
+    def _medir(self, vinculo, repeticoes):
+        self.stdout.write(
+            f"Funcionário: {vinculo.funcionario.nome} | Agendamentos no banco: "
+            f"{Agendamento.objects.count()}\n"
+        )
+        for nome, queryset in self._consultas(vinculo):
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                list(queryset.all())
+                tempos.append((time.perf_counter() - inicio) * 1000)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(nome))
+            self.stdout.write(queryset.explain())
+            self.stdout.write(
+                f"p50: {percentil(tempos, 50):.3f} ms | p95: {percentil(tempos, 95):.3f} ms\n"
+            )
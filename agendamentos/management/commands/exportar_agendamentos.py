@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agendamentos.exportacao import FORMATOS, exportar
+
+
+def _data(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor} (use AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Exporta os agendamentos de um período em CSV ou NDJSON, com memória constante."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--inicio", type=_data, required=True, help="Primeiro dia (AAAA-MM-DD)")
+        parser.add_argument("--fim", type=_data, required=True, help="Último dia, inclusive (AAAA-MM-DD)")
+        parser.add_argument("--empresa", type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument("--formato", choices=sorted(FORMATOS), default="csv", help="Formato (padrão: csv)")
+        parser.add_argument("--saida", help="Arquivo de saída (padrão: saída padrão)")
+
+    def handle(self, *args, **options):
+        if options["fim"] < options["inicio"]:
+            raise CommandError("--fim deve ser posterior a --inicio")
+
+        partes = exportar(options["formato"], options["inicio"], options["fim"], options["empresa"])
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8", newline="") as arquivo:
+                arquivo.writelines(partes)
+        else:
+            for parte in partes:
+                self.stdout.write(parte, ending="")
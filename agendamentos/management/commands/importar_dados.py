@@ -0,0 +1,97 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agendamentos.importacao import IMPORTADORES, importar, ler_registros
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa clientes, agendamentos ou disponibilidades de um arquivo CSV "
+        "(com cabeçalho) ou JSONL, em lotes gravados com bulk_create. "
+        "Use '-' para ler da entrada padrão."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=sorted(IMPORTADORES), help="Tipo de registro")
+        parser.add_argument("arquivo", help="Caminho do arquivo, ou '-' para a entrada padrão")
+        parser.add_argument(
+            "--empresa", type=int,
+            help="ID da empresa (obrigatório para agendamentos e disponibilidades)"
+        )
+        parser.add_argument(
+            "--formato", choices=["csv", "jsonl"],
+            help="Formato do arquivo (padrão: pela extensão; csv na entrada padrão)"
+        )
+        parser.add_argument("--lote", type=int, default=2000, help="Registros por lote (padrão: 2000)")
+        parser.add_argument(
+            "--rejeitados",
+            help="Grava os registros rejeitados neste arquivo JSONL, com a linha e o erro"
+        )
+        parser.add_argument(
+            "--simular", action="store_true",
+            help="Valida e grava cada lote, mas desfaz as gravações"
+        )
+
+    def handle(self, *args, **options):
+        empresa = None
+        if options["empresa"] is not None:
+            try:
+                empresa = Empresa.objects.get(pk=options["empresa"])
+            except Empresa.DoesNotExist:
+                raise CommandError(f"Empresa {options['empresa']} não encontrada")
+        elif options["tipo"] != "clientes":
+            raise CommandError("Informe --empresa para importar agendamentos ou disponibilidades")
+
+        caminho = options["arquivo"]
+        formato = options["formato"] or ("jsonl" if caminho.endswith((".jsonl", ".ndjson")) else "csv")
+        importador = IMPORTADORES[options["tipo"]](empresa)
+
+        arquivo = sys.stdin if caminho == "-" else open(caminho, encoding="utf-8-sig", newline="")
+        rejeitados = open(options["rejeitados"], "w", encoding="utf-8") if options["rejeitados"] else None
+        exibidos = 0
+        inicio = time.perf_counter()
+
+        def ao_rejeitar(linha, registro, erro):
+            nonlocal exibidos
+            if rejeitados:
+                rejeitados.write(json.dumps({"linha": linha, "erro": erro, "registro": registro}, ensure_ascii=False) + "\n")
+            if exibidos < 20:
+                self.stderr.write(f"Linha {linha}: {erro}")
+                exibidos += 1
+
+        def ao_gravar_lote(totais):
+            if options["verbosity"] > 1:
+                self.stdout.write(self._formatar(totais, time.perf_counter() - inicio))
+
+        try:
+            totais = importar(
+                importador,
+                ler_registros(arquivo, formato),
+                tamanho_lote=options["lote"],
+                simular=options["simular"],
+                ao_rejeitar=ao_rejeitar,
+                ao_gravar_lote=ao_gravar_lote
+            )
+        finally:
+            if arquivo is not sys.stdin:
+                arquivo.close()
+            if rejeitados:
+                rejeitados.close()
+
+        if totais["rejeitadas"] > exibidos:
+            self.stderr.write(f"... e mais {totais['rejeitadas'] - exibidos} registros rejeitados")
+        mensagem = self._formatar(totais, time.perf_counter() - inicio)
+        if options["simular"]:
+            mensagem += " (simulação: nada foi gravado)"
+        self.stdout.write(self.style.SUCCESS(mensagem))
+
+    def _formatar(self, totais, segundos):
+        return (
+            f"Lidas: {totais['lidas']} | Importadas: {totais['importadas']} | "
+            f"Rejeitadas: {totais['rejeitadas']} | {segundos:.1f}s "
+            f"({totais['lidas'] / segundos if segundos else 0:.0f} registros/s)"
+        )
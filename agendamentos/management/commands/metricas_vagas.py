@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from agendamentos.vagas import metricas_vagas
+
+
+class Command(BaseCommand):
+    help = "Mostra quantos horários liberados por cancelamentos e faltas foram reaproveitados."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--empresa", type=int,
+            help="ID da empresa (padrão: todas)"
+        )
+        parser.add_argument(
+            "--dias", type=int, default=30,
+            help="Considerar as vagas liberadas nos últimos N dias (padrão: 30)"
+        )
+
+    def handle(self, *args, **options):
+        metricas = metricas_vagas(
+            empresa_id=options["empresa"],
+            desde=timezone.now() - timedelta(days=options["dias"])
+        )
+        tempo_medio = metricas["tempo_medio_preenchimento"]
+        self.stdout.write(
+            f"Vagas liberadas:        {metricas['liberadas']} ({metricas['minutos_liberados']} min)\n"
+            f"Com clientes avisados:  {metricas['com_notificacao']} "
+            f"({metricas['clientes_notificados']} notificações)\n"
+            f"Preenchidas:            {metricas['preenchidas']} ({metricas['minutos_preenchidos']} min)\n"
+            f"Taxa de preenchimento:  {metricas['taxa_preenchimento']:.1f}%\n"
+            f"Tempo médio até preencher: {tempo_medio if tempo_medio is not None else '-'}"
+        )
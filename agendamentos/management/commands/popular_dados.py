@@ -0,0 +1,286 @@
+import random
+import time
+from datetime import datetime, timedelta
+from datetime import time as hora
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from agendamentos.models import Agendamento, FilaEspera
+from agendamentos.resumos import reconstruir
+from clientes.models import Cliente
+from core.models import Empresa, ParametrosEmpresa
+from funcionarios.models import DisponibilidadeFuncionario, Funcionario, RegraDisponibilidade
+from servicos.models import FuncionarioServico, Servico
+
+# (nome, duração em minutos, preço)
+SERVICOS = [
+    ("Corte", 30, Decimal("40.00")),
+    ("Barba", 30, Decimal("30.00")),
+    ("Corte e Barba", 60, Decimal("65.00")),
+    ("Pigmentação", 45, Decimal("50.00")),
+    ("Sobrancelha", 15, Decimal("15.00")),
+    ("Hidratação", 30, Decimal("35.00")),
+    ("Platinado", 90, Decimal("150.00")),
+    ("Corte Infantil", 30, Decimal("35.00")),
+]
+
+SENHA_PADRAO = "barber123"
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula o banco com dados sintéticos (empresas, funcionários, serviços, "
+        "clientes, histórico de agendamentos, bloqueios e fila de espera) usando "
+        "inserções em lote. Usado como base dos benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresas", type=int, default=3, help="Número de empresas (padrão: 3)")
+        parser.add_argument(
+            "--funcionarios", type=int, default=5,
+            help="Funcionários por empresa (padrão: 5)"
+        )
+        parser.add_argument(
+            "--servicos", type=int, default=6,
+            help=f"Serviços por empresa, até {len(SERVICOS)} (padrão: 6)"
+        )
+        parser.add_argument("--clientes", type=int, default=2000, help="Número de clientes (padrão: 2000)")
+        parser.add_argument(
+            "--dias-historico", type=int, default=730,
+            help="Dias de histórico de agendamentos (padrão: 730)"
+        )
+        parser.add_argument(
+            "--dias-futuros", type=int, default=30,
+            help="Dias futuros com agendamentos e bloqueios (padrão: 30)"
+        )
+        parser.add_argument(
+            "--ocupacao", type=float, default=0.6,
+            help="Fração dos horários ocupados por agendamentos, entre 0 e 1 (padrão: 0.6)"
+        )
+        parser.add_argument(
+            "--fila", type=int, default=200,
+            help="Entradas na fila de espera por empresa (padrão: 200)"
+        )
+        parser.add_argument("--lote", type=int, default=5000, help="Tamanho dos lotes (padrão: 5000)")
+        parser.add_argument(
+            "--semente", type=int, default=42,
+            help="Semente do gerador aleatório, para resultados reproduzíveis (padrão: 42)"
+        )
+        parser.add_argument(
+            "--prefixo", default="bench",
+            help="Prefixo dos nomes, e-mails e usuários gerados (padrão: bench)"
+        )
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options["semente"])
+        self.lote = options["lote"]
+        self.prefixo = options["prefixo"]
+        inicio = time.perf_counter()
+
+        with transaction.atomic():
+            empresas = self._criar_empresas(options["empresas"])
+            clientes = self._criar_clientes(options["clientes"])
+            for empresa in empresas:
+                funcionarios = self._criar_funcionarios(empresa, options["funcionarios"])
+                vinculos = self._criar_servicos(empresa, funcionarios, min(options["servicos"], len(SERVICOS)))
+                total_agendamentos = self._criar_agendamentos(
+                    empresa, vinculos, clientes,
+                    options["dias_historico"], options["dias_futuros"], options["ocupacao"]
+                )
+                total_bloqueios = self._criar_bloqueios(funcionarios, options["dias_futuros"])
+                self._criar_fila(empresa, funcionarios, vinculos, clientes, options["fila"], options["dias_futuros"])
+                self.stdout.write(
+                    f"{empresa.nome}: {len(funcionarios)} funcionários, {total_agendamentos} agendamentos, "
+                    f"{total_bloqueios} bloqueios, {options['fila']} na fila de espera"
+                )
+                # bulk_create não dispara os sinais que mantêm os resumos diários
+                reconstruir(empresa.id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Dados gerados em {time.perf_counter() - inicio:.1f}s. "
+            f"Usuários dos funcionários: {self.prefixo}-<empresa>-<n> / {SENHA_PADRAO}"
+        ))
+
+    def _criar_empresas(self, quantidade):
+        inicial = Empresa.objects.count()
+        empresas = Empresa.objects.bulk_create([
+            Empresa(
+                nome=f"Barbearia {self.prefixo.title()} {inicial + i + 1}",
+                cnpj=f"{self.prefixo[:4]}{inicial + i + 1:014d}",
+                email=f"contato{inicial + i + 1}@{self.prefixo}.com",
+                telefone="11999999999",
+                endereco=f"Rua {self.prefixo.title()}, {inicial + i + 1}"
+            )
+            for i in range(quantidade)
+        ])
+        ParametrosEmpresa.objects.bulk_create([
+            ParametrosEmpresa(
+                empresa=empresa,
+                horario_abertura=hora(9, 0),
+                horario_fechamento=hora(19, 0),
+                intervalo_agendamento=self.rnd.choice([15, 30]),
+                dias_funcionamento="ter,qua,qui,sex,sab",
+                antecedencia_minima=60
+            )
+            for empresa in empresas
+        ])
+        return empresas
+
+    def _criar_clientes(self, quantidade):
+        inicial = Cliente.objects.count()
+        return Cliente.objects.bulk_create([
+            Cliente(
+                nome=f"Cliente {inicial + i + 1}",
+                email=f"cliente{inicial + i + 1}@{self.prefixo}.com",
+                telefone=f"119{self.rnd.randint(10000000, 99999999)}"
+            )
+            for i in range(quantidade)
+        ], batch_size=self.lote)
+
+    def _criar_funcionarios(self, empresa, quantidade):
+        # Um único hash de senha para todos os usuários gerados
+        senha = make_password(SENHA_PADRAO)
+        usuarios = User.objects.bulk_create([
+            User(username=f"{self.prefixo}-{empresa.id}-{i + 1}", password=senha)
+            for i in range(quantidade)
+        ])
+        return Funcionario.objects.bulk_create([
+            Funcionario(
+                user=usuario,
+                empresa=empresa,
+                nome=f"Barbeiro {i + 1} ({empresa.nome})",
+                email=f"barbeiro{i + 1}.{empresa.id}@{self.prefixo}.com",
+                telefone="11988888888",
+                cargo="Barbeiro",
+                data_contratacao=timezone.localdate() - timedelta(days=365 * 3)
+            )
+            for i, usuario in enumerate(usuarios)
+        ])
+
+    def _criar_servicos(self, empresa, funcionarios, quantidade):
+        servicos = Servico.objects.bulk_create([
+            Servico(empresa=empresa, nome=nome, duracao=duracao, preco=preco)
+            for nome, duracao, preco in SERVICOS[:quantidade]
+        ])
+        vinculos = []
+        for funcionario in funcionarios:
+            for servico in servicos:
+                # Alguns funcionários têm preço/duração próprios
+                especifico = self.rnd.random() < 0.2
+                vinculos.append(FuncionarioServico(
+                    funcionario=funcionario,
+                    servico=servico,
+                    preco_especifico=servico.preco + Decimal("10.00") if especifico else None,
+                    duracao_especifica=servico.duracao + 15 if especifico else None
+                ))
+        return FuncionarioServico.objects.bulk_create(vinculos)
+
+    def _criar_agendamentos(self, empresa, vinculos, clientes, dias_historico, dias_futuros, ocupacao):
+        """Preenche a agenda de cada funcionário, dia a dia, na proporção `ocupacao`."""
+        parametros = empresa.parametros
+        dias_funcionamento = parametros.get_dias_funcionamento_list()
+        nomes_dias = ["seg", "ter", "qua", "qui", "sex", "sab", "dom"]
+        hoje = timezone.localdate()
+        agora = timezone.now()
+        abertura = parametros.horario_abertura.hour * 60 + parametros.horario_abertura.minute
+        fechamento = parametros.horario_fechamento.hour * 60 + parametros.horario_fechamento.minute
+
+        por_funcionario = {}
+        for vinculo in vinculos:
+            por_funcionario.setdefault(vinculo.funcionario_id, []).append(vinculo)
+
+        total = 0
+        lote = []
+        for dia_offset in range(-dias_historico, dias_futuros + 1):
+            dia = hoje + timedelta(days=dia_offset)
+            if nomes_dias[dia.weekday()] not in dias_funcionamento:
+                continue
+            inicio_dia = timezone.make_aware(datetime.combine(dia, hora.min))
+
+            for funcionario_id, opcoes in por_funcionario.items():
+                minuto = abertura
+                while minuto < fechamento:
+                    vinculo = self.rnd.choice(opcoes)
+                    duracao = vinculo.get_duracao_final()
+                    if minuto + duracao > fechamento or self.rnd.random() >= ocupacao:
+                        minuto += parametros.intervalo_agendamento
+                        continue
+
+                    inicio = inicio_dia + timedelta(minutes=minuto)
+                    lote.append(Agendamento(
+                        empresa=empresa,
+                        cliente=self.rnd.choice(clientes),
+                        funcionario_id=funcionario_id,
+                        servico_id=vinculo.servico_id,
+                        data_hora_inicio=inicio,
+                        data_hora_fim=inicio + timedelta(minutes=duracao),
+                        status=self._sortear_status(inicio < agora),
+                        preco_cobrado=vinculo.get_preco_final()
+                    ))
+                    # Avança até o próximo slot da grade após o agendamento
+                    intervalo = parametros.intervalo_agendamento
+                    minuto += -(-duracao // intervalo) * intervalo
+
+                    if len(lote) >= self.lote:
+                        Agendamento.objects.bulk_create(lote)
+                        total += len(lote)
+                        lote = []
+
+        if lote:
+            Agendamento.objects.bulk_create(lote)
+            total += len(lote)
+        return total
+
+    def _sortear_status(self, passado):
+        sorteio = self.rnd.random()
+        if passado:
+            if sorteio < 0.85:
+                return "concluido"
+            return "cancelado" if sorteio < 0.95 else "nao_compareceu"
+        return "confirmado" if sorteio < 0.9 else "cancelado"
+
+    def _criar_bloqueios(self, funcionarios, dias_futuros):
+        """Almoço semanal (regras) e algumas folgas nos próximos dias (exceções por data)."""
+        RegraDisponibilidade.objects.bulk_create([
+            RegraDisponibilidade(
+                funcionario=funcionario, dia_semana=dia_semana,
+                horario_inicio=hora(12, 0), horario_fim=hora(13, 0), tipo="almoco"
+            )
+            for funcionario in funcionarios
+            for dia_semana in range(7)
+        ], batch_size=self.lote)
+
+        hoje = timezone.localdate()
+        bloqueios = []
+        for funcionario in funcionarios:
+            for dia_offset in range(dias_futuros + 1):
+                if self.rnd.random() < 0.05:
+                    bloqueios.append(DisponibilidadeFuncionario(
+                        funcionario=funcionario, data=hoje + timedelta(days=dia_offset),
+                        horario_inicio=hora(0, 0), horario_fim=hora(23, 59), tipo="folga"
+                    ))
+        DisponibilidadeFuncionario.objects.bulk_create(bloqueios, batch_size=self.lote)
+        return len(bloqueios)
+
+    def _criar_fila(self, empresa, funcionarios, vinculos, clientes, quantidade, dias_futuros):
+        servicos = list({vinculo.servico_id for vinculo in vinculos})
+        hoje = timezone.localdate()
+        FilaEspera.objects.bulk_create([
+            FilaEspera(
+                empresa=empresa,
+                cliente=self.rnd.choice(clientes),
+                servico_id=self.rnd.choice(servicos) if self.rnd.random() < 0.7 else None,
+                funcionario_preferido=self.rnd.choice(funcionarios) if self.rnd.random() < 0.4 else None,
+                data_desejada=hoje + timedelta(days=self.rnd.randint(0, dias_futuros)),
+                horario_desejado=hora(self.rnd.randint(9, 18), 0) if self.rnd.random() < 0.5 else None,
+                flexivel_data=self.rnd.random() < 0.6,
+                flexivel_horario=self.rnd.random() < 0.7,
+                prioridade=self.rnd.randint(1, 3)
+            )
+            for _ in range(quantidade)
+        ], batch_size=self.lote)
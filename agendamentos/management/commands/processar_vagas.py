@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from agendamentos.vagas import processar_lote
+from core.notificacoes import MAX_TENTATIVAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Oferece aos clientes da fila de espera os horários liberados por "
+        "cancelamentos e faltas, em lotes, com novas tentativas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote", type=int, default=50,
+            help="Número máximo de vagas por lote (padrão: 50)"
+        )
+        parser.add_argument(
+            "--max-tentativas", type=int, default=MAX_TENTATIVAS,
+            help=f"Tentativas antes de marcar a vaga como falha (padrão: {MAX_TENTATIVAS})"
+        )
+        parser.add_argument(
+            "--continuo", action="store_true",
+            help="Continua processando até ser interrompido"
+        )
+        parser.add_argument(
+            "--intervalo", type=float, default=2.0,
+            help="Segundos de espera quando não há vagas, no modo contínuo (padrão: 2)"
+        )
+
+    def handle(self, *args, **options):
+        total = {"processadas": 0, "expiradas": 0, "reagendadas": 0, "falhas": 0}
+        try:
+            while True:
+                resultado = processar_lote(
+                    limite=options["lote"],
+                    max_tentativas=options["max_tentativas"]
+                )
+                for chave, valor in resultado.items():
+                    total[chave] += valor
+                if any(resultado.values()):
+                    self.stdout.write(self._formatar(resultado))
+
+                if not options["continuo"]:
+                    # Sem modo contínuo: esvaziar apenas o que está pronto agora
+                    if sum(resultado.values()) < options["lote"]:
+                        break
+                elif not any(resultado.values()):
+                    time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Total - {self._formatar(total)}"))
+
+    def _formatar(self, resultado):
+        return (
+            f"Processadas: {resultado['processadas']} | "
+            f"Expiradas: {resultado['expiradas']} | "
+            f"Reagendadas: {resultado['reagendadas']} | "
+            f"Falhas: {resultado['falhas']}"
+        )
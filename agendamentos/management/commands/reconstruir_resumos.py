@@ -0,0 +1,35 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agendamentos.resumos import reconstruir
+
+
+def _data(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor} (use AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula o resumo diário por funcionário (ResumoDiario) a partir dos "
+        "agendamentos. Use após alterações feitas sem sinais (QuerySet.update, SQL direto)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument("--inicio", type=_data, help="Primeiro dia (AAAA-MM-DD; padrão: sem limite)")
+        parser.add_argument("--fim", type=_data, help="Último dia, inclusive (AAAA-MM-DD; padrão: sem limite)")
+
+    def handle(self, *args, **options):
+        if options["inicio"] and options["fim"] and options["fim"] < options["inicio"]:
+            raise CommandError("--fim deve ser posterior a --inicio")
+
+        inicio = time.perf_counter()
+        gravadas = reconstruir(options["empresa"], options["inicio"], options["fim"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{gravadas} resumos diários gravados em {time.perf_counter() - inicio:.1f}s"
+        ))
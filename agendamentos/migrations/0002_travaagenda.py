@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0001_initial'),
+        ('funcionarios', '0002_alter_funcionario_unique_together_funcionario_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TravaAgenda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('versao', models.PositiveBigIntegerField(default=0, help_text='Incrementada a cada agendamento reservado para o funcionário', verbose_name='Versão')),
+                ('funcionario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trava_agenda', to='funcionarios.funcionario', verbose_name='Funcionário')),
+            ],
+            options={
+                'verbose_name': 'Trava de Agenda',
+                'verbose_name_plural': 'Travas de Agenda',
+            },
+        ),
+    ]
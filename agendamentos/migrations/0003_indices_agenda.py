@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0002_travaagenda'),
+        ('clientes', '0001_initial'),
+        ('core', '0002_notificacao'),
+        ('funcionarios', '0002_alter_funcionario_unique_together_funcionario_user_and_more'),
+        ('servicos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['funcionario', 'data_hora_inicio', 'data_hora_fim', 'status'], name='agendamento_func_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filaespera',
+            index=models.Index(condition=models.Q(('ativo', True), ('notificado', False)), fields=['empresa', 'prioridade', 'data_solicitacao', 'data_desejada'], name='fila_espera_pendente_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0003_indices_agenda'),
+        ('clientes', '0001_initial'),
+        ('core', '0002_notificacao'),
+        ('funcionarios', '0002_alter_funcionario_unique_together_funcionario_user_and_more'),
+        ('servicos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='filaespera',
+            name='fila_espera_pendente_idx',
+        ),
+        migrations.AddIndex(
+            model_name='filaespera',
+            index=models.Index(condition=models.Q(('ativo', True), ('notificado', False)), fields=['empresa', 'data_desejada'], name='fila_espera_pendente_idx'),
+        ),
+    ]
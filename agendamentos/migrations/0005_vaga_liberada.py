@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0004_indice_fila_janela'),
+        ('core', '0002_notificacao'),
+        ('funcionarios', '0002_alter_funcionario_unique_together_funcionario_user_and_more'),
+        ('servicos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VagaLiberada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_hora_inicio', models.DateTimeField(verbose_name='Início da Vaga')),
+                ('data_hora_fim', models.DateTimeField(verbose_name='Fim da Vaga')),
+                ('motivo', models.CharField(choices=[('cancelado', 'Cancelamento'), ('nao_compareceu', 'Não Compareceu')], max_length=20, verbose_name='Motivo')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('processada', 'Processada'), ('expirada', 'Expirada'), ('falhou', 'Falhou')], default='pendente', max_length=20, verbose_name='Status')),
+                ('tentativas', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now, help_text='Quando a vaga pode ser (re)processada', verbose_name='Próxima Tentativa')),
+                ('lote', models.CharField(blank=True, help_text='Identificador do worker que reservou a vaga', max_length=32, verbose_name='Lote')),
+                ('ultimo_erro', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('clientes_notificados', models.PositiveIntegerField(default=0, help_text='Clientes da fila de espera avisados sobre a vaga', verbose_name='Clientes Notificados')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('data_processamento', models.DateTimeField(blank=True, null=True, verbose_name='Data do Processamento')),
+                ('data_preenchimento', models.DateTimeField(blank=True, null=True, verbose_name='Data do Preenchimento')),
+                ('agendamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vagas_liberadas', to='agendamentos.agendamento', verbose_name='Agendamento Liberado')),
+                ('agendamento_preenchimento', models.ForeignKey(blank=True, help_text='Agendamento que ocupou o horário liberado', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vagas_preenchidas', to='agendamentos.agendamento', verbose_name='Agendamento de Preenchimento')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vagas_liberadas', to='core.empresa', verbose_name='Empresa')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vagas_liberadas', to='funcionarios.funcionario', verbose_name='Funcionário')),
+                ('servico', models.ForeignKey(blank=True, help_text='Serviço do agendamento que liberou o horário', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vagas_liberadas', to='servicos.servico', verbose_name='Serviço')),
+            ],
+            options={
+                'verbose_name': 'Vaga Liberada',
+                'verbose_name_plural': 'Vagas Liberadas',
+                'ordering': ['-data_criacao'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='vaga_liberada_fila_idx'), models.Index(condition=models.Q(('agendamento_preenchimento__isnull', True)), fields=['funcionario', 'data_hora_inicio', 'data_hora_fim'], name='vaga_liberada_aberta_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0005_vaga_liberada'),
+        ('clientes', '0001_initial'),
+        ('core', '0002_notificacao'),
+        ('funcionarios', '0003_regra_disponibilidade'),
+        ('servicos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['empresa', 'data_hora_inicio'], name='agendamento_emp_inicio_idx'),
+        ),
+    ]
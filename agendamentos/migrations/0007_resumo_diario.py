@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0006_indice_empresa_inicio'),
+        ('core', '0002_notificacao'),
+        ('funcionarios', '0003_regra_disponibilidade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('pendentes', models.IntegerField(default=0, verbose_name='Pendentes')),
+                ('confirmados', models.IntegerField(default=0, verbose_name='Confirmados')),
+                ('em_andamento', models.IntegerField(default=0, verbose_name='Em Andamento')),
+                ('concluidos', models.IntegerField(default=0, verbose_name='Concluídos')),
+                ('cancelados', models.IntegerField(default=0, verbose_name='Cancelados')),
+                ('nao_compareceu', models.IntegerField(default=0, verbose_name='Não Compareceu')),
+                ('receita', models.DecimalField(decimal_places=2, default=0, help_text='Soma do preço cobrado, sem cancelados e faltas', max_digits=12, verbose_name='Receita')),
+                ('minutos_reservados', models.IntegerField(default=0, help_text='Duração somada dos agendamentos, sem cancelados e faltas', verbose_name='Minutos Reservados')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Última Atualização')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_diarios', to='core.empresa', verbose_name='Empresa')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_diarios', to='funcionarios.funcionario', verbose_name='Funcionário')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário',
+                'verbose_name_plural': 'Resumos Diários',
+                'ordering': ['data', 'funcionario'],
+                'indexes': [models.Index(fields=['empresa', 'data'], name='resumo_diario_emp_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('funcionario', 'data'), name='resumo_diario_func_data_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0008_indice_historico_cliente'),
+        ('clientes', '0002_normalizar_telefones'),
+        ('core', '0002_notificacao'),
+        ('funcionarios', '0003_regra_disponibilidade'),
+        ('servicos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['funcionario', 'data_hora_fim', 'data_hora_inicio', 'status'], name='agendamento_func_fim_idx'),
+        ),
+    ]
@@ -1,10 +1,12 @@
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from datetime import timedelta
-from core.models import Empresa
+from core.models import Empresa, ParametrosEmpresa
 from funcionarios.models import Funcionario
 from servicos.models import Servico
 from clientes.models import Cliente
+from .catalogo import get_catalogo
 
 
 class Agendamento(models.Model):
@@ -21,6 +23,9 @@ class Agendamento(models.Model):
         ("nao_compareceu", "Não Compareceu"),
     ]
 
+    # Status que ocupam a agenda do funcionário
+    STATUS_OCUPAM_AGENDA = ["confirmado", "em_andamento"]
+
     # Chaves estrangeiras diretas para facilitar consultas
     empresa = models.ForeignKey(
         Empresa, 
@@ -86,6 +91,24 @@ class Agendamento(models.Model):
         verbose_name = "Agendamento"
         verbose_name_plural = "Agendamentos"
         ordering = ["-data_hora_inicio"]
+        indexes = [
+            # Agenda, disponibilidade e conflitos por funcionário e horário. Inclui
+            # fim e status para que essas consultas sejam respondidas só pelo índice.
+            models.Index(
+                fields=["funcionario", "data_hora_inicio", "data_hora_fim", "status"],
+                name="agendamento_func_inicio_idx"
+            ),
+            # Agendamentos que se sobrepõem a um intervalo (fim > início do
+            # intervalo), inclusive os iniciados em dias anteriores
+            models.Index(
+                fields=["funcionario", "data_hora_fim", "data_hora_inicio", "status"],
+                name="agendamento_func_fim_idx"
+            ),
+            # Relatórios e exportações por empresa e período, já na ordem de horário
+            models.Index(fields=["empresa", "data_hora_inicio"], name="agendamento_emp_inicio_idx"),
+            # Histórico do cliente paginado por cursor (ver historico.py)
+            models.Index(fields=["cliente", "data_hora_inicio", "id"], name="agendamento_cli_inicio_idx"),
+        ]
 
     def __str__(self):
         return f"{self.cliente.nome} - {self.servico.nome} - {self.data_hora_inicio.strftime("%d/%m/%Y %H:%M")}"
@@ -97,35 +120,26 @@ class Agendamento(models.Model):
         if self.data_hora_inicio >= self.data_hora_fim:
             raise ValidationError("Data/hora de início deve ser anterior à data/hora de fim.")
         
-        if self.data_hora_inicio < timezone.now():
+        # Apenas novos agendamentos: os já realizados ainda mudam de status
+        # (concluído, não compareceu) depois do horário
+        if self._state.adding and self.data_hora_inicio < timezone.now():
             raise ValidationError("Não é possível agendar para uma data/hora no passado.")
 
     def save(self, *args, **kwargs):
-        # Calcular data_hora_fim se não foi fornecida
-        if not self.data_hora_fim and self.servico:
-            from servicos.models import FuncionarioServico
+        # Calcular data_hora_fim e preço cobrado, se não foram fornecidos,
+        # com a duração e o preço do serviço para o funcionário
+        if (not self.data_hora_fim or not self.preco_cobrado) and self.servico_id:
             try:
-                func_servico = FuncionarioServico.objects.get(
-                    funcionario=self.funcionario, 
-                    servico=self.servico
-                )
-                duracao = func_servico.get_duracao_final()
-            except FuncionarioServico.DoesNotExist:
-                duracao = self.servico.duracao
+                vinculo = get_catalogo(self.empresa_id).get_vinculo(self.funcionario_id, self.servico_id)
+            except ParametrosEmpresa.DoesNotExist:
+                vinculo = None
             
-            self.data_hora_fim = self.data_hora_inicio + timedelta(minutes=duracao)
-        
-        # Definir preço cobrado se não foi fornecido
-        if not self.preco_cobrado and self.servico:
-            from servicos.models import FuncionarioServico
-            try:
-                func_servico = FuncionarioServico.objects.get(
-                    funcionario=self.funcionario, 
-                    servico=self.servico
-                )
-                self.preco_cobrado = func_servico.get_preco_final()
-            except FuncionarioServico.DoesNotExist:
-                self.preco_cobrado = self.servico.preco
+            if not self.data_hora_fim:
+                duracao = vinculo.duracao if vinculo else self.servico.duracao
+                self.data_hora_fim = self.data_hora_inicio + timedelta(minutes=duracao)
+            
+            if not self.preco_cobrado:
+                self.preco_cobrado = vinculo.preco if vinculo else self.servico.preco
         
         self.clean()
         super().save(*args, **kwargs)
@@ -224,6 +238,14 @@ class FilaEspera(models.Model):
         verbose_name = "Fila de Espera"
         verbose_name_plural = "Fila de Espera"
         ordering = ["prioridade", "data_solicitacao"]
+        indexes = [
+            # Candidatos pendentes da fila por empresa, na janela de datas de uma vaga
+            models.Index(
+                fields=["empresa", "data_desejada"],
+                condition=models.Q(ativo=True, notificado=False),
+                name="fila_espera_pendente_idx"
+            ),
+        ]
 
     def __str__(self):
         servico_str = f" - {self.servico.nome}" if self.servico else ""
@@ -239,3 +261,228 @@ class FilaEspera(models.Model):
         """Desativa a entrada da fila de espera"""
         self.ativo = False
         self.save(update_fields=["ativo"])
+
+
+class TravaAgenda(models.Model):
+    """
+    Trava da agenda de um funcionário.
+    Serializa a criação de agendamentos por funcionário, sem bloquear os demais.
+    """
+    funcionario = models.OneToOneField(
+        Funcionario,
+        on_delete=models.CASCADE,
+        related_name="trava_agenda",
+        verbose_name="Funcionário"
+    )
+    versao = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Versão",
+        help_text="Incrementada a cada agendamento reservado para o funcionário"
+    )
+
+    class Meta:
+        verbose_name = "Trava de Agenda"
+        verbose_name_plural = "Travas de Agenda"
+
+    def __str__(self):
+        return f"Trava - {self.funcionario.nome}"
+
+    @classmethod
+    def adquirir(cls, funcionario_id):
+        """
+        Adquire a trava da agenda do funcionário até o fim da transação atual.
+
+        Deve ser chamada dentro de transaction.atomic(), antes de verificar
+        conflitos. O UPDATE bloqueia a linha do funcionário (PostgreSQL) ou
+        obtém o lock de escrita do banco (SQLite), de modo que duas reservas
+        para o mesmo funcionário nunca verificam conflitos ao mesmo tempo.
+        """
+        atualizadas = cls.objects.filter(funcionario_id=funcionario_id).update(
+            versao=F("versao") + 1
+        )
+        if not atualizadas:
+            # Primeira reserva do funcionário: criar a linha da trava
+            cls.objects.bulk_create([cls(funcionario_id=funcionario_id)], ignore_conflicts=True)
+            cls.objects.filter(funcionario_id=funcionario_id).update(versao=F("versao") + 1)
+
+
+class VagaLiberada(models.Model):
+    """
+    Horário liberado por um cancelamento ou por uma falta (não compareceu).
+
+    Funciona como uma fila de tarefas: o registro é gravado na mesma transação
+    que altera o status do agendamento e processado depois, fora da requisição,
+    por `manage.py processar_vagas`, que oferece o horário aos clientes da fila
+    de espera. Quando um novo agendamento ocupa o horário, a vaga é marcada
+    como preenchida, o que permite medir a taxa de reaproveitamento.
+    """
+    MOTIVO_CHOICES = [
+        ("cancelado", "Cancelamento"),
+        ("nao_compareceu", "Não Compareceu"),
+    ]
+    STATUS_CHOICES = [
+        ("pendente", "Pendente"),
+        ("processando", "Processando"),
+        ("processada", "Processada"),
+        ("expirada", "Expirada"),
+        ("falhou", "Falhou"),
+    ]
+
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name="vagas_liberadas",
+        verbose_name="Empresa"
+    )
+    funcionario = models.ForeignKey(
+        Funcionario,
+        on_delete=models.CASCADE,
+        related_name="vagas_liberadas",
+        verbose_name="Funcionário"
+    )
+    servico = models.ForeignKey(
+        Servico,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="vagas_liberadas",
+        verbose_name="Serviço",
+        help_text="Serviço do agendamento que liberou o horário"
+    )
+    agendamento = models.ForeignKey(
+        Agendamento,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="vagas_liberadas",
+        verbose_name="Agendamento Liberado"
+    )
+    data_hora_inicio = models.DateTimeField(verbose_name="Início da Vaga")
+    data_hora_fim = models.DateTimeField(verbose_name="Fim da Vaga")
+    motivo = models.CharField(max_length=20, choices=MOTIVO_CHOICES, verbose_name="Motivo")
+
+    # Controle do processamento
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="pendente",
+        verbose_name="Status"
+    )
+    tentativas = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    proxima_tentativa = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Próxima Tentativa",
+        help_text="Quando a vaga pode ser (re)processada"
+    )
+    lote = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name="Lote",
+        help_text="Identificador do worker que reservou a vaga"
+    )
+    ultimo_erro = models.TextField(blank=True, verbose_name="Último Erro")
+    clientes_notificados = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Clientes Notificados",
+        help_text="Clientes da fila de espera avisados sobre a vaga"
+    )
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
+    data_processamento = models.DateTimeField(blank=True, null=True, verbose_name="Data do Processamento")
+
+    # Reaproveitamento do horário
+    agendamento_preenchimento = models.ForeignKey(
+        Agendamento,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="vagas_preenchidas",
+        verbose_name="Agendamento de Preenchimento",
+        help_text="Agendamento que ocupou o horário liberado"
+    )
+    data_preenchimento = models.DateTimeField(blank=True, null=True, verbose_name="Data do Preenchimento")
+
+    class Meta:
+        verbose_name = "Vaga Liberada"
+        verbose_name_plural = "Vagas Liberadas"
+        ordering = ["-data_criacao"]
+        indexes = [
+            models.Index(fields=["status", "proxima_tentativa"], name="vaga_liberada_fila_idx"),
+            # Vagas ainda não preenchidas que um novo agendamento do funcionário pode ocupar
+            models.Index(
+                fields=["funcionario", "data_hora_inicio", "data_hora_fim"],
+                condition=models.Q(agendamento_preenchimento__isnull=True),
+                name="vaga_liberada_aberta_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.funcionario.nome} - {self.get_motivo_display()} - {self.data_hora_inicio}"
+
+
+class ResumoDiario(models.Model):
+    """
+    Totais diários dos agendamentos de cada funcionário.
+
+    Mantido incrementalmente pelos sinais de Agendamento (ver resumos.py) e
+    reconstruído por `manage.py reconstruir_resumos`. Relatórios de receita,
+    ocupação e taxas de cancelamento e falta leem estas linhas, uma por
+    funcionário e dia, em vez de percorrer os agendamentos.
+    """
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name="resumos_diarios",
+        verbose_name="Empresa"
+    )
+    funcionario = models.ForeignKey(
+        Funcionario,
+        on_delete=models.CASCADE,
+        related_name="resumos_diarios",
+        verbose_name="Funcionário"
+    )
+    data = models.DateField(verbose_name="Data")
+
+    # Agendamentos por status
+    pendentes = models.IntegerField(default=0, verbose_name="Pendentes")
+    confirmados = models.IntegerField(default=0, verbose_name="Confirmados")
+    em_andamento = models.IntegerField(default=0, verbose_name="Em Andamento")
+    concluidos = models.IntegerField(default=0, verbose_name="Concluídos")
+    cancelados = models.IntegerField(default=0, verbose_name="Cancelados")
+    nao_compareceu = models.IntegerField(default=0, verbose_name="Não Compareceu")
+
+    # Sem cancelados e faltas
+    receita = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name="Receita",
+        help_text="Soma do preço cobrado, sem cancelados e faltas"
+    )
+    minutos_reservados = models.IntegerField(
+        default=0,
+        verbose_name="Minutos Reservados",
+        help_text="Duração somada dos agendamentos, sem cancelados e faltas"
+    )
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name="Última Atualização")
+
+    class Meta:
+        verbose_name = "Resumo Diário"
+        verbose_name_plural = "Resumos Diários"
+        ordering = ["data", "funcionario"]
+        constraints = [
+            models.UniqueConstraint(fields=["funcionario", "data"], name="resumo_diario_func_data_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["empresa", "data"], name="resumo_diario_emp_data_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.funcionario.nome} - {self.data}"
+
+    @property
+    def total(self):
+        """Total de agendamentos do dia, em qualquer status."""
+        return (
+            self.pendentes + self.confirmados + self.em_andamento
+            + self.concluidos + self.cancelados + self.nao_compareceu
+        )
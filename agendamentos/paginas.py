@@ -0,0 +1,54 @@
+"""
+Cache dos fragmentos das páginas públicas (lista de empresas e página de
+agendamento de cada empresa).
+
+Os fragmentos são guardados pela tag {% cache %} sob uma versão: a da lista
+de empresas e uma por empresa. Os sinais geram uma nova versão quando a
+empresa, seus parâmetros, serviços ou funcionários são alterados, o que
+torna os fragmentos antigos inalcançáveis; a expiração apenas libera
+memória. Como no cache de disponibilidade, os fragmentos só são guardados
+num cache compartilhado entre os processos (CACHE_COMPARTILHADO): num cache
+local, a alteração feita por outro processo não chegaria a este.
+"""
+import time as relogio
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import cache_compartilhado, get_versoes
+
+# Tempo máximo (segundos) de um fragmento no cache. 0 desativa o cache.
+TTL_PADRAO = 600
+
+_CHAVE_VERSAO_HOME = "pagina:v:home"
+
+
+def _chave_versao_empresa(empresa_id: int) -> str:
+    return f"pagina:v:e{empresa_id}"
+
+
+def get_ttl() -> int:
+    if not cache_compartilhado():
+        return 0
+    return getattr(settings, "PAGINAS_CACHE_TTL", TTL_PADRAO)
+
+
+def get_versao_home() -> int:
+    """Versão atual da lista de empresas."""
+    return get_versoes([_CHAVE_VERSAO_HOME])[_CHAVE_VERSAO_HOME]
+
+
+def get_versao_empresa(empresa_id: int) -> int:
+    """Versão atual da página de agendamento da empresa."""
+    chave = _chave_versao_empresa(empresa_id)
+    return get_versoes([chave])[chave]
+
+
+def invalidar_home() -> None:
+    """Gera uma nova versão para a lista de empresas."""
+    cache.set(_CHAVE_VERSAO_HOME, relogio.time_ns(), None)
+
+
+def invalidar_empresa(empresa_id: int) -> None:
+    """Gera uma nova versão para a página de agendamento da empresa."""
+    cache.set(_chave_versao_empresa(empresa_id), relogio.time_ns(), None)
@@ -0,0 +1,259 @@
+"""
+Resumo diário de agendamentos por funcionário (ResumoDiario).
+
+Cada agendamento contribui para a linha do seu funcionário no dia local do
+início: +1 no contador do seu status e, se não foi cancelado nem faltou, o
+preço cobrado na receita e a duração nos minutos reservados. Os sinais
+guardam a contribuição lida do banco e, ao salvar ou excluir, aplicam a
+diferença com UPDATE ... SET campo = campo + delta, na mesma transação da
+alteração do agendamento.
+
+Alterações que não disparam sinais (QuerySet.update, bulk_create fora da
+importação, SQL direto) deixam o resumo desatualizado; para esses casos, e
+para preencher a tabela pela primeira vez, use `manage.py reconstruir_resumos`.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Agendamento, ResumoDiario
+
+# Contador do ResumoDiario para cada status de agendamento
+CAMPOS_STATUS = {
+    "pendente": "pendentes",
+    "confirmado": "confirmados",
+    "em_andamento": "em_andamento",
+    "concluido": "concluidos",
+    "cancelado": "cancelados",
+    "nao_compareceu": "nao_compareceu",
+}
+
+# Status que não contam receita nem minutos reservados
+STATUS_SEM_RECEITA = ["cancelado", "nao_compareceu"]
+
+TAMANHO_LOTE = 1000
+
+
+class Contribuicao(NamedTuple):
+    """O que um agendamento soma ao resumo do seu funcionário no dia."""
+    empresa_id: int
+    funcionario_id: int
+    dia: date
+    status: str
+    preco: Decimal
+    minutos: int
+
+
+def _contribuicao(campos: Dict) -> Optional[Contribuicao]:
+    inicio, fim = campos.get("data_hora_inicio"), campos.get("data_hora_fim")
+    if None in (inicio, fim, campos.get("empresa_id"), campos.get("funcionario_id"), campos.get("status")):
+        return None
+    dia = (timezone.localtime(inicio) if timezone.is_aware(inicio) else inicio).date()
+    return Contribuicao(
+        campos["empresa_id"],
+        campos["funcionario_id"],
+        dia,
+        campos["status"],
+        Decimal(campos.get("preco_cobrado") or 0),
+        int((fim - inicio).total_seconds() // 60),
+    )
+
+
+def contribuicao(agendamento: Agendamento) -> Optional[Contribuicao]:
+    """
+    Retorna a contribuição do agendamento com os valores em memória, ou None
+    se algum campo necessário não foi carregado (ex.: .only()/.defer()).
+    """
+    return _contribuicao(agendamento.__dict__)
+
+
+def contribuicao_do_banco(agendamento_id: int) -> Optional[Contribuicao]:
+    """Retorna a contribuição do agendamento como está gravado no banco."""
+    campos = Agendamento.objects.filter(pk=agendamento_id).values(
+        "empresa_id", "funcionario_id", "data_hora_inicio", "data_hora_fim", "status", "preco_cobrado"
+    ).first()
+    return _contribuicao(campos) if campos else None
+
+
+def _somar(deltas, contribuicao: Contribuicao, sinal: int):
+    delta = deltas[(contribuicao.empresa_id, contribuicao.funcionario_id, contribuicao.dia)]
+    delta[CAMPOS_STATUS[contribuicao.status]] += sinal
+    if contribuicao.status not in STATUS_SEM_RECEITA:
+        delta["receita"] += sinal * contribuicao.preco
+        delta["minutos_reservados"] += sinal * contribuicao.minutos
+
+
+def _gravar(empresa_id: int, funcionario_id: int, dia: date, delta: Dict) -> None:
+    """Soma o delta à linha do funcionário no dia, criando-a se não existe."""
+    linhas = ResumoDiario.objects.filter(funcionario_id=funcionario_id, data=dia)
+    atualizacao = {campo: F(campo) + valor for campo, valor in delta.items()}
+    atualizacao["data_atualizacao"] = timezone.now()
+    if linhas.update(**atualizacao):
+        return
+    try:
+        with transaction.atomic():
+            ResumoDiario.objects.create(empresa_id=empresa_id, funcionario_id=funcionario_id, data=dia, **delta)
+    except IntegrityError:
+        # Outra transação criou a linha entre o UPDATE e o INSERT
+        linhas.update(**atualizacao)
+
+
+def _gravar_lote(deltas: Dict) -> None:
+    """
+    Soma os deltas de vários funcionários e dias (importações) com uma
+    consulta, um bulk_update e um bulk_create, em vez de um UPDATE por linha.
+    """
+    existentes = {
+        (resumo.funcionario_id, resumo.data): resumo
+        for resumo in ResumoDiario.objects.filter(
+            funcionario_id__in={funcionario_id for _, funcionario_id, _ in deltas},
+            data__in={dia for _, _, dia in deltas}
+        ).only("id", "funcionario_id", "data")
+    }
+    atualizar, criar = [], []
+    for (empresa_id, funcionario_id, dia), delta in deltas.items():
+        resumo = existentes.get((funcionario_id, dia))
+        if resumo is None:
+            criar.append(((empresa_id, funcionario_id, dia), delta))
+        else:
+            atualizar.append((resumo, delta))
+
+    if atualizar:
+        campos = sorted({campo for _, delta in atualizar for campo in delta})
+        agora = timezone.now()
+        for resumo, delta in atualizar:
+            for campo in campos:
+                setattr(resumo, campo, F(campo) + delta[campo] if campo in delta else F(campo))
+            resumo.data_atualizacao = agora
+        ResumoDiario.objects.bulk_update([resumo for resumo, _ in atualizar], campos + ["data_atualizacao"])
+    if not criar:
+        return
+    try:
+        with transaction.atomic():
+            ResumoDiario.objects.bulk_create([
+                ResumoDiario(empresa_id=empresa_id, funcionario_id=funcionario_id, data=dia, **delta)
+                for (empresa_id, funcionario_id, dia), delta in criar
+            ])
+    except IntegrityError:
+        # Outra transação criou alguma das linhas depois da consulta
+        for chave, delta in criar:
+            _gravar(*chave, delta)
+
+
+def aplicar(antes: Iterable[Contribuicao] = (), depois: Iterable[Contribuicao] = ()) -> None:
+    """
+    Atualiza os resumos removendo as contribuições `antes` e somando as
+    contribuições `depois`: com um UPDATE quando só um funcionário e dia é
+    afetado (sinais), ou em lote quando são vários (importações).
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for item in antes:
+        _somar(deltas, item, -1)
+    for item in depois:
+        _somar(deltas, item, 1)
+
+    deltas = {
+        chave: {campo: valor for campo, valor in delta.items() if valor}
+        for chave, delta in deltas.items()
+    }
+    deltas = {chave: delta for chave, delta in deltas.items() if delta}
+    if len(deltas) == 1:
+        (empresa_id, funcionario_id, dia), delta = deltas.popitem()
+        _gravar(empresa_id, funcionario_id, dia, delta)
+    elif deltas:
+        _gravar_lote(deltas)
+
+
+def reconstruir(
+    empresa_id: Optional[int] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None
+) -> int:
+    """
+    Recalcula a partir dos agendamentos os resumos da empresa (ou de todas)
+    no período (datas inclusive; sem limites, todos os dias), substituindo
+    as linhas existentes numa única transação.
+
+    Returns:
+        Número de linhas de resumo gravadas
+    """
+    agendamentos = Agendamento.objects.all()
+    resumos = ResumoDiario.objects.all()
+    if empresa_id is not None:
+        agendamentos = agendamentos.filter(empresa_id=empresa_id)
+        resumos = resumos.filter(empresa_id=empresa_id)
+    if data_inicio is not None:
+        agendamentos = agendamentos.filter(
+            data_hora_inicio__gte=timezone.make_aware(datetime.combine(data_inicio, time.min))
+        )
+        resumos = resumos.filter(data__gte=data_inicio)
+    if data_fim is not None:
+        agendamentos = agendamentos.filter(
+            data_hora_inicio__lt=timezone.make_aware(datetime.combine(data_fim + timedelta(days=1), time.min))
+        )
+        resumos = resumos.filter(data__lte=data_fim)
+
+    validos = ~Q(status__in=STATUS_SEM_RECEITA)
+    contadores = {
+        campo: Count("id", filter=Q(status=status)) for status, campo in CAMPOS_STATUS.items()
+    }
+    linhas = (
+        agendamentos
+        .annotate(data=TruncDate("data_hora_inicio"))
+        .values("empresa_id", "funcionario_id", "data")
+        .annotate(
+            **contadores,
+            receita=Coalesce(
+                Sum("preco_cobrado", filter=validos), 0,
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+            duracao=Sum(F("data_hora_fim") - F("data_hora_inicio"), filter=validos),
+        )
+        .order_by()
+    )
+
+    gravadas = 0
+    with transaction.atomic():
+        resumos.delete()
+        lote: List[ResumoDiario] = []
+        for linha in linhas.iterator(chunk_size=TAMANHO_LOTE):
+            duracao = linha.pop("duracao")
+            linha["minutos_reservados"] = int(duracao.total_seconds() // 60) if duracao else 0
+            lote.append(ResumoDiario(**linha))
+            if len(lote) >= TAMANHO_LOTE:
+                gravadas += len(ResumoDiario.objects.bulk_create(lote))
+                lote = []
+        gravadas += len(ResumoDiario.objects.bulk_create(lote))
+    return gravadas
+
+
+def totais_por_funcionario(empresa_id: int, data_inicio: date, data_fim: date) -> List[Dict]:
+    """
+    Totais do período (datas inclusive) por funcionário da empresa, lidos dos
+    resumos diários, para painéis de gestão.
+
+    Returns:
+        Lista de dicionários com funcionario_id, funcionario__nome, os
+        contadores por status, receita, minutos_reservados e
+        taxa_cancelamento/taxa_falta (% do total de agendamentos)
+    """
+    campos = list(CAMPOS_STATUS.values()) + ["receita", "minutos_reservados"]
+    totais = list(
+        ResumoDiario.objects
+        .filter(empresa_id=empresa_id, data__range=(data_inicio, data_fim))
+        .values("funcionario_id", "funcionario__nome")
+        .annotate(**{campo: Sum(campo) for campo in campos})
+        .order_by("funcionario__nome")
+    )
+    for total in totais:
+        agendamentos = sum(total[campo] for campo in CAMPOS_STATUS.values())
+        total["agendamentos"] = agendamentos
+        total["taxa_cancelamento"] = round(100 * total["cancelados"] / agendamentos, 1) if agendamentos else 0.0
+        total["taxa_falta"] = round(100 * total["nao_compareceu"] / agendamentos, 1) if agendamentos else 0.0
+    return totais
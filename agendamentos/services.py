@@ -1,13 +1,57 @@
+from collections import defaultdict
 from datetime import datetime, timedelta, time, date
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.db.models import Q
+from django.utils.functional import cached_property
+from django.db import transaction
+from django.db.models import BooleanField, Case, F, Func, Q, Value, When
+from django.db.models.lookups import LessThan
 from core.models import Empresa, ParametrosEmpresa
 from funcionarios.models import Funcionario, DisponibilidadeFuncionario
-from servicos.models import Servico, FuncionarioServico
+from servicos.models import Servico
 from clientes.models import Cliente
-from .models import Agendamento, FilaEspera
-from core.whatsapp import enviar_whatsapp
+from .cache import CacheDisponibilidade, ValidadorHttp, get_validador_http
+from .catalogo import get_catalogo
+from .models import Agendamento, FilaEspera, TravaAgenda
+from .slots import SEGUNDOS_DIA, calcular_inicios_livres, para_segundos, slot_disponivel
+from core.notificacoes import enfileirar_whatsapp, enfileirar_whatsapp_lote
+
+
+def _inicio_antes_de(limite: datetime) -> Func:
+    """
+    Condição data_hora_inicio < limite marcada como provável (likely() do
+    SQLite). Nas consultas de sobreposição ela vale para quase todo o
+    histórico: a marcação leva o SQLite a percorrer o índice
+    agendamento_func_fim_idx a partir de data_hora_fim, que restringe a
+    leitura aos agendamentos ainda não terminados.
+    """
+    return Func(LessThan(F("data_hora_inicio"), limite), function="likely", output_field=BooleanField())
+
+
+def _dividir_por_dia(
+    inicio: datetime,
+    fim: datetime,
+    data_inicio: date,
+    data_fim: date
+) -> List[Tuple[date, Tuple[time, time]]]:
+    """
+    Divide o intervalo de um agendamento pelos dias locais que ele ocupa no
+    período: um agendamento que atravessa a meia-noite ocupa o restante do
+    primeiro dia (até time.max) e o começo do seguinte (a partir de time.min).
+    """
+    inicio = timezone.localtime(inicio)
+    fim = timezone.localtime(fim)
+    intervalos = []
+    dia = max(inicio.date(), data_inicio)
+    while dia <= min(fim.date(), data_fim):
+        inicio_dia = inicio.time() if dia == inicio.date() else time.min
+        fim_dia = fim.time() if dia == fim.date() else time.max
+        # Um agendamento que termina à meia-noite não ocupa o dia seguinte
+        if dia == inicio.date() or fim_dia > time.min:
+            intervalos.append((dia, (inicio_dia, fim_dia)))
+        dia += timedelta(days=1)
+    return intervalos
 
 
 class DisponibilidadeService:
@@ -17,8 +61,87 @@ class DisponibilidadeService:
     
     def __init__(self, empresa: Empresa):
         self.empresa = empresa
-        self.parametros = empresa.parametros
-    
+
+    @cached_property
+    def catalogo(self):
+        # Parâmetros da empresa e preço/duração por funcionário x serviço, em
+        # cache. Carregado no primeiro uso, para que o serviço possa ser criado
+        # em código assíncrono.
+        return get_catalogo(self.empresa.pk)
+
+    async def aget_horarios_disponiveis(
+        self,
+        funcionario: Funcionario,
+        servico: Servico,
+        data: date
+    ) -> List[datetime]:
+        """
+        Versão assíncrona de get_horarios_disponiveis, para views async.
+
+        O cálculo inteiro (cache, consultas e montagem dos horários) é feito
+        numa única passagem para a thread de banco, em vez de uma por consulta.
+        """
+        return await sync_to_async(self.get_horarios_disponiveis)(funcionario, servico, data)
+
+    async def aget_horarios_disponiveis_periodo(
+        self,
+        funcionario: Funcionario,
+        servico: Servico,
+        data_inicio: date,
+        data_fim: date
+    ) -> Dict[date, List[datetime]]:
+        """Versão assíncrona de get_horarios_disponiveis_periodo."""
+        return await sync_to_async(self.get_horarios_disponiveis_periodo)(
+            funcionario, servico, data_inicio, data_fim
+        )
+
+    async def aget_horarios_disponiveis_servico_periodo(
+        self,
+        servico: Servico,
+        data_inicio: date,
+        data_fim: date
+    ) -> Dict[date, List[Tuple[datetime, List[Funcionario]]]]:
+        """Versão assíncrona de get_horarios_disponiveis_servico_periodo."""
+        return await sync_to_async(self.get_horarios_disponiveis_servico_periodo)(
+            servico, data_inicio, data_fim
+        )
+
+    async def aget_validador_http(
+        self,
+        funcionario: Funcionario,
+        servico: Servico,
+        data_inicio: date,
+        data_fim: date
+    ) -> ValidadorHttp:
+        """Versão assíncrona de get_validador_http."""
+        return await sync_to_async(self.get_validador_http)(funcionario, servico, data_inicio, data_fim)
+
+    def get_validador_http(
+        self,
+        funcionario: Funcionario,
+        servico: Servico,
+        data_inicio: date,
+        data_fim: date
+    ) -> ValidadorHttp:
+        """
+        Retorna ETag, Last-Modified e validade das respostas HTTP com os
+        horários do funcionário no período, sem calcular os horários.
+
+        Usado para responder 304 a consultas repetidas: custa a leitura das
+        versões da agenda no cache (e do catálogo, se ainda não carregado).
+        """
+        dias = [
+            data_inicio + timedelta(days=i)
+            for i in range((data_fim - data_inicio).days + 1)
+        ]
+        return get_validador_http(
+            self.empresa.pk,
+            funcionario.pk,
+            dias,
+            self.catalogo.antecedencia_minima,
+            identificacao=(servico.pk, servico.nome, funcionario.nome)
+        )
+
     def get_horarios_disponiveis(
         self, 
         funcionario: Funcionario, 
@@ -36,66 +159,363 @@ class DisponibilidadeService:
         Returns:
             Lista de objetos datetime representando os horários disponíveis
         """
-        # Verificar se a data não é no passado
-        if data < timezone.now().date():
-            return []
+        return self.get_horarios_disponiveis_periodo(funcionario, servico, data, data)[data]
+    
+    def get_horarios_disponiveis_periodo(
+        self,
+        funcionario: Funcionario,
+        servico: Servico,
+        data_inicio: date,
+        data_fim: date
+    ) -> Dict[date, List[datetime]]:
+        """
+        Retorna os horários disponíveis de um funcionário para todos os dias de um período.
         
-        # Verificar se o funcionário oferece o serviço
-        if not self._funcionario_oferece_servico(funcionario, servico):
-            return []
+        Todos os dados do período (vínculo funcionário-serviço, disponibilidades e
+        agendamentos) são carregados em um lote fixo de consultas, de modo que o
+        custo não cresce com o número de dias.
         
-        # Obter duração do serviço para este funcionário
-        duracao_servico = self._get_duracao_servico(funcionario, servico)
+        Args:
+            funcionario: O funcionário para verificar disponibilidade
+            servico: O serviço a ser agendado
+            data_inicio: Primeiro dia do período (inclusive)
+            data_fim: Último dia do período (inclusive)
+            
+        Returns:
+            Dicionário {data: lista de horários disponíveis} com todos os dias do período
+        """
+        dias = [
+            data_inicio + timedelta(days=i)
+            for i in range((data_fim - data_inicio).days + 1)
+        ]
+        horarios = {dia: [] for dia in dias}
         
-        # Obter períodos de trabalho do funcionário para a data
-        periodos_trabalho = self._get_periodos_trabalho(funcionario, data)
+        # Dias no passado não possuem horários disponíveis
+        inicio_valido = max(data_inicio, timezone.localdate())
+        if inicio_valido > data_fim:
+            return horarios
         
-        # Obter períodos ocupados (agendamentos + bloqueios)
-        periodos_ocupados = self._get_periodos_ocupados(funcionario, data)
+        # Verificar se o funcionário oferece o serviço e obter a duração
+        vinculo = self.catalogo.get_vinculo(funcionario.pk, servico.pk)
+        duracoes = {funcionario.pk: vinculo.duracao if vinculo else None}
         
-        # Gerar slots disponíveis
-        slots_disponiveis = self._gerar_slots_disponiveis(
-            periodos_trabalho, 
-            periodos_ocupados, 
-            duracao_servico, 
-            data
+        dias_validos = [dia for dia in dias if dia >= inicio_valido]
+        horarios_funcionario = self._get_horarios_com_cache(
+            servico, [funcionario.pk], dias_validos, duracoes
         )
+        for dia in dias_validos:
+            horarios[dia] = horarios_funcionario[(funcionario.pk, dia)]
         
-        return slots_disponiveis
+        return horarios
     
-    def _funcionario_oferece_servico(self, funcionario: Funcionario, servico: Servico) -> bool:
-        """Verifica se o funcionário oferece o serviço especificado."""
-        return FuncionarioServico.objects.filter(
-            funcionario=funcionario, 
-            servico=servico
-        ).exists()
+    def get_horarios_disponiveis_servico(
+        self,
+        servico: Servico,
+        data: date
+    ) -> List[Tuple[datetime, List[Funcionario]]]:
+        """
+        Retorna os horários em que ao menos um funcionário pode prestar o serviço.
+        
+        Args:
+            servico: O serviço a ser agendado
+            data: A data para verificar disponibilidade
+            
+        Returns:
+            Lista ordenada de tuplas (horário, funcionários livres nesse horário)
+        """
+        return self.get_horarios_disponiveis_servico_periodo(servico, data, data)[data]
     
-    def _get_duracao_servico(self, funcionario: Funcionario, servico: Servico) -> int:
-        """Obtém a duração do serviço para o funcionário específico."""
-        try:
-            func_servico = FuncionarioServico.objects.get(
-                funcionario=funcionario, 
-                servico=servico
+    def get_horarios_disponiveis_servico_periodo(
+        self,
+        servico: Servico,
+        data_inicio: date,
+        data_fim: date
+    ) -> Dict[date, List[Tuple[datetime, List[Funcionario]]]]:
+        """
+        Retorna, para cada dia do período, os horários livres de todos os
+        funcionários que oferecem o serviço ("qualquer profissional").
+        
+        Cada funcionário usa a sua própria duração para o serviço. Os dados de
+        todos os funcionários são carregados em um lote fixo de consultas,
+        independente do número de funcionários e de dias.
+        
+        Args:
+            servico: O serviço a ser agendado
+            data_inicio: Primeiro dia do período (inclusive)
+            data_fim: Último dia do período (inclusive)
+            
+        Returns:
+            Dicionário {data: lista ordenada de tuplas (horário, funcionários livres)}
+        """
+        dias = [
+            data_inicio + timedelta(days=i)
+            for i in range((data_fim - data_inicio).days + 1)
+        ]
+        horarios = {dia: [] for dia in dias}
+        
+        # Dias no passado não possuem horários disponíveis
+        inicio_valido = max(data_inicio, timezone.localdate())
+        if inicio_valido > data_fim:
+            return horarios
+        
+        # Funcionários ativos que oferecem o serviço
+        funcionarios = list(servico.get_funcionarios_disponiveis())
+        if not funcionarios:
+            return horarios
+        
+        duracoes = {}
+        for funcionario in funcionarios:
+            vinculo = self.catalogo.get_vinculo(funcionario.pk, servico.pk)
+            duracoes[funcionario.pk] = vinculo.duracao if vinculo else servico.duracao
+        dias_validos = [dia for dia in dias if dia >= inicio_valido]
+        horarios_funcionarios = self._get_horarios_com_cache(
+            servico, list(duracoes), dias_validos, duracoes
+        )
+        
+        for dia in dias_validos:
+            livres_por_horario = defaultdict(list)
+            for funcionario in funcionarios:
+                for horario in horarios_funcionarios[(funcionario.pk, dia)]:
+                    livres_por_horario[horario].append(funcionario)
+            horarios[dia] = sorted(livres_por_horario.items())
+        
+        return horarios
+    
+    def _get_horarios_com_cache(
+        self,
+        servico: Servico,
+        funcionario_ids: List[int],
+        dias: List[date],
+        duracoes: Dict[int, Optional[int]]
+    ) -> Dict[Tuple[int, date], List[datetime]]:
+        """
+        Obtém os horários de cada (funcionário, dia), usando o cache quando possível.
+        
+        Apenas os pares ausentes do cache são calculados, com uma única carga
+        de dados para todos eles.
+        
+        Args:
+            servico: O serviço a ser agendado
+            funcionario_ids: Funcionários a consultar
+            dias: Dias a consultar (nenhum no passado)
+            duracoes: {funcionario_id: duração}, com None para funcionários
+                que não oferecem o serviço
+        
+        Returns:
+            Dicionário {(funcionario_id, dia): horários disponíveis}
+        """
+        cache_disponibilidade = CacheDisponibilidade(
+            self.empresa.pk, servico.pk, self.catalogo.antecedencia_minima
+        )
+        horarios = cache_disponibilidade.obter(funcionario_ids, dias)
+        
+        faltantes = [
+            (funcionario_id, dia)
+            for funcionario_id in funcionario_ids
+            for dia in dias
+            if (funcionario_id, dia) not in horarios
+        ]
+        if not faltantes:
+            return horarios
+        
+        ids_com_servico = [
+            funcionario_id for funcionario_id in {par[0] for par in faltantes}
+            if duracoes.get(funcionario_id) is not None
+        ]
+        disponibilidades, agendamentos = {}, {}
+        if ids_com_servico:
+            disponibilidades, agendamentos = self._carregar_periodo(
+                ids_com_servico,
+                min(dia for _, dia in faltantes),
+                max(dia for _, dia in faltantes)
             )
-            return func_servico.get_duracao_final()
-        except FuncionarioServico.DoesNotExist:
-            return servico.duracao
+        
+        calculados = {}
+        for funcionario_id, dia in faltantes:
+            duracao_servico = duracoes.get(funcionario_id)
+            if duracao_servico is None:
+                calculados[(funcionario_id, dia)] = []
+            else:
+                calculados[(funcionario_id, dia)] = self._calcular_horarios_dia(
+                    funcionario_id, duracao_servico, dia, disponibilidades, agendamentos
+                )
+        
+        cache_disponibilidade.salvar(calculados)
+        horarios.update(calculados)
+        return horarios
+    
+    def _calcular_horarios_dia(
+        self,
+        funcionario_id: int,
+        duracao_servico: int,
+        dia: date,
+        disponibilidades: Dict[Tuple[int, date], List[DisponibilidadeFuncionario]],
+        agendamentos: Dict[Tuple[int, date], List[Tuple[time, time]]]
+    ) -> List[datetime]:
+        """Calcula os horários livres de um funcionário em um dia a partir dos dados já carregados."""
+        chave = (funcionario_id, dia)
+        disponibilidades_dia = self._aplicar_regras(funcionario_id, dia, disponibilidades.get(chave, []))
+        periodos_trabalho = self._get_periodos_trabalho(disponibilidades_dia, dia)
+        periodos_ocupados = self._get_periodos_ocupados(
+            disponibilidades_dia, agendamentos.get(chave, [])
+        )
+        return self._gerar_slots_disponiveis(
+            periodos_trabalho,
+            periodos_ocupados,
+            duracao_servico,
+            dia
+        )
     
-    def _get_periodos_trabalho(self, funcionario: Funcionario, data: date) -> List[Tuple[time, time]]:
+    def horario_disponivel(
+        self,
+        funcionario: Funcionario,
+        duracao_servico: int,
+        data_hora_inicio: datetime
+    ) -> bool:
+        """
+        Verifica se um único horário está disponível para o funcionário.
+        
+        Equivale a verificar se o horário consta em get_horarios_disponiveis,
+        mas consulta apenas as disponibilidades do dia e os agendamentos que se
+        sobrepõem ao intervalo, sem gerar a grade do dia inteiro.
+        
+        Args:
+            funcionario: O funcionário que prestará o serviço
+            duracao_servico: Duração do serviço para o funcionário, em minutos
+            data_hora_inicio: Data e hora de início desejadas (aware)
+        
+        Returns:
+            True se o horário pode ser agendado
+        """
+        inicio_local = timezone.localtime(data_hora_inicio)
+        data_hora_fim = data_hora_inicio + timedelta(minutes=duracao_servico)
+        dia = inicio_local.date()
+        
+        # Data no passado, antecedência mínima e slots que atravessam o dia
+        if dia < timezone.localdate() or inicio_local.microsecond:
+            return False
+        if timezone.localtime(data_hora_fim).date() != dia:
+            return False
+        inicio_minimo = self._get_inicio_minimo(dia)
+        inicio = para_segundos(inicio_local.time())
+        if inicio_minimo is None or inicio < inicio_minimo:
+            return False
+        
+        # Horários de trabalho e bloqueios do dia
+        disponibilidades = self._aplicar_regras(funcionario.pk, dia, list(
+            DisponibilidadeFuncionario.objects.filter(
+                funcionario=funcionario,
+                data=dia
+            ).order_by("horario_inicio")
+        ))
+        if not slot_disponivel(
+            self._get_periodos_trabalho(disponibilidades, dia),
+            self._get_periodos_ocupados(disponibilidades, []),
+            inicio,
+            duracao_servico,
+            self.catalogo.intervalo_agendamento
+        ):
+            return False
+        
+        # Agendamentos que se sobrepõem ao intervalo, inclusive os iniciados no
+        # dia anterior que atravessam a meia-noite
+        return not Agendamento.objects.filter(
+            _inicio_antes_de(data_hora_fim),
+            funcionario=funcionario,
+            data_hora_fim__gt=data_hora_inicio,
+            status__in=Agendamento.STATUS_OCUPAM_AGENDA
+        ).exists()
+    
+    def _carregar_periodo(
+        self,
+        funcionario_ids: List[int],
+        data_inicio: date,
+        data_fim: date
+    ) -> Tuple[
+        Dict[Tuple[int, date], List[DisponibilidadeFuncionario]],
+        Dict[Tuple[int, date], List[Tuple[time, time]]]
+    ]:
+        """
+        Carrega em duas consultas as disponibilidades e os agendamentos ativos
+        dos funcionários no período.
+        
+        Returns:
+            Tupla (disponibilidades, agendamentos), ambos indexados por
+            (funcionario_id, data). Os agendamentos são convertidos para
+            intervalos (inicio, fim) no horário local.
+        """
+        disponibilidades = defaultdict(list)
+        for disp in DisponibilidadeFuncionario.objects.filter(
+            funcionario_id__in=funcionario_ids,
+            data__range=[data_inicio, data_fim]
+        ).order_by("horario_inicio"):
+            disponibilidades[(disp.funcionario_id, disp.data)].append(disp)
+        
+        # Agendamentos que se sobrepõem ao período, inclusive os iniciados antes
+        # dele. Filtrar pelo intervalo de datetimes (e não por __date) permite o
+        # uso de índices; sem a ordenação padrão do modelo, que levaria o SQLite
+        # ao índice por início
+        inicio_periodo = timezone.make_aware(datetime.combine(data_inicio, time.min))
+        fim_periodo = timezone.make_aware(datetime.combine(data_fim + timedelta(days=1), time.min))
+        agendamentos = defaultdict(list)
+        for funcionario_id, inicio, fim in Agendamento.objects.filter(
+            _inicio_antes_de(fim_periodo),
+            funcionario_id__in=funcionario_ids,
+            data_hora_fim__gt=inicio_periodo,
+            status__in=Agendamento.STATUS_OCUPAM_AGENDA
+        ).order_by().values_list("funcionario_id", "data_hora_inicio", "data_hora_fim"):
+            for dia, intervalo in _dividir_por_dia(inicio, fim, data_inicio, data_fim):
+                agendamentos[(funcionario_id, dia)].append(intervalo)
+        
+        return disponibilidades, agendamentos
+    
+    def _aplicar_regras(
+        self,
+        funcionario_id: int,
+        dia: date,
+        disponibilidades: List[DisponibilidadeFuncionario]
+    ) -> list:
+        """
+        Combina as disponibilidades da data com as regras semanais do funcionário.
+        
+        As disponibilidades da data são exceções às regras: se definem períodos
+        de trabalho, substituem todas as regras do dia; caso contrário, os
+        bloqueios da data somam-se aos períodos das regras.
+        
+        Returns:
+            Períodos do dia (DisponibilidadeFuncionario ou RegraSemanal), ordenados por horário
+        """
+        if any(disp.tipo == "trabalho" for disp in disponibilidades):
+            return disponibilidades
+        regras = self.catalogo.get_regras(funcionario_id, dia)
+        if not regras:
+            return disponibilidades
+        return sorted(
+            [*regras, *disponibilidades],
+            key=lambda periodo: (periodo.horario_inicio, periodo.horario_fim)
+        )
+    
+    def _get_periodos_trabalho(
+        self, 
+        disponibilidades: List[DisponibilidadeFuncionario], 
+        data: date
+    ) -> List[Tuple[time, time]]:
         """
         Obtém os períodos de trabalho do funcionário para uma data específica.
         
+        Args:
+            disponibilidades: Disponibilidades do funcionário na data, ordenadas por horário
+            data: A data dos períodos
+        
         Returns:
             Lista de tuplas (horario_inicio, horario_fim) dos períodos de trabalho
         """
         # Verificar se há disponibilidade específica para a data
-        disponibilidades_trabalho = DisponibilidadeFuncionario.objects.filter(
-            funcionario=funcionario,
-            data=data,
-            tipo="trabalho"
-        ).order_by("horario_inicio")
+        disponibilidades_trabalho = [
+            disp for disp in disponibilidades if disp.tipo == "trabalho"
+        ]
         
-        if disponibilidades_trabalho.exists():
+        if disponibilidades_trabalho:
             # Usar horários específicos definidos para a data
             return [
                 (disp.horario_inicio, disp.horario_fim) 
@@ -108,61 +528,40 @@ class DisponibilidadeService:
     def _get_horarios_padrao_empresa(self, data: date) -> List[Tuple[time, time]]:
         """Obtém os horários padrão de funcionamento da empresa para uma data."""
         # Verificar se a empresa funciona no dia da semana
-        dias_semana = {
-            0: "seg", 1: "ter", 2: "qua", 3: "qui", 
-            4: "sex", 5: "sab", 6: "dom"
-        }
-        
-        dia_semana = dias_semana[data.weekday()]
-        dias_funcionamento = self.parametros.get_dias_funcionamento_list()
-        
-        if dia_semana in dias_funcionamento:
-            return [(self.parametros.horario_abertura, self.parametros.horario_fechamento)]
+        if self.catalogo.funciona_em(data):
+            return [(self.catalogo.horario_abertura, self.catalogo.horario_fechamento)]
         else:
             return []  # Empresa não funciona neste dia
     
-    def _get_periodos_ocupados(self, funcionario: Funcionario, data: date) -> List[Tuple[time, time]]:
+    def _get_periodos_ocupados(
+        self, 
+        disponibilidades: List[DisponibilidadeFuncionario], 
+        agendamentos: List[Tuple[time, time]]
+    ) -> List[Tuple[time, time]]:
         """
         Obtém todos os períodos ocupados do funcionário para uma data específica.
         Inclui agendamentos confirmados e bloqueios de disponibilidade.
         
+        Args:
+            disponibilidades: Disponibilidades do funcionário na data
+            agendamentos: Intervalos dos agendamentos ativos do funcionário na data
+        
         Returns:
             Lista de tuplas (horario_inicio, horario_fim) dos períodos ocupados
         """
-        periodos_ocupados = []
-        
         # Agendamentos confirmados
-        agendamentos = Agendamento.objects.filter(
-            funcionario=funcionario,
-            data_hora_inicio__date=data,
-            status__in=["confirmado", "em_andamento"]
-        )
-        
-        for agendamento in agendamentos:
-            periodos_ocupados.append((
-                agendamento.data_hora_inicio.time(),
-                agendamento.data_hora_fim.time()
-            ))
+        periodos_ocupados = list(agendamentos)
         
         # Bloqueios de disponibilidade (almoço, pausa, etc.)
-        bloqueios = DisponibilidadeFuncionario.objects.filter(
-            funcionario=funcionario,
-            data=data,
-            tipo__in=["almoco", "pausa", "outro"]
-        )
-        
-        for bloqueio in bloqueios:
-            periodos_ocupados.append((
-                bloqueio.horario_inicio,
-                bloqueio.horario_fim
-            ))
+        for bloqueio in disponibilidades:
+            if bloqueio.tipo in ["almoco", "pausa", "outro"]:
+                periodos_ocupados.append((
+                    bloqueio.horario_inicio,
+                    bloqueio.horario_fim
+                ))
         
         # Verificar se há folga para o dia inteiro
-        folga_dia_inteiro = DisponibilidadeFuncionario.objects.filter(
-            funcionario=funcionario,
-            data=data,
-            tipo="folga"
-        ).exists()
+        folga_dia_inteiro = any(disp.tipo == "folga" for disp in disponibilidades)
         
         if folga_dia_inteiro:
             # Se há folga, o dia inteiro está ocupado
@@ -189,56 +588,43 @@ class DisponibilidadeService:
         Returns:
             Lista de horários disponíveis como objetos datetime
         """
-        slots_disponiveis = []
-        intervalo = self.parametros.intervalo_agendamento
+        inicio_minimo = self._get_inicio_minimo(data)
+        if inicio_minimo is None:
+            return []
         
-        for inicio_trabalho, fim_trabalho in periodos_trabalho:
-            # Converter para datetime para facilitar cálculos
-            inicio_dt = datetime.combine(data, inicio_trabalho)
-            fim_dt = datetime.combine(data, fim_trabalho)
-            
-            # Gerar slots dentro do período de trabalho
-            slot_atual = inicio_dt
-            
-            while slot_atual + timedelta(minutes=duracao_servico) <= fim_dt:
-                slot_fim = slot_atual + timedelta(minutes=duracao_servico)
-                
-                # Verificar se o slot não conflita com períodos ocupados
-                if not self._slot_conflita_com_ocupados(
-                    slot_atual.time(), 
-                    slot_fim.time(), 
-                    periodos_ocupados
-                ):
-                    # Verificar antecedência mínima
-                    if self._slot_respeita_antecedencia(slot_atual):
-                        slots_disponiveis.append(
-                            timezone.make_aware(slot_atual)
-                        )
-                
-                # Avançar para o próximo slot
-                slot_atual += timedelta(minutes=intervalo)
+        inicios = calcular_inicios_livres(
+            periodos_trabalho,
+            periodos_ocupados,
+            duracao_servico,
+            self.catalogo.intervalo_agendamento,
+            inicio_minimo
+        )
         
-        return slots_disponiveis
-    
-    def _slot_conflita_com_ocupados(
-        self, 
-        slot_inicio: time, 
-        slot_fim: time, 
-        periodos_ocupados: List[Tuple[time, time]]
-    ) -> bool:
-        """Verifica se um slot conflita com algum período ocupado."""
-        for ocupado_inicio, ocupado_fim in periodos_ocupados:
-            # Verificar sobreposição de horários
-            if (slot_inicio < ocupado_fim and slot_fim > ocupado_inicio):
-                return True
-        return False
+        meia_noite = datetime.combine(data, time.min)
+        return [
+            timezone.make_aware(meia_noite + timedelta(seconds=inicio))
+            for inicio in inicios
+        ]
     
-    def _slot_respeita_antecedencia(self, slot_datetime: datetime) -> bool:
-        """Verifica se o slot respeita a antecedência mínima para agendamentos."""
-        agora = timezone.now()
-        antecedencia_minima = timedelta(minutes=self.parametros.antecedencia_minima)
+    def _get_inicio_minimo(self, data: date) -> Optional[int]:
+        """
+        Calcula o primeiro início permitido pela antecedência mínima na data.
         
-        return timezone.make_aware(slot_datetime) >= agora + antecedencia_minima
+        Returns:
+            Segundos desde a meia-noite, ou None se nenhum horário da data
+            respeita a antecedência mínima
+        """
+        limite = timezone.localtime(
+            timezone.now() + timedelta(minutes=self.catalogo.antecedencia_minima)
+        )
+        if limite.date() < data:
+            return 0
+        if limite.date() > data:
+            return None
+        
+        # Slots começam em segundos inteiros: arredondar o limite para cima
+        inicio_minimo = para_segundos(limite.time()) + (1 if limite.microsecond else 0)
+        return inicio_minimo if inicio_minimo < SEGUNDOS_DIA else None
 
 
 class AgendamentoService:
@@ -269,69 +655,74 @@ class AgendamentoService:
         Returns:
             Tupla (sucesso, mensagem, agendamento_criado)
         """
-        # Obter duração do serviço para este funcionário e calcular data_hora_fim
-        duracao = self.disponibilidade_service._get_duracao_servico(funcionario, servico)
+        # Duração e preço do serviço para este funcionário, do catálogo da empresa
+        vinculo = self.disponibilidade_service.catalogo.get_vinculo(funcionario.pk, servico.pk)
+        if vinculo is None:
+            return False, "Horário não disponível para agendamento ou já ocupado.", None
+        duracao, preco = vinculo
         data_hora_fim = data_hora_inicio + timedelta(minutes=duracao)
 
-        # Verificar se o horário está disponível (verificação inicial)
-        horarios_disponiveis = self.disponibilidade_service.get_horarios_disponiveis(
-            funcionario, servico, data_hora_inicio.date()
-        )
+        with transaction.atomic():
+            # Serializar reservas do mesmo funcionário até o commit
+            TravaAgenda.adquirir(funcionario.pk)
 
-        if data_hora_inicio not in horarios_disponiveis:
-            return False, "Horário não disponível para agendamento ou já ocupado.", None
+            # Verificar o horário contra expediente, bloqueios e agendamentos existentes
+            if not self.disponibilidade_service.horario_disponivel(
+                funcionario, duracao, data_hora_inicio
+            ):
+                return False, "Horário não disponível para agendamento ou já ocupado.", None
 
-        # VERIFICAÇÃO DE CONFLITO FINAL (MAIS ROBUSTA)
-        conflitos_existentes = Agendamento.objects.filter(
-            funcionario=funcionario,
-            data_hora_inicio__lt=data_hora_fim,
-            data_hora_fim__gt=data_hora_inicio,
-            status__in=["confirmado", "em_andamento"]
-        ).exists()
-
-        if conflitos_existentes:
-            return False, "O horário selecionado foi recentemente ocupado. Por favor, escolha outro.", None
-
-        try:
-            # Obter preço do serviço
             try:
-                func_servico = FuncionarioServico.objects.get(
-                    funcionario=funcionario, servico=servico
-                )
-                preco = func_servico.get_preco_final()
-            except FuncionarioServico.DoesNotExist:
-                preco = servico.preco
+                # Criar o agendamento
+                with transaction.atomic():
+                    agendamento = Agendamento.objects.create(
+                        empresa=self.empresa,
+                        cliente=cliente,
+                        funcionario=funcionario,
+                        servico=servico,
+                        data_hora_inicio=data_hora_inicio,
+                        data_hora_fim=data_hora_fim,
+                        preco_cobrado=preco,
+                        status="confirmado"
+                    )
 
-            # Criar o agendamento
-            agendamento = Agendamento.objects.create(
-                empresa=self.empresa,
-                cliente=cliente,
-                funcionario=funcionario,
-                servico=servico,
-                data_hora_inicio=data_hora_inicio,
-                data_hora_fim=data_hora_fim,
-                preco_cobrado=preco,
-                status="confirmado"
-            )
+                    # Notificação via WhatsApp, gravada na caixa de saída na mesma transação
+                    if cliente.telefone:
+                        mensagem = (
+                            f"Olá {cliente.nome}, seu horário com {funcionario.nome} foi confirmado "
+                            f"para o dia {data_hora_inicio.strftime('%d/%m/%Y')} às {data_hora_inicio.strftime('%H:%M')}."
+                        )
+                        enfileirar_whatsapp(mensagem, cliente.numero_whatsapp)
+            except Exception as e:
+                return False, f"Erro ao criar agendamento: {str(e)}", None
 
-            # Enviar notificação via WhatsApp
-            mensagem = (
-                f"Olá {cliente.nome}, seu horário com {funcionario.nome} foi confirmado "
-                f"para o dia {data_hora_inicio.strftime('%d/%m/%Y')} às {data_hora_inicio.strftime('%H:%M')}."
-            )
-            numero_cliente = f"whatsapp:+55{''.join(filter(str.isdigit, cliente.telefone))}"
-            enviar_whatsapp(mensagem, numero_cliente)
+        return True, "Agendamento criado com sucesso!", agendamento
 
-            return True, "Agendamento criado com sucesso!", agendamento
+    async def acriar_agendamento(
+        self,
+        cliente: Cliente,
+        funcionario: Funcionario,
+        servico: Servico,
+        data_hora_inicio: datetime
+    ) -> Tuple[bool, str, Optional[Agendamento]]:
+        """
+        Versão assíncrona de criar_agendamento, para views async.
 
-        except Exception as e:
-            return False, f"Erro ao criar agendamento: {str(e)}", None
+        A reserva roda inteira numa thread de banco, pois a trava da agenda e
+        a verificação do horário precisam da mesma transação.
+        """
+        return await sync_to_async(self.criar_agendamento)(cliente, funcionario, servico, data_hora_inicio)
 
 class FilaEsperaService:
     """
     Serviço responsável por gerenciar a fila de espera.
     """
     
+    # Distância máxima, em dias, entre a data desejada e a vaga para quem aceita outras datas
+    JANELA_DIAS = 3
+    # Número de clientes notificados por horário vago
+    LIMITE_NOTIFICACOES = 3
+
     def __init__(self, empresa: Empresa):
         self.empresa = empresa
 
@@ -365,45 +756,157 @@ class FilaEsperaService:
         except Exception as e:
             return False, f"Erro ao adicionar à fila de espera: {str(e)}", None
 
+    async def aadicionar_a_fila(
+        self,
+        cliente: Cliente,
+        data_desejada: date,
+        servico: Optional[Servico] = None,
+        funcionario_preferido: Optional[Funcionario] = None,
+        horario_desejado: Optional[time] = None,
+        flexivel_data: bool = True,
+        flexivel_horario: bool = True,
+        observacoes: str = ""
+    ) -> Tuple[bool, str, Optional[FilaEspera]]:
+        """
+        Versão assíncrona de adicionar_a_fila (ORM assíncrono do Django).
+        """
+        try:
+            fila_espera_entry = await FilaEspera.objects.acreate(
+                empresa=self.empresa,
+                cliente=cliente,
+                servico=servico,
+                funcionario_preferido=funcionario_preferido,
+                data_desejada=data_desejada,
+                horario_desejado=horario_desejado,
+                flexivel_data=flexivel_data,
+                flexivel_horario=flexivel_horario,
+                observacoes=observacoes
+            )
+            return True, "Adicionado à fila de espera com sucesso!", fila_espera_entry
+        except Exception as e:
+            return False, f"Erro ao adicionar à fila de espera: {str(e)}", None
+
     def verificar_e_notificar_fila(
         self, 
         funcionario: Funcionario, 
         data_hora_vaga: datetime,
-        servico_vago: Optional[Servico] = None
-    ):
+        servico_vago: Optional[Servico] = None,
+        duracao_livre: Optional[int] = None,
+        limite: Optional[int] = None
+    ) -> List[FilaEspera]:
         """
-        Verifica a fila de espera por clientes que possam se encaixar em um horário vago
-        e os notifica.
+        Procura na fila de espera os clientes que se encaixam em um horário vago
+        e notifica os melhores colocados.
+
+        A filtragem e a pontuação são feitas no banco, de modo que apenas os
+        `limite` melhores candidatos são carregados, mesmo com dezenas de
+        milhares de entradas na fila. Um candidato se encaixa quando:
+
+        - deseja o mesmo dia ou aceita datas próximas (flexivel_data) dentro
+          de JANELA_DIAS dias;
+        - não tem horário desejado, aceita outros horários (flexivel_horario)
+          ou deseja exatamente o horário vago;
+        - não tem funcionário preferido ou prefere o funcionário da vaga;
+        - não escolheu serviço ou escolheu um serviço que o funcionário oferece
+          e que cabe no tempo livre.
+
+        Args:
+            funcionario: Funcionário com o horário vago
+            data_hora_vaga: Início do horário vago
+            servico_vago: Serviço do agendamento que liberou o horário (opcional)
+            duracao_livre: Tempo livre em minutos; se omitido, usa a duração de
+                servico_vago para o funcionário
+            limite: Número máximo de clientes notificados (padrão: LIMITE_NOTIFICACOES)
+
+        Returns:
+            As entradas da fila notificadas, da melhor para a pior pontuação
         """
-        # Lógica para encontrar clientes na fila que se encaixam no horário
-        # e enviar notificações (e-mail, SMS, etc.)
-        # Esta é uma lógica complexa que pode envolver tarefas assíncronas (Celery)
-        # Por enquanto, vamos apenas simular a notificação.
+        limite = self.LIMITE_NOTIFICACOES if limite is None else limite
+        catalogo = get_catalogo(self.empresa.pk)
+        inicio = timezone.localtime(data_hora_vaga)
+        dia = inicio.date()
+        hora = inicio.time()
 
-        # Exemplo simplificado: encontrar clientes que desejam o serviço e funcionário
-        # e que são flexíveis com data/horário ou que a data/horário desejado se encaixa
-        
-        candidatos = FilaEspera.objects.filter(
-            empresa=self.empresa,
-            notificado=False, # Ainda não notificado
-            ativo=True,
-            data_desejada__lte=data_hora_vaga.date() # Data desejada é anterior ou igual à vaga
-        ).order_by("prioridade", "data_solicitacao")
+        if duracao_livre is None and servico_vago is not None:
+            vinculo = catalogo.get_vinculo(funcionario.pk, servico_vago.pk)
+            duracao_livre = vinculo.duracao if vinculo else None
 
-        if servico_vago:
-            candidatos = candidatos.filter(Q(servico=servico_vago) | Q(servico__isnull=True))
-        
-        if funcionario:
-            candidatos = candidatos.filter(Q(funcionario_preferido=funcionario) | Q(funcionario_preferido__isnull=True))
+        # Serviços que o funcionário oferece e que cabem no tempo livre
+        servicos_que_cabem = [
+            servico_id
+            for (funcionario_id, servico_id), vinculo in catalogo.vinculos.items()
+            if funcionario_id == funcionario.pk
+            and (duracao_livre is None or vinculo.duracao <= duracao_livre)
+        ]
 
-        for entry in candidatos:
-            # Lógica mais complexa aqui para verificar se o slot realmente atende a preferência
-            # Por exemplo, se o cliente não é flexível, o horário deve ser exatamente o desejado
-            
-            # Simulação de notificação
-            print(f"Notificando cliente {entry.cliente.nome} sobre horário vago: {data_hora_vaga}")
-            entry.marcar_como_notificado()
-            # Aqui você integraria com um serviço de e-mail/SMS
+        janela = timedelta(days=self.JANELA_DIAS)
+        vaga = datetime.combine(dia, hora)
+        hora_proxima = (
+            max(vaga - timedelta(hours=1), datetime.combine(dia, time.min)).time(),
+            min(vaga + timedelta(hours=1), datetime.combine(dia, time.max)).time(),
+        )
+        # Pontuação: proximidade da data e do horário desejados, funcionário
+        # preferido e mesmo serviço da vaga
+        pontuacao = (
+            Case(
+                When(data_desejada=dia, then=Value(40)),
+                When(data_desejada__range=(dia - timedelta(days=1), dia + timedelta(days=1)), then=Value(25)),
+                default=Value(10),
+            )
+            + Case(
+                When(horario_desejado=hora, then=Value(40)),
+                When(horario_desejado__range=hora_proxima, then=Value(25)),
+                When(horario_desejado__isnull=True, then=Value(20)),
+                default=Value(10),
+            )
+            + Case(When(funcionario_preferido=funcionario, then=Value(20)), default=Value(0))
+        )
+        if servico_vago is not None:
+            pontuacao += Case(When(servico=servico_vago, then=Value(10)), default=Value(0))
+
+        candidatos = (
+            FilaEspera.objects.filter(
+                empresa=self.empresa,
+                ativo=True,
+                notificado=False,
+                # Limite externo da janela, atendido pelo índice da fila
+                data_desejada__range=(dia - janela, dia + janela),
+            )
+            .filter(Q(data_desejada=dia) | Q(flexivel_data=True))
+            .filter(
+                Q(horario_desejado__isnull=True)
+                | Q(flexivel_horario=True)
+                | Q(horario_desejado=hora)
+            )
+            .filter(Q(funcionario_preferido__isnull=True) | Q(funcionario_preferido=funcionario))
+            .filter(Q(servico__isnull=True) | Q(servico_id__in=servicos_que_cabem))
+            .annotate(pontuacao=pontuacao)
+            .select_related("cliente")
+            .order_by("-pontuacao", "prioridade", "data_solicitacao", "id")[:limite]
+        )
+        notificados = list(candidatos)
+        if not notificados:
+            return []
+
+        agora = timezone.now()
+        mensagens = []
+        for entrada in notificados:
+            entrada.notificado = True
+            entrada.data_notificacao = agora
+            if entrada.cliente.telefone:
+                mensagens.append((
+                    f"Olá {entrada.cliente.nome}, abriu um horário com {funcionario.nome} "
+                    f"no dia {dia.strftime('%d/%m/%Y')} às {hora.strftime('%H:%M')}. "
+                    f"Faça seu agendamento antes que ele seja ocupado!",
+                    entrada.cliente.numero_whatsapp
+                ))
+
+        # Marcação e mensagens na mesma transação: ou o cliente é marcado e
+        # avisado, ou nenhum dos dois
+        with transaction.atomic():
+            FilaEspera.objects.bulk_update(notificados, ["notificado", "data_notificacao"])
+            enfileirar_whatsapp_lote(mensagens)
+        return notificados
 
     def remover_da_fila(self, fila_espera_entry: FilaEspera) -> bool:
         """
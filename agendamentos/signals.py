@@ -0,0 +1,205 @@
+"""
+Sinais que mantêm consistentes o cache de disponibilidade e o catálogo das
+empresas, que registram os horários liberados por cancelamentos e faltas e
+que mantêm o resumo diário por funcionário (ResumoDiario).
+
+Toda alteração de agendamento ou de disponibilidade gera uma nova versão da
+agenda do funcionário no(s) dia(s) afetado(s); alterações nos parâmetros da
+empresa, nos serviços, nos vínculos funcionário-serviço ou nas regras
+semanais de disponibilidade geram uma nova versão do catálogo e invalidam
+todas as agendas da empresa. As invalidações são feitas após o commit, para
+que nenhum leitor grave no cache, sob a versão nova, um resultado calculado
+com dados ainda não confirmados.
+
+Alterações na empresa, em seus parâmetros, serviços ou funcionários também
+geram, após o commit, novas versões das páginas públicas em cache (ver
+paginas.py).
+
+Já as vagas liberadas (ver vagas.py) são gravadas na própria transação que
+altera o status do agendamento, como numa caixa de saída, assim como a
+diferença que a alteração causa no resumo diário (ver resumos.py).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Empresa, ParametrosEmpresa
+from funcionarios.models import DisponibilidadeFuncionario, Funcionario, RegraDisponibilidade
+from servicos.models import FuncionarioServico, Servico
+from . import cache as cache_disponibilidade
+from . import paginas, resumos
+from .catalogo import invalidar_catalogo
+from .models import Agendamento
+from .vagas import STATUS_LIBERAM_AGENDA, marcar_preenchidas, registrar_vaga
+
+
+def _dias_agendamento(agendamento):
+    """
+    Retorna os pares (funcionario_id, dia local) ocupados pelo agendamento,
+    do dia de início ao de fim, ou () se incompleto.
+    """
+    inicio = agendamento.__dict__.get("data_hora_inicio")
+    fim = agendamento.__dict__.get("data_hora_fim")
+    funcionario_id = agendamento.__dict__.get("funcionario_id")
+    if inicio is None or funcionario_id is None:
+        return ()
+    if timezone.is_aware(inicio):
+        inicio = timezone.localtime(inicio)
+    if fim is not None and timezone.is_aware(fim):
+        fim = timezone.localtime(fim)
+    dias = [inicio.date()]
+    while fim is not None and dias[-1] < fim.date():
+        dias.append(dias[-1] + timedelta(days=1))
+    return tuple((funcionario_id, dia) for dia in dias)
+
+
+def _dia_disponibilidade(disponibilidade):
+    """Retorna (funcionario_id, data) da disponibilidade, ou None se incompleta."""
+    data = disponibilidade.__dict__.get("data")
+    funcionario_id = disponibilidade.__dict__.get("funcionario_id")
+    if data is None or funcionario_id is None:
+        return None
+    return funcionario_id, data
+
+
+def _invalidar_dias(*dias):
+    dias = {dia for dia in dias if dia is not None}
+
+    def invalidar():
+        for funcionario_id, dia in dias:
+            cache_disponibilidade.invalidar_dia(funcionario_id, dia)
+
+    if dias:
+        transaction.on_commit(invalidar)
+
+
+@receiver(post_init, sender=Agendamento)
+def guardar_dia_original_agendamento(sender, instance, **kwargs):
+    # Guardado para invalidar também os dias antigos quando o horário é alterado
+    instance._dias_agenda_original = _dias_agendamento(instance)
+    instance._status_original = instance.__dict__.get("status")
+    instance._resumo_original = resumos.contribuicao(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Agendamento)
+@receiver(post_delete, sender=Agendamento)
+def invalidar_agenda_agendamento(sender, instance, **kwargs):
+    dias_atuais = _dias_agendamento(instance)
+    _invalidar_dias(*getattr(instance, "_dias_agenda_original", ()), *dias_atuais)
+    instance._dias_agenda_original = dias_atuais
+
+
+@receiver(post_save, sender=Agendamento)
+def registrar_vaga_agendamento(sender, instance, created, **kwargs):
+    ocupava = not created and instance._status_original in Agendamento.STATUS_OCUPAM_AGENDA
+    ocupa = instance.status in Agendamento.STATUS_OCUPAM_AGENDA
+    if ocupava and instance.status in STATUS_LIBERAM_AGENDA:
+        registrar_vaga(instance)
+    elif ocupa and not ocupava:
+        marcar_preenchidas(instance)
+    instance._status_original = instance.status
+
+
+@receiver(pre_save, sender=Agendamento)
+@receiver(pre_delete, sender=Agendamento)
+def guardar_resumo_original_agendamento(sender, instance, **kwargs):
+    # Instâncias carregadas com .only()/.defer() não têm a contribuição em memória
+    if instance._resumo_original is None and not instance._state.adding and instance.pk:
+        instance._resumo_original = resumos.contribuicao_do_banco(instance.pk)
+
+
+@receiver(post_save, sender=Agendamento)
+def atualizar_resumo_agendamento(sender, instance, created, **kwargs):
+    antes = None if created else instance._resumo_original
+    depois = resumos.contribuicao(instance) or resumos.contribuicao_do_banco(instance.pk)
+    if antes != depois:
+        resumos.aplicar([antes] if antes else [], [depois] if depois else [])
+    instance._resumo_original = depois
+
+
+@receiver(post_delete, sender=Agendamento)
+def remover_resumo_agendamento(sender, instance, **kwargs):
+    antes = instance._resumo_original
+    if antes:
+        resumos.aplicar(antes=[antes])
+    instance._resumo_original = None
+
+
+@receiver(post_init, sender=DisponibilidadeFuncionario)
+def guardar_dia_original_disponibilidade(sender, instance, **kwargs):
+    instance._dia_agenda_original = _dia_disponibilidade(instance)
+
+
+@receiver(post_save, sender=DisponibilidadeFuncionario)
+@receiver(post_delete, sender=DisponibilidadeFuncionario)
+def invalidar_agenda_disponibilidade(sender, instance, **kwargs):
+    dia_atual = _dia_disponibilidade(instance)
+    _invalidar_dias(getattr(instance, "_dia_agenda_original", None), dia_atual)
+    instance._dia_agenda_original = dia_atual
+
+
+def _invalidar_empresa(empresa_id):
+    def invalidar():
+        invalidar_catalogo(empresa_id)
+        cache_disponibilidade.invalidar_empresa(empresa_id)
+
+    if empresa_id is not None:
+        transaction.on_commit(invalidar)
+
+
+@receiver(post_save, sender=ParametrosEmpresa)
+@receiver(post_delete, sender=ParametrosEmpresa)
+@receiver(post_save, sender=Servico)
+@receiver(post_delete, sender=Servico)
+def invalidar_catalogo_empresa(sender, instance, **kwargs):
+    _invalidar_empresa(instance.empresa_id)
+
+
+@receiver(post_save, sender=FuncionarioServico)
+@receiver(post_delete, sender=FuncionarioServico)
+def invalidar_catalogo_vinculo(sender, instance, **kwargs):
+    if FuncionarioServico.servico.is_cached(instance):
+        empresa_id = instance.servico.empresa_id
+    else:
+        empresa_id = Servico.objects.filter(pk=instance.servico_id).values_list("empresa_id", flat=True).first()
+    _invalidar_empresa(empresa_id)
+
+
+@receiver(post_save, sender=RegraDisponibilidade)
+@receiver(post_delete, sender=RegraDisponibilidade)
+def invalidar_catalogo_regra(sender, instance, **kwargs):
+    if RegraDisponibilidade.funcionario.is_cached(instance):
+        empresa_id = instance.funcionario.empresa_id
+    else:
+        empresa_id = Funcionario.objects.filter(pk=instance.funcionario_id).values_list("empresa_id", flat=True).first()
+    _invalidar_empresa(empresa_id)
+
+
+def _invalidar_paginas(empresa_id, home=False):
+    def invalidar():
+        paginas.invalidar_empresa(empresa_id)
+        if home:
+            paginas.invalidar_home()
+
+    if empresa_id is not None:
+        transaction.on_commit(invalidar)
+
+
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_paginas_empresa(sender, instance, **kwargs):
+    # A lista de empresas mostra apenas dados da própria empresa
+    _invalidar_paginas(instance.pk, home=True)
+
+
+@receiver(post_save, sender=ParametrosEmpresa)
+@receiver(post_delete, sender=ParametrosEmpresa)
+@receiver(post_save, sender=Servico)
+@receiver(post_delete, sender=Servico)
+@receiver(post_save, sender=Funcionario)
+@receiver(post_delete, sender=Funcionario)
+def invalidar_pagina_empresa(sender, instance, **kwargs):
+    _invalidar_paginas(instance.empresa_id)
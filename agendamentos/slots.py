@@ -0,0 +1,157 @@
+"""
+Motor de geração de slots de horários.
+
+Representa o dia de um funcionário como intervalos em segundos desde a
+meia-noite. Os períodos ocupados são ordenados e mesclados uma única vez e
+os candidatos são percorridos com um ponteiro que só avança, de modo que o
+custo é proporcional a (slots + ocupados) e não a (slots x ocupados).
+"""
+from datetime import time
+from typing import Iterable, List, Tuple
+
+Intervalo = Tuple[int, int]
+
+SEGUNDOS_DIA = 24 * 60 * 60
+
+
+def para_segundos(horario: time) -> int:
+    """Converte um horário para segundos desde a meia-noite (ignorando microssegundos)."""
+    return horario.hour * 3600 + horario.minute * 60 + horario.second
+
+
+def _para_segundos_teto(horario: time) -> int:
+    """Converte um horário para segundos desde a meia-noite, arredondando para cima."""
+    return para_segundos(horario) + (1 if horario.microsecond else 0)
+
+
+def _proximo_slot(slot: int, alvo: int, passo: int) -> int:
+    """Retorna o primeiro slot da grade iniciada em `slot` que é maior ou igual a `alvo`."""
+    if slot >= alvo:
+        return slot
+    return slot + -(-(alvo - slot) // passo) * passo
+
+
+def _converter(intervalos: Iterable[Tuple[time, time]]) -> List[Intervalo]:
+    """Converte intervalos para segundos, arredondando o fim para cima."""
+    return [(para_segundos(inicio), _para_segundos_teto(fim)) for inicio, fim in intervalos]
+
+
+def _mesclar(intervalos: List[Intervalo]) -> List[Intervalo]:
+    mesclados: List[Intervalo] = []
+    for inicio, fim in sorted(intervalos):
+        if fim < inicio:
+            continue
+        if mesclados and inicio <= mesclados[-1][1]:
+            if fim > mesclados[-1][1]:
+                mesclados[-1] = (mesclados[-1][0], fim)
+        else:
+            mesclados.append((inicio, fim))
+    return mesclados
+
+
+def mesclar_intervalos(intervalos: Iterable[Tuple[time, time]]) -> List[Intervalo]:
+    """
+    Ordena e mescla intervalos que se sobrepõem ou se tocam.
+
+    Intervalos invertidos (fim antes do início) não entram na mesclagem;
+    calcular_inicios_livres os trata à parte. Intervalos de duração zero são
+    mantidos: conflitam com os slots que contêm o instante estritamente.
+
+    Returns:
+        Lista ordenada de intervalos disjuntos (inicio, fim) em segundos
+    """
+    return _mesclar(_converter(intervalos))
+
+
+def calcular_inicios_livres(
+    periodos_trabalho: List[Tuple[time, time]],
+    periodos_ocupados: Iterable[Tuple[time, time]],
+    duracao: int,
+    intervalo: int,
+    inicio_minimo: int = 0
+) -> List[int]:
+    """
+    Calcula os inícios de slots livres de um dia.
+
+    Os slots de cada período de trabalho começam no início do período e
+    avançam de `intervalo` em `intervalo` minutos, como na grade exibida ao
+    cliente. Um slot é livre se cabe inteiro no período, não se sobrepõe a
+    nenhum período ocupado e começa em `inicio_minimo` ou depois.
+
+    Args:
+        periodos_trabalho: Períodos de trabalho, na ordem em que devem ser percorridos
+        periodos_ocupados: Períodos ocupados (agendamentos, bloqueios, folgas)
+        duracao: Duração do serviço em minutos
+        intervalo: Intervalo entre slots em minutos
+        inicio_minimo: Primeiro início aceito, em segundos desde a meia-noite
+
+    Returns:
+        Lista de inícios livres em segundos desde a meia-noite
+    """
+    convertidos = _converter(periodos_ocupados)
+    ocupados = _mesclar(convertidos)
+    # Intervalos invertidos (dados inconsistentes) seguem o teste de
+    # sobreposição original: conflitam com os slots que começam antes do
+    # fim e terminam depois do início do intervalo
+    invertidos = [(inicio, fim) for inicio, fim in convertidos if fim < inicio]
+    duracao_seg = duracao * 60
+    passo = intervalo * 60
+    inicios: List[int] = []
+
+    for inicio_trabalho, fim_trabalho in periodos_trabalho:
+        fim = para_segundos(fim_trabalho)
+        slot = _proximo_slot(para_segundos(inicio_trabalho), inicio_minimo, passo)
+        indice = 0
+
+        while slot + duracao_seg <= fim:
+            # Descartar períodos ocupados que terminam antes do slot atual
+            while indice < len(ocupados) and ocupados[indice][1] <= slot:
+                indice += 1
+
+            if indice < len(ocupados) and ocupados[indice][0] < slot + duracao_seg:
+                # Conflito: saltar para o primeiro slot após o fim do período ocupado
+                slot = _proximo_slot(slot, ocupados[indice][1], passo)
+                continue
+
+            if not any(slot < fim_inv and slot + duracao_seg > inicio_inv for inicio_inv, fim_inv in invertidos):
+                inicios.append(slot)
+            slot += passo
+
+    return inicios
+
+
+def slot_disponivel(
+    periodos_trabalho: List[Tuple[time, time]],
+    periodos_ocupados: Iterable[Tuple[time, time]],
+    inicio: int,
+    duracao: int,
+    intervalo: int
+) -> bool:
+    """
+    Verifica se um único slot seria gerado por calcular_inicios_livres.
+
+    O slot precisa caber em algum período de trabalho, estar alinhado à grade
+    desse período e não se sobrepor a nenhum período ocupado. Não considera a
+    antecedência mínima.
+
+    Args:
+        periodos_trabalho: Períodos de trabalho do dia
+        periodos_ocupados: Períodos ocupados do dia
+        inicio: Início do slot em segundos desde a meia-noite
+        duracao: Duração do serviço em minutos
+        intervalo: Intervalo entre slots em minutos
+    """
+    fim = inicio + duracao * 60
+    na_grade = any(
+        para_segundos(inicio_trabalho) <= inicio
+        and fim <= para_segundos(fim_trabalho)
+        and (inicio - para_segundos(inicio_trabalho)) % (intervalo * 60) == 0
+        for inicio_trabalho, fim_trabalho in periodos_trabalho
+    )
+    if not na_grade:
+        return False
+
+    return not any(
+        inicio < ocupado_fim and fim > ocupado_inicio
+        for ocupado_inicio, ocupado_fim in _converter(periodos_ocupados)
+    )
@@ -26,7 +26,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Event listeners
     if (verificarBtn) {
-        verificarBtn.addEventListener('click', verificarDisponibilidade);
+        verificarBtn.addEventListener('click', () => verificarDisponibilidade(false));
     }
 
     if (confirmarBtn) {
@@ -49,7 +49,7 @@ document.addEventListener('DOMContentLoaded', function() {
         finalizarFilaEsperaBtn.addEventListener('click', finalizarFilaEspera);
     }
 
-    function verificarDisponibilidade() {
+    function verificarDisponibilidade(revalidar) {
         const servicoId = servicoSelect.value;
         const funcionarioId = funcionarioSelect.value;
         const data = dataSelect.value;
@@ -69,18 +69,16 @@ document.addEventListener('DOMContentLoaded', function() {
         verificarBtn.disabled = true;
         verificarBtn.textContent = 'Verificando...';
 
-        // Fazer requisição para verificar disponibilidade
-        fetch(`/empresa/${empresaId}/verificar_disponibilidade/`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': getCookie('csrftoken')
-            },
-            body: JSON.stringify({
-                funcionario_id: funcionarioId,
-                servico_id: servicoId,
-                data: data
-            })
+        // Fazer requisição para verificar disponibilidade (GET: o navegador
+        // reutiliza a resposta ou a revalida com If-None-Match; após uma
+        // reserva, sempre revalida)
+        const params = new URLSearchParams({
+            funcionario_id: funcionarioId,
+            servico_id: servicoId,
+            data: data
+        });
+        fetch(`/empresa/${empresaId}/verificar_disponibilidade/?${params}`, {
+            cache: revalidar ? 'no-cache' : 'default'
         })
         .then(response => response.json())
         .then(data => {
@@ -206,7 +204,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 alert("Agendamento realizado com sucesso para " + data.data_hora + "!");
                 $("#confirmarAgendamentoModal").modal("hide");
                 
-                verificarDisponibilidade(); 
+                verificarDisponibilidade(true); 
                 limparFormulario();
 
             } else {
@@ -1,3 +1,1172 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time as relogio
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, close_old_connections, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.models import Empresa, Notificacao, ParametrosEmpresa
+from core.testing import OrcamentoConsultasMixin
+from funcionarios.models import DisponibilidadeFuncionario, Funcionario, RegraDisponibilidade
+from servicos.models import FuncionarioServico, Servico
+from .cache import CacheDisponibilidade, _chave_versao_dia
+from .catalogo import Vinculo, _chave_versao, get_catalogo
+from .models import Agendamento, FilaEspera, ResumoDiario, VagaLiberada
+from .resumos import reconstruir, totais_por_funcionario
+from .services import AgendamentoService, DisponibilidadeService, FilaEsperaService
+from .slots import calcular_inicios_livres, para_segundos, slot_disponivel
+from .vagas import inicio_oferecido, metricas_vagas, processar_lote
+
+
+def criar_empresa(funcionarios=1):
+    """Cria uma empresa aberta todos os dias, com um serviço de 30 minutos."""
+    empresa = Empresa.objects.create(
+        nome="Barbearia Teste",
+        cnpj="00.000.000/0001-00",
+        email="contato@barbearia.com",
+        telefone="11999999999",
+        endereco="Rua Teste, 1"
+    )
+    ParametrosEmpresa.objects.create(
+        empresa=empresa,
+        horario_abertura=time(9, 0),
+        horario_fechamento=time(18, 0),
+        intervalo_agendamento=30,
+        dias_funcionamento="seg,ter,qua,qui,sex,sab,dom",
+        antecedencia_minima=0
+    )
+    servico = Servico.objects.create(
+        empresa=empresa, nome="Corte", duracao=30, preco=Decimal("40.00")
+    )
+    lista_funcionarios = []
+    for i in range(funcionarios):
+        funcionario = Funcionario.objects.create(
+            empresa=empresa,
+            nome=f"Barbeiro {i}",
+            email=f"barbeiro{i}@barbearia.com",
+            telefone="11988888888",
+            cargo="Barbeiro",
+            data_contratacao=date(2020, 1, 1)
+        )
+        FuncionarioServico.objects.create(funcionario=funcionario, servico=servico)
+        lista_funcionarios.append(funcionario)
+    return empresa, servico, lista_funcionarios
+
+
+class CriarAgendamentoConcorrenteTest(TransactionTestCase):
+    """Reservas simultâneas para o mesmo horário não podem gerar agendamentos sobrepostos."""
+
+    TENTATIVAS_POR_THREAD = 100
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, self.funcionarios = criar_empresa(funcionarios=2)
+        self.clientes = [
+            Cliente.objects.create(nome=f"Cliente {i}", email=f"cliente{i}@teste.com", telefone="11977777777")
+            for i in range(12)
+        ]
+        amanha = timezone.localdate() + timedelta(days=1)
+        self.horario = timezone.make_aware(datetime.combine(amanha, time(10, 0)))
+
+    def _reservar_em_paralelo(self, reservas):
+        """
+        Executa as reservas (cliente, funcionario) ao mesmo tempo, uma por thread.
+
+        Returns:
+            Lista de sucessos. Falhas que não sejam "horário ocupado" fazem o teste falhar.
+        """
+        resultados = []
+        barreira = threading.Barrier(len(reservas))
+
+        def reservar(cliente, funcionario):
+            try:
+                barreira.wait()
+                for _ in range(self.TENTATIVAS_POR_THREAD):
+                    try:
+                        sucesso, mensagem, _ = AgendamentoService(self.empresa).criar_agendamento(
+                            cliente, funcionario, self.servico, self.horario
+                        )
+                    except OperationalError:
+                        # Banco ocupado por outra reserva: tentar novamente
+                        relogio.sleep(0.01)
+                        continue
+                    resultados.append((sucesso, mensagem))
+                    return
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=reservar, args=reserva) for reserva in reservas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for sucesso, mensagem in resultados:
+            if not sucesso:
+                self.assertEqual(mensagem, "Horário não disponível para agendamento ou já ocupado.")
+        return [sucesso for sucesso, _ in resultados]
+
+    def test_apenas_uma_reserva_por_horario(self):
+        funcionario = self.funcionarios[0]
+        resultados = self._reservar_em_paralelo(
+            [(cliente, funcionario) for cliente in self.clientes]
+        )
+
+        self.assertEqual(len(resultados), len(self.clientes))
+        self.assertEqual(resultados.count(True), 1)
+        self.assertEqual(
+            Agendamento.objects.filter(funcionario=funcionario, status="confirmado").count(), 1
+        )
+
+    def test_funcionarios_diferentes_reservam_o_mesmo_horario(self):
+        reservas = [
+            (cliente, self.funcionarios[i % 2]) for i, cliente in enumerate(self.clientes)
+        ]
+        resultados = self._reservar_em_paralelo(reservas)
+
+        self.assertEqual(resultados.count(True), 2)
+        for funcionario in self.funcionarios:
+            self.assertEqual(
+                Agendamento.objects.filter(funcionario=funcionario, status="confirmado").count(), 1
+            )
+
+
+def slots_referencia(periodos_trabalho, periodos_ocupados, duracao, intervalo):
+    """
+    Varredura slot a slot usada antes do motor de slots (slots.py), mantida
+    como referência: cada slot da grade é comparado com todos os ocupados.
+    """
+    inicios = []
+    for inicio_trabalho, fim_trabalho in periodos_trabalho:
+        slot = datetime.combine(date.min, inicio_trabalho)
+        fim = datetime.combine(date.min, fim_trabalho)
+        while slot + timedelta(minutes=duracao) <= fim:
+            slot_fim = slot + timedelta(minutes=duracao)
+            if not any(
+                slot.time() < ocupado_fim and slot_fim.time() > ocupado_inicio
+                for ocupado_inicio, ocupado_fim in periodos_ocupados
+            ):
+                inicios.append(para_segundos(slot.time()))
+            slot += timedelta(minutes=intervalo)
+    return inicios
+
+
+class MotorSlotsTest(SimpleTestCase):
+    """O motor de slots gera exatamente os horários da varredura slot a slot."""
+
+    def _horario(self, rnd, microssegundos=True):
+        return time(
+            rnd.randrange(6, 22), rnd.randrange(0, 60, 5), rnd.choice((0, 0, 30)),
+            rnd.choice((0, 0, 500)) if microssegundos else 0
+        )
+
+    def test_equivale_a_varredura_slot_a_slot(self):
+        rnd = random.Random(2024)
+        for caso in range(2000):
+            periodos_trabalho = sorted(
+                # Períodos de trabalho vêm de TimeFields, sem microssegundos
+                tuple(sorted((self._horario(rnd, False), self._horario(rnd, False))))
+                for _ in range(rnd.randint(1, 3))
+            )
+            periodos_ocupados = []
+            for _ in range(rnd.randint(0, 8)):
+                inicio = self._horario(rnd)
+                tipo = rnd.random()
+                if tipo < 0.1:
+                    fim = inicio  # duração zero
+                elif tipo < 0.2:
+                    fim = self._horario(rnd)  # possivelmente invertido
+                else:
+                    fim = min(
+                        (datetime.combine(date.min, inicio) + timedelta(minutes=rnd.randint(1, 120))).time(),
+                        time.max
+                    )
+                periodos_ocupados.append((inicio, fim))
+            duracao = rnd.choice((15, 30, 45, 60, 90, 300))
+            intervalo = rnd.choice((10, 15, 30, 60))
+
+            esperado = slots_referencia(periodos_trabalho, periodos_ocupados, duracao, intervalo)
+            with self.subTest(caso=caso):
+                self.assertEqual(
+                    calcular_inicios_livres(periodos_trabalho, periodos_ocupados, duracao, intervalo),
+                    esperado
+                )
+                # slot_disponivel concorda com a grade em cada início candidato
+                for inicio_trabalho, _ in periodos_trabalho[:1]:
+                    inicio = para_segundos(inicio_trabalho)
+                    self.assertEqual(
+                        slot_disponivel(periodos_trabalho, periodos_ocupados, inicio, duracao, intervalo),
+                        inicio in esperado
+                    )
+
+    def test_intervalos_degenerados(self):
+        trabalho = [(time(9, 0), time(18, 0))]
+        casos = [
+            # Duração zero: conflita apenas com slots que contêm o instante
+            ([(time(10, 15), time(10, 15))], 30, 30),
+            ([(time(10, 0), time(10, 0))], 30, 30),
+            # Invertido: conflita com slots que começam antes do fim e terminam depois do início
+            ([(time(12, 0), time(11, 0))], 30, 30),
+            ([(time(12, 0), time(11, 0))], 120, 30),
+        ]
+        for ocupados, duracao, intervalo in casos:
+            with self.subTest(ocupados=ocupados, duracao=duracao):
+                self.assertEqual(
+                    calcular_inicios_livres(trabalho, ocupados, duracao, intervalo),
+                    slots_referencia(trabalho, ocupados, duracao, intervalo)
+                )
+
+
+@override_settings(DISPONIBILIDADE_CACHE_TTL=0)
+class OrcamentoConsultasTest(OrcamentoConsultasMixin, TestCase):
+    """O número de consultas das views não pode crescer com o número de agendamentos."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, funcionarios = criar_empresa()
+        self.funcionario = funcionarios[0]
+        self.funcionario.user = User.objects.create_user("barbeiro", password="senha")
+        self.funcionario.save()
+        self.cliente = Cliente.objects.create(nome="Cliente", email="cliente@teste.com", telefone="11977777777")
+        self.dia = timezone.localdate() + timedelta(days=1)
+
+    def _criar_agendamentos(self, quantidade, primeiro=0):
+        """
+        Cria `quantidade` agendamentos confirmados no dia, de 30 em 30 minutos,
+        a partir do slot `primeiro` (0 = 9h).
+        """
+        inicio_dia = timezone.make_aware(datetime.combine(self.dia, time(9, 0)))
+        Agendamento.objects.bulk_create([
+            Agendamento(
+                empresa=self.empresa,
+                cliente=Cliente.objects.create(
+                    nome=f"Cliente {i}", email=f"cliente{i}@teste.com", telefone="11977777777"
+                ),
+                funcionario=self.funcionario,
+                servico=self.servico,
+                data_hora_inicio=inicio_dia + timedelta(minutes=30 * i),
+                data_hora_fim=inicio_dia + timedelta(minutes=30 * (i + 1)),
+                status="confirmado",
+                preco_cobrado=Decimal("40.00")
+            )
+            for i in range(primeiro, primeiro + quantidade)
+        ])
+
+    def test_disponibilidade(self):
+        # 1 agendamento e depois 10 agendamentos no dia
+        for quantidade, primeiro in ((1, 0), (9, 1)):
+            with self.subTest(agendamentos=primeiro + quantidade):
+                self._criar_agendamentos(quantidade, primeiro)
+                empresa = Empresa.objects.get(pk=self.empresa.pk)
+                # Catálogo frio (3) + disponibilidades e agendamentos do dia (2)
+                with self.assertMaximoConsultas(5):
+                    DisponibilidadeService(empresa).get_horarios_disponiveis(
+                        self.funcionario, self.servico, self.dia
+                    )
+
+    def test_view_verificar_disponibilidade(self):
+        self._criar_agendamentos(10)
+        url = reverse("agendamentos:verificar_disponibilidade", args=[self.empresa.id])
+        dados = {
+            "funcionario_id": self.funcionario.id,
+            "servico_id": self.servico.id,
+            "data": self.dia.isoformat(),
+        }
+        # Empresa, funcionário e serviço; catálogo frio (parâmetros, vínculos e
+        # regras semanais); disponibilidades e agendamentos do dia
+        with self.assertMaximoConsultas(8):
+            response = self.client.post(url, json.dumps(dados), content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_view_verificar_disponibilidade_periodo(self):
+        self._criar_agendamentos(10)
+        url = reverse("agendamentos:verificar_disponibilidade", args=[self.empresa.id])
+        dados = {"funcionario_id": self.funcionario.id, "servico_id": self.servico.id, "data_inicio": self.dia.isoformat()}
+        # Aquece o catálogo, para comparar apenas a consulta do período
+        self.client.post(url, {**dados, "dias": 1}, content_type="application/json")
+
+        consultas = {}
+        for dias in (1, 30):
+            with CaptureQueriesContext(connection) as capturadas:
+                response = self.client.post(url, {**dados, "dias": dias}, content_type="application/json")
+            self.assertEqual(len(response.json()["dias"]), dias)
+            consultas[dias] = len(capturadas)
+        self.assertEqual(consultas[1], consultas[30])
+
+    def test_view_verificar_disponibilidade_dados_invalidos(self):
+        url = reverse("agendamentos:verificar_disponibilidade", args=[self.empresa.id])
+        dados = {"funcionario_id": self.funcionario.id, "servico_id": self.servico.id}
+        for invalidos in (
+            {"dias": "abc"},
+            {"dias": 0},
+            {"dias": 10 ** 9},
+            {"data_inicio": "2025-13-40", "dias": 3},
+            {"data_fim": "amanhã"},
+        ):
+            with self.subTest(**invalidos):
+                response = self.client.post(url, {**dados, **invalidos}, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+
+        # Data única malformada, por GET e POST, e na busca com qualquer profissional
+        url_servico = reverse("agendamentos:verificar_disponibilidade_servico", args=[self.empresa.id])
+        for data in ("31/12/2030", "2030-02-30", ["2030-01-01"]):
+            with self.subTest(data=data):
+                if isinstance(data, str):
+                    self.assertEqual(self.client.get(url, {**dados, "data": data}).status_code, 400)
+                for endereco in (url, url_servico):
+                    response = self.client.post(
+                        endereco, {**dados, "data": data}, content_type="application/json"
+                    )
+                    self.assertEqual(response.status_code, 400)
+
+    @override_settings(CACHE_COMPARTILHADO=True)
+    def test_view_verificar_disponibilidade_get_condicional(self):
+        url = reverse("agendamentos:verificar_disponibilidade", args=[self.empresa.id])
+        dados = {"funcionario_id": self.funcionario.id, "servico_id": self.servico.id, "data": self.dia.isoformat()}
+        response = self.client.get(url, dados)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+
+        # Agenda inalterada: 304 apenas com empresa, funcionário e serviço
+        with self.assertMaximoConsultas(3):
+            response = self.client.get(url, dados, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # Uma reserva no dia gera nova versão da agenda e portanto novo ETag
+        inicio = timezone.make_aware(datetime.combine(self.dia, time(9, 0)))
+        with self.captureOnCommitCallbacks(execute=True):
+            Agendamento.objects.create(
+                empresa=self.empresa, cliente=self.cliente, funcionario=self.funcionario,
+                servico=self.servico, data_hora_inicio=inicio, data_hora_fim=inicio + timedelta(minutes=30),
+                status="confirmado", preco_cobrado=Decimal("40.00")
+            )
+        response = self.client.get(url, dados, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_view_verificar_disponibilidade_get_sem_cache_compartilhado(self):
+        # As versões de um cache local ao processo não valem entre processos
+        url = reverse("agendamentos:verificar_disponibilidade", args=[self.empresa.id])
+        dados = {"funcionario_id": self.funcionario.id, "servico_id": self.servico.id, "data": self.dia.isoformat()}
+        response = self.client.get(url, dados)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    @override_settings(CACHE_COMPARTILHADO=True)
+    def test_paginas_publicas_em_cache(self):
+        home = reverse("agendamentos:home")
+        detalhe = reverse("agendamentos:empresa_detail", args=[self.empresa.id])
+        self.client.get(home)
+        self.client.get(detalhe)
+
+        # Fragmentos em cache: nenhuma consulta na lista e só a empresa no detalhe
+        with self.assertMaximoConsultas(0):
+            self.assertContains(self.client.get(home), "Barbearia Teste")
+        with self.assertMaximoConsultas(1):
+            self.assertContains(self.client.get(detalhe), "Corte (30 min")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Servico.objects.create(empresa=self.empresa, nome="Barba", duracao=20, preco=Decimal("30.00"))
+            self.empresa.nome = "Barbearia Nova"
+            self.empresa.save()
+        self.assertContains(self.client.get(detalhe), "Barba (20 min")
+        self.assertContains(self.client.get(home), "Barbearia Nova")
+
+    def test_view_agenda_barbeiro(self):
+        self._criar_agendamentos(10)
+        self.client.force_login(self.funcionario.user)
+        url = reverse("agendamentos:agenda_barbeiro_data", args=[self.dia.year, self.dia.month, self.dia.day])
+        with self.assertMaximoConsultas(4):
+            response = self.client.get(url)
+        self.assertContains(response, "Cliente 9")
+
+    def test_view_agenda_barbeiro_mes(self):
+        self._criar_agendamentos(10)
+        Agendamento.objects.filter(data_hora_inicio__hour=9).update(status="cancelado")
+        self.client.force_login(self.funcionario.user)
+        url = reverse("agendamentos:agenda_barbeiro_mes_data", args=[self.dia.year, self.dia.month])
+        with self.assertMaximoConsultas(4):
+            response = self.client.get(url)
+
+        resumo = next(
+            dia["resumo"] for semana in response.context["semanas"] for dia in semana
+            if dia["data"] == self.dia
+        )
+        self.assertEqual(resumo["agendamentos"], 8)
+        self.assertEqual(resumo["cancelados"], 2)
+        self.assertEqual(resumo["minutos"], 240)
+        self.assertEqual(resumo["receita"], Decimal("320.00"))
+
+    def test_view_meus_agendamentos(self):
+        self._criar_agendamentos(10)
+        Agendamento.objects.update(cliente=self.cliente)
+        url = reverse("agendamentos:meus_agendamentos")
+        with self.assertMaximoConsultas(2):
+            response = self.client.get(url, {"email": self.cliente.email})
+        self.assertEqual(len(response.context["agendamentos"]), 10)
+
+    def test_historico_paginado_por_cursor(self):
+        self._criar_agendamentos(15)
+        Agendamento.objects.update(cliente=self.cliente)
+        url = reverse("agendamentos:api_historico_agendamentos")
+
+        vistos, cursor = [], None
+        while True:
+            parametros = {"email": self.cliente.email, "tamanho": 4}
+            if cursor:
+                parametros["cursor"] = cursor
+            # Cliente e página, com funcionário, serviço e empresa por JOIN
+            with self.assertMaximoConsultas(2):
+                dados = self.client.get(url, parametros).json()
+            vistos += [agendamento["datetime"] for agendamento in dados["agendamentos"]]
+            cursor = dados["proximo_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(len(vistos), 15)
+        self.assertEqual(vistos, sorted(vistos, reverse=True))
+        response = self.client.get(url, {"email": self.cliente.email, "cursor": "invalido"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse("agendamentos:historico_agendamentos"), {"email": self.cliente.email})
+        self.assertEqual(len(response.context["agendamentos"]), 15)
+
+    async def test_views_assincronas_de_reserva_e_fila(self):
+        dados = {
+            "cliente_nome": "Novo Cliente",
+            "cliente_email": "novo@teste.com",
+            "cliente_telefone": "11955555555",
+            "funcionario_id": self.funcionario.id,
+            "servico_id": self.servico.id,
+        }
+        horario = timezone.make_aware(datetime.combine(self.dia, time(10, 0)))
+        url = reverse("agendamentos:criar_agendamento", args=[self.empresa.id])
+        response = await self.async_client.post(
+            url, {**dados, "data_hora": horario.isoformat()}, content_type="application/json"
+        )
+        self.assertTrue(response.json()["success"])
+        # O mesmo horário não pode ser reservado duas vezes
+        response = await self.async_client.post(
+            url, {**dados, "data_hora": horario.isoformat()}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        url = reverse("agendamentos:verificar_disponibilidade", args=[self.empresa.id])
+        response = await self.async_client.post(
+            url, {"funcionario_id": self.funcionario.id, "servico_id": self.servico.id, "data": self.dia.isoformat()},
+            content_type="application/json"
+        )
+        self.assertNotIn(horario.isoformat(), [h["datetime"] for h in response.json()["horarios"]])
+
+        url = reverse("agendamentos:adicionar_fila_espera", args=[self.empresa.id])
+        response = await self.async_client.post(
+            url, {**dados, "data_desejada": self.dia.isoformat(), "horario_desejado": "10:00"},
+            content_type="application/json"
+        )
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(await FilaEspera.objects.filter(cliente__email="novo@teste.com").acount(), 1)
+
+    @override_settings(INSTRUMENTACAO_CABECALHOS=True)
+    def test_cabecalhos_de_instrumentacao(self):
+        response = self.client.get(reverse("agendamentos:meus_agendamentos"), {"email": self.cliente.email})
+        self.assertEqual(response["X-Consultas-SQL"], "2")
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+    @override_settings(INSTRUMENTACAO_CABECALHOS=True)
+    async def test_cabecalhos_de_instrumentacao_asgi(self):
+        # Views síncrona e assíncrona sob o handler ASGI
+        response = await self.async_client.get(
+            reverse("agendamentos:meus_agendamentos"), {"email": self.cliente.email}
+        )
+        self.assertEqual(response["X-Consultas-SQL"], "2")
+        response = await self.async_client.post(
+            reverse("agendamentos:verificar_disponibilidade", args=[self.empresa.id]),
+            {"funcionario_id": self.funcionario.id, "servico_id": self.servico.id, "data": self.dia.isoformat()},
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response["X-Consultas-SQL"]), 0)
+
+
+class QualquerProfissionalTest(TestCase):
+    """Horários de um serviço com qualquer profissional, juntando os de cada funcionário."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, (self.lento, self.rapido) = criar_empresa(funcionarios=2)
+        # O primeiro barbeiro leva 60 minutos no serviço; o segundo, os 30 do serviço
+        FuncionarioServico.objects.filter(funcionario=self.lento).update(duracao_especifica=60)
+        self.dia = timezone.localdate() + timedelta(days=1)
+        cliente = Cliente.objects.create(nome="Cliente", email="cliente@teste.com")
+        # Lento ocupado das 9h às 10h; rápido, das 10h às 10h30
+        for funcionario, inicio, fim in ((self.lento, time(9, 0), time(10, 0)), (self.rapido, time(10, 0), time(10, 30))):
+            Agendamento.objects.create(
+                empresa=self.empresa,
+                cliente=cliente,
+                funcionario=funcionario,
+                servico=self.servico,
+                data_hora_inicio=timezone.make_aware(datetime.combine(self.dia, inicio)),
+                data_hora_fim=timezone.make_aware(datetime.combine(self.dia, fim)),
+                status="confirmado",
+                preco_cobrado=Decimal("40.00")
+            )
+
+    def _horario(self, hora, minuto=0):
+        return timezone.make_aware(datetime.combine(self.dia, time(hora, minuto)))
+
+    def test_junta_os_horarios_e_usa_a_duracao_de_cada_funcionario(self):
+        horarios = dict(DisponibilidadeService(self.empresa).get_horarios_disponiveis_servico(self.servico, self.dia))
+
+        esperados = {
+            # Apenas o rápido está livre enquanto o lento atende
+            self._horario(9, 0): [self.rapido],
+            self._horario(9, 30): [self.rapido],
+            # O lento cabe das 10h às 11h; o rápido está ocupado
+            self._horario(10, 0): [self.lento],
+            # O lento das 10h30 às 11h30
+            self._horario(10, 30): [self.lento, self.rapido],
+            self._horario(17, 0): [self.lento, self.rapido],
+            # 60 minutos não cabem antes das 18h
+            self._horario(17, 30): [self.rapido],
+        }
+        for horario, funcionarios in esperados.items():
+            with self.subTest(horario=horario.time()):
+                self.assertEqual(horarios[horario], funcionarios)
+        # Cada horário das 9h às 17h30 aparece uma única vez
+        self.assertEqual(len(horarios), 18)
+
+    def test_horarios_coincidem_com_os_de_cada_funcionario(self):
+        service = DisponibilidadeService(self.empresa)
+        juntos = service.get_horarios_disponiveis_servico(self.servico, self.dia)
+        for funcionario in (self.lento, self.rapido):
+            with self.subTest(funcionario=funcionario.nome):
+                self.assertEqual(
+                    [horario for horario, livres in juntos if funcionario in livres],
+                    service.get_horarios_disponiveis(funcionario, self.servico, self.dia)
+                )
+
+    def test_view_lista_os_funcionarios_de_cada_horario(self):
+        url = reverse("agendamentos:verificar_disponibilidade_servico", args=[self.empresa.id])
+        response = self.client.post(
+            url,
+            json.dumps({"servico_id": self.servico.id, "data": self.dia.isoformat()}),
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        [dia] = response.json()["dias"]
+        funcionarios = {
+            horario["display"]: [funcionario["id"] for funcionario in horario["funcionarios"]]
+            for horario in dia["horarios"]
+        }
+        self.assertEqual(funcionarios["09:00"], [self.rapido.id])
+        self.assertEqual(funcionarios["10:00"], [self.lento.id])
+        self.assertEqual(funcionarios["10:30"], [self.lento.id, self.rapido.id])
+        self.assertEqual(funcionarios["17:30"], [self.rapido.id])
+
+
+class FilaEsperaTest(OrcamentoConsultasMixin, TestCase):
+    """Seleção dos clientes da fila de espera para um horário vago."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, funcionarios = criar_empresa(funcionarios=2)
+        self.funcionario, self.outro_funcionario = funcionarios
+        self.servico_longo = Servico.objects.create(
+            empresa=self.empresa, nome="Corte e Barba", duracao=60, preco=Decimal("70.00")
+        )
+        FuncionarioServico.objects.create(funcionario=self.funcionario, servico=self.servico_longo)
+        self.dia = timezone.localdate() + timedelta(days=2)
+        self.vaga = timezone.make_aware(datetime.combine(self.dia, time(10, 0)))
+
+    def _entrar_na_fila(self, nome, **kwargs):
+        cliente = Cliente.objects.create(
+            nome=nome, email=f"{nome.lower()}@teste.com", telefone="11977777777"
+        )
+        kwargs.setdefault("data_desejada", self.dia)
+        return FilaEspera.objects.create(empresa=self.empresa, cliente=cliente, **kwargs)
+
+    def test_notifica_apenas_candidatos_que_se_encaixam(self):
+        exato = self._entrar_na_fila("Exato", horario_desejado=time(10, 0), flexivel_horario=False)
+        flexivel = self._entrar_na_fila("Flexivel", data_desejada=self.dia + timedelta(days=2))
+        preferido = self._entrar_na_fila("Preferido", funcionario_preferido=self.funcionario)
+        # Não se encaixam: outro horário sem flexibilidade, data fora da janela ou
+        # sem flexibilidade, outro funcionário, serviço maior que a vaga
+        self._entrar_na_fila("Horario", horario_desejado=time(15, 0), flexivel_horario=False)
+        self._entrar_na_fila("Distante", data_desejada=self.dia + timedelta(days=10))
+        self._entrar_na_fila("Rigido", data_desejada=self.dia + timedelta(days=1), flexivel_data=False)
+        self._entrar_na_fila("Outro", funcionario_preferido=self.outro_funcionario)
+        self._entrar_na_fila("Longo", servico=self.servico_longo)
+
+        empresa = Empresa.objects.get(pk=self.empresa.pk)
+        with self.assertMaximoConsultas(8):
+            notificados = FilaEsperaService(empresa).verificar_e_notificar_fila(
+                self.funcionario, self.vaga, self.servico, limite=10
+            )
+
+        self.assertEqual(notificados, [exato, preferido, flexivel])
+        self.assertEqual(
+            set(FilaEspera.objects.filter(notificado=True).values_list("id", flat=True)),
+            {exato.id, preferido.id, flexivel.id}
+        )
+        self.assertEqual(Notificacao.objects.count(), 3)
+
+    def test_limite_de_notificacoes(self):
+        for i in range(5):
+            self._entrar_na_fila(f"Cliente{i}", prioridade=5 - i)
+
+        notificados = FilaEsperaService(self.empresa).verificar_e_notificar_fila(
+            self.funcionario, self.vaga, duracao_livre=60, limite=2
+        )
+
+        self.assertEqual([entrada.cliente.nome for entrada in notificados], ["Cliente4", "Cliente3"])
+        self.assertEqual(FilaEspera.objects.filter(notificado=False).count(), 3)
+
+
+class VagaLiberadaTest(TestCase):
+    """Horários liberados por cancelamentos e faltas oferecidos à fila de espera."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, funcionarios = criar_empresa()
+        self.funcionario = funcionarios[0]
+        self.funcionario.user = User.objects.create_user("barbeiro", password="senha")
+        self.funcionario.save()
+        self.dia = timezone.localdate() + timedelta(days=1)
+        self.inicio = timezone.make_aware(datetime.combine(self.dia, time(10, 0)))
+        self.agendamento = Agendamento.objects.create(
+            empresa=self.empresa,
+            cliente=Cliente.objects.create(nome="Cliente", email="cliente@teste.com", telefone="11977777777"),
+            funcionario=self.funcionario,
+            servico=self.servico,
+            data_hora_inicio=self.inicio,
+            status="confirmado"
+        )
+        self.client.force_login(self.funcionario.user)
+
+    def test_cancelamento_oferece_vaga_e_mede_preenchimento(self):
+        esperando = Cliente.objects.create(nome="Esperando", email="espera@teste.com", telefone="11966666666")
+        FilaEspera.objects.create(empresa=self.empresa, cliente=esperando, data_desejada=self.dia)
+
+        response = self.client.post(reverse("agendamentos:cancelar_agendamento", args=[self.agendamento.id]))
+        self.assertTrue(response.json()["success"])
+        vaga = VagaLiberada.objects.get()
+        self.assertEqual((vaga.status, vaga.motivo, vaga.data_hora_inicio), ("pendente", "cancelado", self.inicio))
+        # Nenhum cliente da fila é avisado durante a requisição
+        self.assertFalse(FilaEspera.objects.filter(notificado=True).exists())
+
+        resultado = processar_lote()
+        self.assertEqual(resultado["processadas"], 1)
+        vaga.refresh_from_db()
+        self.assertEqual((vaga.status, vaga.clientes_notificados), ("processada", 1))
+        self.assertTrue(FilaEspera.objects.get(cliente=esperando).notificado)
+
+        sucesso, _, novo = AgendamentoService(self.empresa).criar_agendamento(
+            esperando, self.funcionario, self.servico, self.inicio
+        )
+        self.assertTrue(sucesso)
+        vaga.refresh_from_db()
+        self.assertEqual(vaga.agendamento_preenchimento, novo)
+        metricas = metricas_vagas(self.empresa.id)
+        self.assertEqual((metricas["liberadas"], metricas["preenchidas"]), (1, 1))
+        self.assertEqual(metricas["taxa_preenchimento"], 100.0)
+        self.assertEqual(metricas["minutos_preenchidos"], 30)
+
+    def test_falta_registra_vaga(self):
+        url = reverse("agendamentos:marcar_nao_compareceu", args=[self.agendamento.id])
+        # O agendamento ainda não começou
+        self.assertFalse(self.client.post(url).json()["success"])
+
+        Agendamento.objects.filter(pk=self.agendamento.pk).update(
+            data_hora_inicio=timezone.now() - timedelta(minutes=10),
+            data_hora_fim=timezone.now() + timedelta(minutes=20)
+        )
+        self.assertTrue(self.client.post(url).json()["success"])
+        vaga = VagaLiberada.objects.get()
+        self.assertEqual(vaga.motivo, "nao_compareceu")
+
+    def test_inicio_oferecido(self):
+        vaga = VagaLiberada(data_hora_inicio=self.inicio, data_hora_fim=self.inicio + timedelta(minutes=60))
+        self.assertEqual(inicio_oferecido(vaga, 30, self.inicio - timedelta(hours=1)), self.inicio)
+        self.assertEqual(
+            inicio_oferecido(vaga, 30, self.inicio + timedelta(minutes=7)), self.inicio + timedelta(minutes=30)
+        )
+        self.assertIsNone(inicio_oferecido(vaga, 30, self.inicio + timedelta(minutes=31)))
+
+
+class RegraDisponibilidadeTest(TestCase):
+    """Regras semanais expandidas pela disponibilidade, com exceções por data."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, funcionarios = criar_empresa()
+        self.funcionario = funcionarios[0]
+        self.dia = timezone.localdate() + timedelta(days=1)
+        for inicio, fim, tipo in ((time(10), time(14), "trabalho"), (time(12), time(13), "almoco")):
+            RegraDisponibilidade.objects.create(
+                funcionario=self.funcionario, dia_semana=self.dia.weekday(),
+                horario_inicio=inicio, horario_fim=fim, tipo=tipo
+            )
+
+    def _horarios(self):
+        service = DisponibilidadeService(Empresa.objects.get(pk=self.empresa.pk))
+        horarios = service.get_horarios_disponiveis(self.funcionario, self.servico, self.dia)
+        for horario in horarios:
+            self.assertTrue(service.horario_disponivel(self.funcionario, 30, horario))
+        return [timezone.localtime(horario).strftime("%H:%M") for horario in horarios]
+
+    def test_regras_da_semana(self):
+        self.assertEqual(self._horarios(), ["10:00", "10:30", "11:00", "11:30", "13:00", "13:30"])
+        # Em outro dia da semana valem os horários da empresa
+        outro_dia = self.dia + timedelta(days=1)
+        horarios = DisponibilidadeService(self.empresa).get_horarios_disponiveis(
+            self.funcionario, self.servico, outro_dia
+        )
+        self.assertEqual(len(horarios), 18)
+
+    def test_bloqueio_na_data_soma_se_as_regras(self):
+        DisponibilidadeFuncionario.objects.create(
+            funcionario=self.funcionario, data=self.dia,
+            horario_inicio=time(10), horario_fim=time(11), tipo="pausa"
+        )
+        self.assertEqual(self._horarios(), ["11:00", "11:30", "13:00", "13:30"])
+
+    def test_trabalho_na_data_substitui_as_regras(self):
+        DisponibilidadeFuncionario.objects.create(
+            funcionario=self.funcionario, data=self.dia,
+            horario_inicio=time(15), horario_fim=time(16), tipo="trabalho"
+        )
+        self.assertEqual(self._horarios(), ["15:00", "15:30"])
+
+    @override_settings(CACHE_COMPARTILHADO=True)
+    def test_validade_e_invalidacao_do_cache(self):
+        self.assertEqual(len(self._horarios()), 6)
+        with self.captureOnCommitCallbacks(execute=True):
+            RegraDisponibilidade.objects.filter(tipo="almoco").update(valido_ate=self.dia - timedelta(days=1))
+            for regra in RegraDisponibilidade.objects.all():
+                regra.save()
+        self.assertEqual(len(self._horarios()), 8)
+
+
+@override_settings(CACHE_COMPARTILHADO=True)
+class CatalogoTest(OrcamentoConsultasMixin, TestCase):
+    """O catálogo é reconstruído quando os sinais geram uma nova versão."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, (self.funcionario,) = criar_empresa()
+
+    def _vinculo(self):
+        return get_catalogo(self.empresa.pk).get_vinculo(self.funcionario.pk, self.servico.pk)
+
+    def test_mantido_em_memoria_sem_alteracoes(self):
+        self.assertEqual(self._vinculo(), Vinculo(30, Decimal("40.00")))
+        # Apenas a versão, lida do cache
+        with self.assertMaximoConsultas(0):
+            self.assertEqual(self._vinculo(), Vinculo(30, Decimal("40.00")))
+
+    def test_alteracao_do_servico(self):
+        self._vinculo()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.servico.duracao = 45
+            self.servico.preco = Decimal("50.00")
+            self.servico.save()
+        self.assertEqual(self._vinculo(), Vinculo(45, Decimal("50.00")))
+
+    def test_alteracoes_do_funcionario(self):
+        self._vinculo()
+        with self.captureOnCommitCallbacks(execute=True):
+            vinculo = FuncionarioServico.objects.get(funcionario=self.funcionario)
+            vinculo.duracao_especifica = 60
+            vinculo.save()
+            RegraDisponibilidade.objects.create(
+                funcionario=self.funcionario, dia_semana=0,
+                horario_inicio=time(10), horario_fim=time(14), tipo="trabalho"
+            )
+        self.assertEqual(self._vinculo(), Vinculo(60, Decimal("40.00")))
+        segunda = date(2030, 1, 7)
+        self.assertEqual(len(get_catalogo(self.empresa.pk).get_regras(self.funcionario.pk, segunda)), 1)
+
+        # A remoção do funcionário remove, em cascata, vínculos e regras
+        with self.captureOnCommitCallbacks(execute=True):
+            self.funcionario.delete()
+        self.assertIsNone(self._vinculo())
+        self.assertEqual(get_catalogo(self.empresa.pk).get_regras(self.funcionario.pk, segunda), [])
+
+    def test_alteracoes_da_empresa(self):
+        get_catalogo(self.empresa.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            parametros = ParametrosEmpresa.objects.get(empresa=self.empresa)
+            parametros.intervalo_agendamento = 15
+            parametros.dias_funcionamento = "seg,ter"
+            parametros.save()
+        catalogo = get_catalogo(self.empresa.pk)
+        self.assertEqual(catalogo.intervalo_agendamento, 15)
+        self.assertEqual(catalogo.dias_funcionamento, {"seg", "ter"})
+
+        # Empresa removida: os parâmetros, removidos em cascata, invalidam o catálogo
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empresa.delete()
+        with self.assertRaises(ParametrosEmpresa.DoesNotExist):
+            get_catalogo(self.empresa.pk)
+
+    @override_settings(CACHE_COMPARTILHADO=False)
+    def test_cache_local_le_do_banco(self):
+        self.assertEqual(self._vinculo(), Vinculo(30, Decimal("40.00")))
+        # Alteração feita por outro processo: a nova versão fica no locmem dele
+        Servico.objects.filter(pk=self.servico.pk).update(preco=Decimal("55.00"))
+        cache.delete(_chave_versao(self.empresa.pk))
+        self.assertEqual(self._vinculo(), Vinculo(30, Decimal("55.00")))
+
+
+@override_settings(CACHE_COMPARTILHADO=True, DISPONIBILIDADE_CACHE_TTL=600)
+class CacheDisponibilidadeTest(OrcamentoConsultasMixin, TestCase):
+    """Invalidação e validade dos horários em cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, funcionarios = criar_empresa()
+        self.funcionario = funcionarios[0]
+        self.cliente = Cliente.objects.create(nome="Cliente", email="cliente@teste.com")
+        self.dia = timezone.localdate() + timedelta(days=1)
+
+    def _horarios(self):
+        horarios = DisponibilidadeService(self.empresa).get_horarios_disponiveis(
+            self.funcionario, self.servico, self.dia
+        )
+        return [timezone.localtime(horario).strftime("%H:%M") for horario in horarios]
+
+    def _em_cache(self):
+        """Lê os horários, que devem vir do cache, sem consultas."""
+        with self.assertMaximoConsultas(0):
+            return self._horarios()
+
+    def _inicio(self, hora):
+        return timezone.make_aware(datetime.combine(self.dia, time(hora, 0)))
+
+    def test_agendamento_invalida_o_dia(self):
+        self.assertEqual(len(self._horarios()), 18)
+        self.assertEqual(len(self._em_cache()), 18)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            agendamento = Agendamento.objects.create(
+                empresa=self.empresa, cliente=self.cliente, funcionario=self.funcionario,
+                servico=self.servico, data_hora_inicio=self._inicio(9),
+                data_hora_fim=self._inicio(9) + timedelta(minutes=30),
+                status="confirmado", preco_cobrado=Decimal("40.00")
+            )
+        self.assertNotIn("09:00", self._horarios())
+
+        # Mudança de horário: libera o antigo e ocupa o novo
+        with self.captureOnCommitCallbacks(execute=True):
+            agendamento.data_hora_inicio = self._inicio(10)
+            agendamento.data_hora_fim = self._inicio(10) + timedelta(minutes=30)
+            agendamento.save()
+        horarios = self._horarios()
+        self.assertIn("09:00", horarios)
+        self.assertNotIn("10:00", horarios)
+        self.assertEqual(self._em_cache(), horarios)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            agendamento.delete()
+        self.assertEqual(len(self._horarios()), 18)
+
+    def test_bloqueio_invalida_o_dia(self):
+        self.assertEqual(len(self._horarios()), 18)
+        with self.captureOnCommitCallbacks(execute=True):
+            bloqueio = DisponibilidadeFuncionario.objects.create(
+                funcionario=self.funcionario, data=self.dia,
+                horario_inicio=time(10), horario_fim=time(11), tipo="pausa"
+            )
+        self.assertNotIn("10:30", self._horarios())
+        self.assertEqual(len(self._em_cache()), 16)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bloqueio.delete()
+        self.assertEqual(len(self._horarios()), 18)
+
+    def test_validade_limitada_ao_primeiro_horario(self):
+        cache_disponibilidade = CacheDisponibilidade(self.empresa.pk, self.servico.pk, antecedencia_minima=30)
+        antecedencia = timedelta(minutes=30)
+        pares = [(self.funcionario.pk, self.dia + timedelta(days=i)) for i in range(3)]
+        cache_disponibilidade.obter([self.funcionario.pk], [dia for _, dia in pares])
+        agora = timezone.now()
+        cache_disponibilidade.salvar({
+            # Ainda fora da antecedência por 1,5 s: expira em 1 s
+            pares[0]: [agora + antecedencia + timedelta(seconds=1.5)],
+            # Já dentro da antecedência: não é gravado
+            pares[1]: [agora + antecedencia - timedelta(seconds=1)],
+            # Distante: limitado ao TTL máximo
+            pares[2]: [agora + timedelta(days=1)],
+        })
+
+        encontrados = cache_disponibilidade.obter([self.funcionario.pk], [dia for _, dia in pares])
+        self.assertEqual(set(encontrados), {pares[0], pares[2]})
+        relogio.sleep(1.1)
+        encontrados = cache_disponibilidade.obter([self.funcionario.pk], [dia for _, dia in pares])
+        self.assertEqual(set(encontrados), {pares[2]})
+
+    @override_settings(CACHE_COMPARTILHADO=False)
+    def test_cache_local_ao_processo_desativado(self):
+        self._horarios()
+        # Catálogo (3) e agenda do dia (2), lidos do banco a cada consulta
+        with self.assertMaximoConsultas(5):
+            self._horarios()
+        self.assertFalse(CacheDisponibilidade(self.empresa.pk, self.servico.pk, 0).ativo)
+
+
+@override_settings(CACHE_COMPARTILHADO=True)
+class AgendamentoMeiaNoiteTest(TestCase):
+    """Agendamentos iniciados num dia e terminados no seguinte ocupam os dois dias."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, funcionarios = criar_empresa()
+        self.funcionario = funcionarios[0]
+        self.dia = timezone.localdate() + timedelta(days=2)
+        # Expediente de madrugada no dia
+        DisponibilidadeFuncionario.objects.create(
+            funcionario=self.funcionario, data=self.dia,
+            horario_inicio=time(0), horario_fim=time(3), tipo="trabalho"
+        )
+
+    def _horario(self, dia, hora, minuto=0):
+        return timezone.make_aware(datetime.combine(dia, time(hora, minuto)))
+
+    def _horarios(self):
+        horarios = DisponibilidadeService(self.empresa).get_horarios_disponiveis(
+            self.funcionario, self.servico, self.dia
+        )
+        return [timezone.localtime(horario).strftime("%H:%M") for horario in horarios]
+
+    def test_agendamento_do_dia_anterior_ocupa_a_madrugada(self):
+        self.assertEqual(self._horarios(), ["00:00", "00:30", "01:00", "01:30", "02:00", "02:30"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Agendamento.objects.create(
+                empresa=self.empresa,
+                cliente=Cliente.objects.create(nome="Cliente", email="cliente@teste.com"),
+                funcionario=self.funcionario,
+                servico=self.servico,
+                data_hora_inicio=self._horario(self.dia - timedelta(days=1), 23, 30),
+                data_hora_fim=self._horario(self.dia, 1, 0),
+                status="confirmado",
+                preco_cobrado=Decimal("40.00")
+            )
+
+        # O dia seguinte também é invalidado no cache
+        self.assertEqual(self._horarios(), ["01:00", "01:30", "02:00", "02:30"])
+        periodo = DisponibilidadeService(self.empresa).get_horarios_disponiveis_periodo(
+            self.funcionario, self.servico, self.dia - timedelta(days=1), self.dia
+        )
+        self.assertNotIn(self._horario(self.dia, 0, 30), periodo[self.dia])
+        self.assertIn(self._horario(self.dia, 1, 0), periodo[self.dia])
+
+        service = DisponibilidadeService(self.empresa)
+        self.assertFalse(service.horario_disponivel(self.funcionario, 30, self._horario(self.dia, 0, 30)))
+        self.assertTrue(service.horario_disponivel(self.funcionario, 30, self._horario(self.dia, 1, 0)))
+
+
+class ImportarDadosTest(OrcamentoConsultasMixin, TestCase):
+    """Importação em lotes de clientes e agendamentos."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, funcionarios = criar_empresa()
+        self.funcionario = funcionarios[0]
+
+    def _arquivo(self, sufixo, conteudo):
+        descritor, caminho = tempfile.mkstemp(suffix=sufixo)
+        with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+            arquivo.write(conteudo)
+        self.addCleanup(os.remove, caminho)
+        return caminho
+
+    def test_importa_clientes_e_agendamentos(self):
+        clientes = self._arquivo(".csv", "nome,email,telefone\n" + "".join(
+            f"Cliente {i},cliente{i}@teste.com,1197777000{i}\n" for i in range(5)
+        ) + "Repetido,CLIENTE1@teste.com,11\n")
+        saida, erros = io.StringIO(), io.StringIO()
+        call_command("importar_dados", "clientes", clientes, "--lote", "2", stdout=saida, stderr=erros)
+        self.assertEqual(Cliente.objects.count(), 5)
+        self.assertIn("Rejeitadas: 1", saida.getvalue())
+        self.assertIn("E-mail já cadastrado", erros.getvalue())
+
+        registros = [
+            # Agendamentos passados são aceitos; fim e preço vêm do catálogo.
+            # O e-mail do cliente é comparado sem diferenciar maiúsculas
+            {"cliente_email": f"Cliente{i}@Teste.com", "funcionario_email": self.funcionario.email,
+             "servico": "corte", "data_hora_inicio": f"2024-03-0{i + 1}T10:00:00"}
+            for i in range(5)
+        ] + [
+            {"cliente_email": "cliente0@teste.com", "funcionario_email": self.funcionario.email,
+             "servico": "Corte", "data_hora_inicio": "2024-03-01T11:00:00", "status": "invalido"},
+            {"cliente_email": "ninguem@teste.com", "funcionario_email": self.funcionario.email,
+             "servico": "Corte", "data_hora_inicio": "2024-03-01T12:00:00"},
+        ]
+        agendamentos = self._arquivo(".jsonl", "\n".join(json.dumps(r) for r in registros) + "\n{quebrado\n")
+        rejeitados = self._arquivo(".jsonl", "")
+        # Consultas fixas por lote: clientes do lote, o INSERT e a atualização
+        # dos resumos diários (consulta e INSERT/UPDATE em lote), além do
+        # carregamento inicial (funcionários, serviços e catálogo)
+        with self.assertMaximoConsultas(14):
+            call_command(
+                "importar_dados", "agendamentos", agendamentos, "--empresa", str(self.empresa.id),
+                "--rejeitados", rejeitados, stdout=io.StringIO(), stderr=io.StringIO()
+            )
+
+        importados = Agendamento.objects.order_by("data_hora_inicio")
+        self.assertEqual(importados.count(), 5)
+        primeiro = importados[0]
+        self.assertEqual(primeiro.status, "concluido")
+        self.assertEqual(primeiro.preco_cobrado, Decimal("40.00"))
+        self.assertEqual(primeiro.data_hora_fim - primeiro.data_hora_inicio, timedelta(minutes=30))
+        with open(rejeitados, encoding="utf-8") as arquivo:
+            erros = [json.loads(linha)["erro"] for linha in arquivo]
+        self.assertEqual(len(erros), 3)
+        self.assertIn("Cliente não encontrado: ninguem@teste.com", erros)
+
+    def test_invalida_todos_os_dias_do_agendamento(self):
+        Cliente.objects.create(nome="Cliente", email="cliente@teste.com")
+        agendamentos = self._arquivo(".csv", (
+            "cliente_email,funcionario_email,servico,data_hora_inicio,data_hora_fim\n"
+            f"cliente@teste.com,{self.funcionario.email},Corte,2024-03-01T23:30:00,2024-03-02T00:30:00\n"
+        ))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "importar_dados", "agendamentos", agendamentos, "--empresa", str(self.empresa.id),
+                stdout=io.StringIO(), stderr=io.StringIO()
+            )
+        self.assertEqual(Agendamento.objects.count(), 1)
+        for dia in (date(2024, 3, 1), date(2024, 3, 2)):
+            self.assertIsNotNone(cache.get(_chave_versao_dia(self.funcionario.pk, dia)))
+
+
+class ExportarAgendamentosTest(OrcamentoConsultasMixin, TestCase):
+    """Exportação de agendamentos em fluxo, com permissão por empresa."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.servico, funcionarios = criar_empresa()
+        self.funcionario = funcionarios[0]
+        self.funcionario.user = User.objects.create_user("barbeiro", password="senha")
+        self.funcionario.save()
+        cliente = Cliente.objects.create(nome="Cliente", email="cliente@teste.com", telefone="11977777777")
+        inicio = timezone.make_aware(datetime(2024, 3, 1, 10, 0))
+        Agendamento.objects.bulk_create([
+            Agendamento(
+                empresa=self.empresa, cliente=cliente, funcionario=self.funcionario, servico=self.servico,
+                data_hora_inicio=inicio + timedelta(days=i), data_hora_fim=inicio + timedelta(days=i, minutes=30),
+                status="concluido", preco_cobrado=Decimal("40.00")
+            )
+            for i in range(3)
+        ])
+        self.url = reverse("agendamentos:exportar_agendamentos")
+        self.periodo = {"data_inicio": "2024-03-01", "data_fim": "2024-03-02"}
+
+    def test_exporta_csv_da_propria_empresa(self):
+        self.client.force_login(self.funcionario.user)
+        response = self.client.get(self.url, self.periodo)
+        self.assertTrue(response.streaming)
+        with self.assertMaximoConsultas(1):
+            linhas = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(linhas), 3)
+        self.assertTrue(linhas[0].startswith("id,empresa,"))
+        self.assertIn("Barbeiro 0,Cliente,cliente@teste.com,Corte", linhas[1])
+        self.assertTrue(linhas[1].endswith("concluido,40.00"))
+
+        outra = Empresa.objects.create(nome="Outra", cnpj="1", email="o@o.com", telefone="1", endereco="R")
+        response = self.client.get(self.url, {**self.periodo, "empresa": outra.id})
+        self.assertEqual(response.status_code, 403)
+
+    def test_exporta_ndjson_de_todas_as_empresas(self):
+        self.client.force_login(User.objects.create_user("contador", password="senha", is_staff=True))
+        response = self.client.get(self.url, {**self.periodo, "formato": "ndjson"})
+        registros = [json.loads(linha) for linha in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([registro["preco_cobrado"] for registro in registros], ["40.00", "40.00"])
+        self.assertEqual(registros[0]["data_hora_inicio"], "2024-03-01T10:00:00-03:00")
+
+
+class ResumoDiarioTest(TestCase):
+    """Resumo diário por funcionário mantido pelos sinais e reconstruído pelo comando."""
+
+    def setUp(self):
+        self.empresa, self.servico, funcionarios = criar_empresa()
+        self.funcionario = funcionarios[0]
+        self.cliente = Cliente.objects.create(nome="Cliente", email="cliente@teste.com", telefone="11977777777")
+        self.dia = timezone.localdate() + timedelta(days=1)
+
+    def criar(self, hora, status="confirmado", dia=None):
+        return Agendamento.objects.create(
+            empresa=self.empresa, cliente=self.cliente, funcionario=self.funcionario, servico=self.servico,
+            data_hora_inicio=timezone.make_aware(datetime.combine(dia or self.dia, time(hora, 0))),
+            status=status
+        )
+
+    def resumos(self):
+        return list(ResumoDiario.objects.order_by("data").values(
+            "data", "pendentes", "confirmados", "concluidos", "cancelados", "nao_compareceu",
+            "receita", "minutos_reservados"
+        ))
+
+    def test_alteracoes_atualizam_resumo(self):
+        primeiro = self.criar(10)
+        segundo = self.criar(11)
+        self.criar(12, status="pendente")
+        resumo = ResumoDiario.objects.get()
+        self.assertEqual((resumo.confirmados, resumo.pendentes, resumo.total), (2, 1, 3))
+        self.assertEqual((resumo.receita, resumo.minutos_reservados), (Decimal("120.00"), 90))
+
+        # Cancelamento: sai da receita e dos minutos, entra nos cancelados
+        primeiro.status = "cancelado"
+        primeiro.save()
+        resumo.refresh_from_db()
+        self.assertEqual((resumo.confirmados, resumo.cancelados), (1, 1))
+        self.assertEqual((resumo.receita, resumo.minutos_reservados), (Decimal("80.00"), 60))
+
+        # Remarcação para outro dia, com instância carregada só com alguns campos
+        remarcado = Agendamento.objects.only("id", "data_hora_inicio", "data_hora_fim").get(pk=segundo.pk)
+        remarcado.data_hora_inicio += timedelta(days=1)
+        remarcado.data_hora_fim += timedelta(days=1)
+        remarcado.save(update_fields=["data_hora_inicio", "data_hora_fim"])
+        primeiro.delete()
+        self.assertEqual(
+            [(r["data"], r["confirmados"], r["pendentes"], r["cancelados"], r["minutos_reservados"]) for r in self.resumos()],
+            [(self.dia, 0, 1, 0, 30), (self.dia + timedelta(days=1), 1, 0, 0, 30)]
+        )
+
+        # O resumo incremental é igual ao reconstruído
+        incremental = self.resumos()
+        self.assertEqual(reconstruir(self.empresa.id), 1 + 1)
+        self.assertEqual(self.resumos(), incremental)
+
+    def test_reconstruir_e_totais_por_funcionario(self):
+        self.criar(10)
+        faltou = self.criar(11)
+        Agendamento.objects.filter(pk=faltou.pk).update(status="nao_compareceu")
+        ResumoDiario.objects.filter(data=self.dia).update(receita=0)
+
+        saida = io.StringIO()
+        call_command("reconstruir_resumos", "--empresa", str(self.empresa.id), stdout=saida)
+        self.assertIn("1 resumos diários gravados", saida.getvalue())
+        totais = totais_por_funcionario(self.empresa.id, self.dia, self.dia)
+        self.assertEqual(len(totais), 1)
+        self.assertEqual((totais[0]["agendamentos"], totais[0]["nao_compareceu"]), (2, 1))
+        self.assertEqual((totais[0]["receita"], totais[0]["minutos_reservados"]), (Decimal("40.00"), 30))
+        self.assertEqual(totais[0]["taxa_falta"], 50.0)
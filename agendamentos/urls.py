@@ -8,15 +8,24 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("empresa/<int:empresa_id>/", views.empresa_detail, name="empresa_detail"),
     path("empresa/<int:empresa_id>/verificar_disponibilidade/", views.verificar_disponibilidade, name="verificar_disponibilidade"),
+    path("empresa/<int:empresa_id>/verificar_disponibilidade_servico/", views.verificar_disponibilidade_servico, name="verificar_disponibilidade_servico"),
     path("empresa/<int:empresa_id>/criar_agendamento/", views.criar_agendamento, name="criar_agendamento"),
     path("empresa/<int:empresa_id>/adicionar_fila_espera/", views.adicionar_fila_espera, name="adicionar_fila_espera"),
     path("meus_agendamentos/", views.meus_agendamentos, name="meus_agendamentos"),
+    path("meus_agendamentos/historico/", views.historico_agendamentos, name="historico_agendamentos"),
+    path("api/historico_agendamentos/", views.api_historico_agendamentos, name="api_historico_agendamentos"),
 
     # URLs para funcionários (barbeiros)
     path("barbeiro/agenda/", views.agenda_barbeiro, name="agenda_barbeiro"),
     path("barbeiro/agenda/<int:ano>/<int:mes>/<int:dia>/", views.agenda_barbeiro, name="agenda_barbeiro_data"),
+    path("barbeiro/agenda/mes/", views.agenda_barbeiro_mes, name="agenda_barbeiro_mes"),
+    path("barbeiro/agenda/mes/<int:ano>/<int:mes>/", views.agenda_barbeiro_mes, name="agenda_barbeiro_mes_data"),
     path("barbeiro/agendar_para_cliente/", views.agendar_para_cliente, name="agendar_para_cliente"),
     path("barbeiro/cancelar_agendamento/<int:agendamento_id>/", views.cancelar_agendamento, name="cancelar_agendamento"), 
+    path("barbeiro/nao_compareceu/<int:agendamento_id>/", views.marcar_nao_compareceu, name="marcar_nao_compareceu"),
+
+    # Relatórios
+    path("relatorios/agendamentos/", views.exportar_agendamentos, name="exportar_agendamentos"),
 
     # URLs de autenticação
     path("login/", views.login_view, name="login"),
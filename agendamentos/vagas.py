@@ -0,0 +1,212 @@
+"""
+Reaproveitamento de horários liberados por cancelamentos e faltas.
+
+Quando um agendamento que ocupava a agenda é cancelado ou marcado como "não
+compareceu", os sinais gravam uma VagaLiberada na mesma transação. A busca de
+clientes na fila de espera é feita depois, fora da requisição, por
+processar_lote(), executado pelo comando `manage.py processar_vagas`.
+
+Um novo agendamento que ocupe o horário marca a vaga como preenchida;
+metricas_vagas() resume quantos horários liberados foram reaproveitados.
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from core.notificacoes import DURACAO_RESERVA, MAX_TENTATIVAS, calcular_espera
+from .models import Agendamento, VagaLiberada
+from .services import DisponibilidadeService, FilaEsperaService
+
+# Status que liberam o horário de um agendamento que ocupava a agenda
+STATUS_LIBERAM_AGENDA = ["cancelado", "nao_compareceu"]
+
+
+def registrar_vaga(agendamento: Agendamento) -> VagaLiberada:
+    """
+    Grava o horário liberado pelo agendamento para processamento posterior.
+    Deve ser chamada na mesma transação que altera o status do agendamento.
+    """
+    return VagaLiberada.objects.create(
+        empresa_id=agendamento.empresa_id,
+        funcionario_id=agendamento.funcionario_id,
+        servico_id=agendamento.servico_id,
+        agendamento=agendamento,
+        data_hora_inicio=agendamento.data_hora_inicio,
+        data_hora_fim=agendamento.data_hora_fim,
+        motivo=agendamento.status
+    )
+
+
+def marcar_preenchidas(agendamento: Agendamento) -> int:
+    """
+    Marca como preenchidas as vagas do funcionário que o agendamento ocupa.
+
+    Returns:
+        Número de vagas marcadas
+    """
+    return VagaLiberada.objects.filter(
+        funcionario_id=agendamento.funcionario_id,
+        agendamento_preenchimento__isnull=True,
+        data_hora_inicio__lt=agendamento.data_hora_fim,
+        data_hora_fim__gt=agendamento.data_hora_inicio
+    ).exclude(agendamento_id=agendamento.pk).update(
+        agendamento_preenchimento=agendamento,
+        data_preenchimento=timezone.now()
+    )
+
+
+def inicio_oferecido(vaga: VagaLiberada, intervalo: int, agora: datetime) -> Optional[datetime]:
+    """
+    Retorna o início do horário a oferecer: o início da vaga ou, se ele já
+    passou (faltas), o primeiro múltiplo de `intervalo` minutos depois de
+    `agora`. Retorna None se não sobra tempo na vaga.
+    """
+    inicio = vaga.data_hora_inicio
+    if inicio < agora:
+        passo = timedelta(minutes=intervalo)
+        inicio += passo * -((inicio - agora) // passo)
+    return inicio if inicio < vaga.data_hora_fim else None
+
+
+def _reservar_lote(limite: int) -> List[VagaLiberada]:
+    """
+    Reserva até `limite` vagas prontas para processamento, com um UPDATE
+    condicional, de modo que vários workers podem rodar ao mesmo tempo.
+    """
+    agora = timezone.now()
+    prontas = Q(status__in=["pendente", "processando"], proxima_tentativa__lte=agora)
+    ids = list(
+        VagaLiberada.objects.filter(prontas)
+        .order_by("proxima_tentativa")
+        .values_list("id", flat=True)[:limite]
+    )
+    if not ids:
+        return []
+
+    lote = uuid.uuid4().hex
+    VagaLiberada.objects.filter(prontas, id__in=ids).update(
+        status="processando",
+        lote=lote,
+        proxima_tentativa=agora + DURACAO_RESERVA
+    )
+    return list(
+        VagaLiberada.objects.filter(lote=lote, status="processando")
+        .select_related("empresa", "funcionario", "servico")
+        .order_by("id")
+    )
+
+
+def processar_vaga(vaga: VagaLiberada) -> int:
+    """
+    Oferece a vaga aos melhores candidatos da fila de espera.
+
+    Returns:
+        Número de clientes notificados; -1 se a vaga expirou ou já foi ocupada
+    """
+    if vaga.agendamento_preenchimento_id is not None:
+        return -1
+
+    disponibilidade = DisponibilidadeService(vaga.empresa)
+    inicio = inicio_oferecido(vaga, disponibilidade.catalogo.intervalo_agendamento, timezone.now())
+    if inicio is None:
+        return -1
+
+    duracao_livre = int((vaga.data_hora_fim - inicio).total_seconds() // 60)
+    # O horário pode ter sido ocupado ou bloqueado depois do cancelamento
+    if not disponibilidade.horario_disponivel(vaga.funcionario, duracao_livre, inicio):
+        return -1
+
+    notificados = FilaEsperaService(vaga.empresa).verificar_e_notificar_fila(
+        vaga.funcionario, inicio, vaga.servico, duracao_livre=duracao_livre
+    )
+    return len(notificados)
+
+
+def processar_lote(limite: int = 50, max_tentativas: int = MAX_TENTATIVAS) -> Dict[str, int]:
+    """
+    Processa um lote de vagas liberadas.
+
+    Returns:
+        Contadores {"processadas": n, "expiradas": n, "reagendadas": n, "falhas": n}
+    """
+    resultado = {"processadas": 0, "expiradas": 0, "reagendadas": 0, "falhas": 0}
+
+    for vaga in _reservar_lote(limite):
+        vaga.tentativas += 1
+        try:
+            notificados, erro = processar_vaga(vaga), ""
+        except Exception as e:
+            notificados, erro = 0, str(e)
+
+        agora = timezone.now()
+        if not erro:
+            vaga.status = "processada" if notificados >= 0 else "expirada"
+            vaga.clientes_notificados = max(notificados, 0)
+            vaga.data_processamento = agora
+            resultado["processadas" if notificados >= 0 else "expiradas"] += 1
+        elif vaga.tentativas >= max_tentativas:
+            vaga.status = "falhou"
+            resultado["falhas"] += 1
+        else:
+            vaga.status = "pendente"
+            vaga.proxima_tentativa = agora + calcular_espera(vaga.tentativas)
+            resultado["reagendadas"] += 1
+
+        vaga.ultimo_erro = erro
+        vaga.lote = ""
+        vaga.save(update_fields=[
+            "status", "tentativas", "proxima_tentativa", "lote", "ultimo_erro",
+            "clientes_notificados", "data_processamento"
+        ])
+
+    return resultado
+
+
+def metricas_vagas(empresa_id: Optional[int] = None, desde: Optional[datetime] = None) -> Dict:
+    """
+    Resume o reaproveitamento das vagas liberadas (uma consulta).
+
+    Returns:
+        Dicionário com liberadas, com_notificacao, clientes_notificados,
+        preenchidas, taxa_preenchimento (%), minutos_liberados,
+        minutos_preenchidos e tempo_medio_preenchimento (timedelta ou None)
+    """
+    vagas = VagaLiberada.objects.all()
+    if empresa_id is not None:
+        vagas = vagas.filter(empresa_id=empresa_id)
+    if desde is not None:
+        vagas = vagas.filter(data_criacao__gte=desde)
+
+    duracao = ExpressionWrapper(F("data_hora_fim") - F("data_hora_inicio"), output_field=DurationField())
+    preenchida = Q(agendamento_preenchimento__isnull=False)
+    resumo = vagas.aggregate(
+        liberadas=Count("id"),
+        com_notificacao=Count("id", filter=Q(clientes_notificados__gt=0)),
+        clientes_notificados=Sum("clientes_notificados", default=0),
+        preenchidas=Count("id", filter=preenchida),
+        duracao_liberada=Sum(duracao),
+        duracao_preenchida=Sum(duracao, filter=preenchida),
+        tempo_medio_preenchimento=Avg(
+            ExpressionWrapper(F("data_preenchimento") - F("data_criacao"), output_field=DurationField()),
+            filter=preenchida
+        ),
+    )
+
+    def minutos(valor):
+        return int(valor.total_seconds() // 60) if valor else 0
+
+    return {
+        "liberadas": resumo["liberadas"],
+        "com_notificacao": resumo["com_notificacao"],
+        "clientes_notificados": resumo["clientes_notificados"],
+        "preenchidas": resumo["preenchidas"],
+        "taxa_preenchimento": (
+            round(100 * resumo["preenchidas"] / resumo["liberadas"], 1) if resumo["liberadas"] else 0.0
+        ),
+        "minutos_liberados": minutos(resumo.pop("duracao_liberada")),
+        "minutos_preenchidos": minutos(resumo.pop("duracao_preenchida")),
+        "tempo_medio_preenchimento": resumo["tempo_medio_preenchimento"],
+    }
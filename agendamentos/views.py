@@ -1,8 +1,12 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from datetime import datetime, date, timedelta 
+from decimal import Decimal
+import calendar
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 import json
@@ -15,25 +19,41 @@ from core.models import Empresa
 from funcionarios.models import Funcionario
 from servicos.models import Servico
 from clientes.models import Cliente
+from clientes.services import aresolver_cliente, normalizar_email, resolver_cliente
+from .cache import cache_compartilhado
 from .models import Agendamento, FilaEspera
 from .services import DisponibilidadeService, AgendamentoService, FilaEsperaService
-from core.whatsapp import enviar_whatsapp
+from . import exportacao, paginas
+from .historico import CursorInvalido, TAMANHO_PAGINA, pagina_historico
+from core.notificacoes import enfileirar_whatsapp
 from django.http import JsonResponse
 from django.contrib import messages
 
 
 def home(request ):
-    """View principal do sistema"""
+    """
+    View principal do sistema.
+    
+    A lista de empresas é um fragmento em cache (ver paginas.py): enquanto
+    nenhuma empresa é alterada, a página é montada sem consultas.
+    """
     empresas = Empresa.objects.filter(ativo=True)
     context = {
         "empresas": empresas,
-        "titulo": "Sistema de Agendamentos"
+        "titulo": "Sistema de Agendamentos",
+        "cache_ttl": paginas.get_ttl(),
+        "versao": paginas.get_versao_home(),
     }
     return render(request, "agendamentos/home.html", context)
 
 
 def empresa_detail(request, empresa_id):
-    """Página de detalhes da empresa com serviços e funcionários"""
+    """
+    Página de detalhes da empresa com serviços e funcionários.
+    
+    Dados da empresa, serviços e funcionários são um fragmento em cache (ver
+    paginas.py); as listas só são consultadas quando o fragmento é gerado.
+    """
     empresa = get_object_or_404(Empresa, id=empresa_id, ativo=True)
     servicos = empresa.servicos.filter(ativo=True)
     funcionarios = empresa.funcionarios.filter(ativo=True)
@@ -42,61 +62,263 @@ def empresa_detail(request, empresa_id):
         "empresa": empresa,
         "servicos": servicos,
         "funcionarios": funcionarios,
-        "titulo": f"Agendamento - {empresa.nome}"
+        "titulo": f"Agendamento - {empresa.nome}",
+        "cache_ttl": paginas.get_ttl(),
+        "versao": paginas.get_versao_empresa(empresa.id),
     }
     return render(request, "agendamentos/empresa_detail.html", context)
 
 
-def verificar_disponibilidade(request, empresa_id):
-    """API para verificar horários disponíveis"""
-    if request.method != "POST":
+# Limite de dias consultados de uma só vez no modo período
+MAX_DIAS_DISPONIBILIDADE = 31
+
+
+async def verificar_disponibilidade(request, empresa_id):
+    """
+    API para verificar horários disponíveis.
+    
+    Aceita uma única "data" ou um período, informado por "data_inicio"/"data_fim"
+    ou por "dias" (próximos N dias a partir de "data_inicio" ou de hoje).
+    
+    As views públicas de disponibilidade, reserva e fila de espera são
+    assíncronas: sob ASGI, a espera pelo banco não ocupa uma thread por cliente.
+    
+    Por GET, com os mesmos campos na query string, a resposta leva ETag,
+    Last-Modified e Cache-Control e pode ser reutilizada por navegadores e
+    proxies; If-None-Match com a agenda inalterada recebe 304 sem que os
+    horários sejam calculados. O ETag é derivado das versões da agenda no
+    cache e só é enviado com um cache compartilhado (CACHE_COMPARTILHADO):
+    num cache local, cada processo teria as próprias versões e responderia
+    304 a uma agenda alterada por outro processo.
+    """
+    if request.method not in ("GET", "POST"):
         return JsonResponse({"error": "Método não permitido"}, status=405)
     
     try:
-        data = json.loads(request.body)
+        data = request.GET if request.method == "GET" else json.loads(request.body)
         funcionario_id = data.get("funcionario_id")
         servico_id = data.get("servico_id")
         data_str = data.get("data")
         
         # Validar dados
-        if not all([funcionario_id, servico_id, data_str]):
+        if not all([funcionario_id, servico_id]):
             return JsonResponse({"error": "Dados incompletos"}, status=400)
         
-        empresa = get_object_or_404(Empresa, id=empresa_id, ativo=True)
-        funcionario = get_object_or_404(Funcionario, id=funcionario_id, empresa=empresa)
-        servico = get_object_or_404(Servico, id=servico_id, empresa=empresa)
+        # Converter datas antes de consultar o banco
+        modo_periodo = not data_str
+        if modo_periodo:
+            periodo, erro = _ler_periodo(data)
+            if erro:
+                return JsonResponse({"error": erro}, status=400)
+            data_inicio, data_fim = periodo
+        else:
+            # Converter string de data para objeto date
+            data_agendamento = _ler_data(data_str)
+            if data_agendamento is None:
+                return JsonResponse({"error": "data inválida (use AAAA-MM-DD)"}, status=400)
+            data_inicio = data_fim = data_agendamento
         
-        # Converter string de data para objeto date
-        data_agendamento = datetime.strptime(data_str, "%Y-%m-%d").date()
+        empresa = await aget_object_or_404(Empresa, id=empresa_id, ativo=True)
+        funcionario = await aget_object_or_404(Funcionario, id=funcionario_id, empresa=empresa)
+        servico = await aget_object_or_404(Servico, id=servico_id, empresa=empresa)
         
-        # Verificar disponibilidade
         disponibilidade_service = DisponibilidadeService(empresa)
-        horarios_disponiveis = disponibilidade_service.get_horarios_disponiveis(
+        
+        validador = None
+        if request.method == "GET" and cache_compartilhado():
+            validador = await disponibilidade_service.aget_validador_http(
+                funcionario, servico, data_inicio, data_fim
+            )
+            nao_modificado = get_conditional_response(
+                request,
+                etag=quote_etag(validador.etag),
+                last_modified=int(validador.ultima_alteracao.timestamp())
+            )
+            if nao_modificado is not None:
+                return _aplicar_cache_http(nao_modificado, validador)
+        
+        if modo_periodo:
+            horarios_por_dia = await disponibilidade_service.aget_horarios_disponiveis_periodo(
+                funcionario, servico, data_inicio, data_fim
+            )
+            return _aplicar_cache_http(JsonResponse({
+                "success": True,
+                "dias": [
+                    {
+                        "data": dia.isoformat(),
+                        "display": dia.strftime("%d/%m/%Y"),
+                        "horarios": _horarios_para_json(horarios),
+                    }
+                    for dia, horarios in horarios_por_dia.items()
+                ],
+                "funcionario": funcionario.nome,
+                "servico": servico.nome,
+                "data_inicio": data_inicio.strftime("%d/%m/%Y"),
+                "data_fim": data_fim.strftime("%d/%m/%Y")
+            }), validador)
+        
+        # Verificar disponibilidade
+        horarios_disponiveis = await disponibilidade_service.aget_horarios_disponiveis(
             funcionario, servico, data_agendamento
         )
         
-        # Converter para formato JSON
-        horarios_json = [
-            {
-                "datetime": horario.isoformat(),
-                "display": horario.strftime("%H:%M")
-            }
-            for horario in horarios_disponiveis
-        ]
-        
-        return JsonResponse({
+        return _aplicar_cache_http(JsonResponse({
             "success": True,
-            "horarios": horarios_json,
+            "horarios": _horarios_para_json(horarios_disponiveis),
             "funcionario": funcionario.nome,
             "servico": servico.nome,
             "data": data_agendamento.strftime("%d/%m/%Y")
+        }), validador)
+        
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def _aplicar_cache_http(response, validador):
+    """
+    Adiciona ETag, Last-Modified e Cache-Control à resposta de disponibilidade.
+    
+    A resposta é a mesma para todos os clientes (public) e vale até a próxima
+    mudança do corte da antecedência mínima, limitada a
+    DISPONIBILIDADE_HTTP_MAX_AGE; depois disso é revalidada com If-None-Match.
+    Sem validador (POST), a resposta não é alterada.
+    """
+    if validador is None:
+        return response
+    response["ETag"] = quote_etag(validador.etag)
+    response["Last-Modified"] = http_date(validador.ultima_alteracao.timestamp())
+    patch_cache_control(response, public=True, max_age=validador.max_age)
+    return response
+
+
+def _horarios_para_json(horarios):
+    """Converte uma lista de horários para o formato JSON da API"""
+    return [
+        {
+            "datetime": horario.isoformat(),
+            "display": horario.strftime("%H:%M")
+        }
+        for horario in horarios
+    ]
+
+
+async def verificar_disponibilidade_servico(request, empresa_id):
+    """
+    API para verificar horários disponíveis de um serviço com qualquer profissional.
+    
+    Retorna, para cada horário, os funcionários livres. Aceita uma única "data"
+    ou um período, como em verificar_disponibilidade.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método não permitido"}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        servico_id = data.get("servico_id")
+        data_str = data.get("data")
+        
+        # Validar dados
+        if not servico_id:
+            return JsonResponse({"error": "Dados incompletos"}, status=400)
+        
+        # Converter datas antes de consultar o banco
+        if data_str:
+            data_inicio = data_fim = _ler_data(data_str)
+            if data_inicio is None:
+                return JsonResponse({"error": "data inválida (use AAAA-MM-DD)"}, status=400)
+        else:
+            periodo, erro = _ler_periodo(data)
+            if erro:
+                return JsonResponse({"error": erro}, status=400)
+            data_inicio, data_fim = periodo
+        
+        empresa = await aget_object_or_404(Empresa, id=empresa_id, ativo=True)
+        servico = await aget_object_or_404(Servico, id=servico_id, empresa=empresa, ativo=True)
+        
+        disponibilidade_service = DisponibilidadeService(empresa)
+        horarios_por_dia = await disponibilidade_service.aget_horarios_disponiveis_servico_periodo(
+            servico, data_inicio, data_fim
+        )
+        
+        return JsonResponse({
+            "success": True,
+            "dias": [
+                {
+                    "data": dia.isoformat(),
+                    "display": dia.strftime("%d/%m/%Y"),
+                    "horarios": [
+                        {
+                            "datetime": horario.isoformat(),
+                            "display": horario.strftime("%H:%M"),
+                            "funcionarios": [
+                                {"id": funcionario.id, "nome": funcionario.nome}
+                                for funcionario in funcionarios
+                            ]
+                        }
+                        for horario, funcionarios in horarios
+                    ],
+                }
+                for dia, horarios in horarios_por_dia.items()
+            ],
+            "servico": servico.nome,
+            "data_inicio": data_inicio.strftime("%d/%m/%Y"),
+            "data_fim": data_fim.strftime("%d/%m/%Y")
         })
         
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 
-def criar_agendamento(request, empresa_id):
+def _ler_data(valor):
+    """Converte uma data AAAA-MM-DD, retornando None se inválida."""
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _ler_periodo(dados):
+    """
+    Lê o período de consulta a partir de "data_inicio"/"data_fim" ou "dias".
+    
+    Returns:
+        Tupla ((data_inicio, data_fim), erro). Em caso de erro, o período é None.
+    """
+    data_inicio_str = dados.get("data_inicio")
+    data_fim_str = dados.get("data_fim")
+    dias = dados.get("dias")
+    
+    if not (data_fim_str or dias):
+        return None, "Dados incompletos"
+    
+    if data_inicio_str:
+        data_inicio = _ler_data(data_inicio_str)
+        if data_inicio is None:
+            return None, "data_inicio inválida (use AAAA-MM-DD)"
+    else:
+        data_inicio = timezone.localdate()
+    
+    if data_fim_str:
+        data_fim = _ler_data(data_fim_str)
+        if data_fim is None:
+            return None, "data_fim inválida (use AAAA-MM-DD)"
+    else:
+        try:
+            dias = int(dias)
+        except (TypeError, ValueError):
+            return None, "dias deve ser um número inteiro"
+        if not 1 <= dias <= MAX_DIAS_DISPONIBILIDADE:
+            return None, f"O período deve ter entre 1 e {MAX_DIAS_DISPONIBILIDADE} dias"
+        data_fim = data_inicio + timedelta(days=dias - 1)
+    
+    total_dias = (data_fim - data_inicio).days + 1
+    if total_dias < 1 or total_dias > MAX_DIAS_DISPONIBILIDADE:
+        return None, f"O período deve ter entre 1 e {MAX_DIAS_DISPONIBILIDADE} dias"
+    
+    return (data_inicio, data_fim), None
+
+
+async def criar_agendamento(request, empresa_id):
     """View para criar um novo agendamento"""
     if request.method != "POST":
         return JsonResponse({"error": "Método não permitido"}, status=405)
@@ -117,35 +339,21 @@ def criar_agendamento(request, empresa_id):
             return JsonResponse({"error": "Dados obrigatórios não fornecidos"}, status=400)
         
         # Obter objetos do banco
-        empresa = get_object_or_404(Empresa, id=empresa_id, ativo=True)
-        funcionario = get_object_or_404(Funcionario, id=funcionario_id, empresa=empresa)
-        servico = get_object_or_404(Servico, id=servico_id, empresa=empresa)
+        empresa = await aget_object_or_404(Empresa, id=empresa_id, ativo=True)
+        funcionario = await aget_object_or_404(Funcionario, id=funcionario_id, empresa=empresa)
+        servico = await aget_object_or_404(Servico, id=servico_id, empresa=empresa)
         
         # Converter string para datetime
         data_hora_inicio = datetime.fromisoformat(data_hora_str.replace("Z", "+00:00"))
         if timezone.is_naive(data_hora_inicio):
             data_hora_inicio = timezone.make_aware(data_hora_inicio)
         
-        # Buscar ou criar cliente
-        cliente, created = Cliente.objects.get_or_create(
-            email=cliente_email,
-            defaults={
-                "nome": cliente_nome,
-                "telefone": cliente_telefone or ""
-            }
-        )
-        
-        # Se o cliente já existe, atualizar dados se necessário
-        if not created:
-            if cliente.nome != cliente_nome:
-                cliente.nome = cliente_nome
-            if cliente_telefone and cliente.telefone != cliente_telefone:
-                cliente.telefone = cliente_telefone
-            cliente.save()
+        # Criar o cliente ou atualizar nome e telefone, numa única instrução
+        cliente = await aresolver_cliente(cliente_email, cliente_nome, cliente_telefone)
         
         # Criar agendamento
         agendamento_service = AgendamentoService(empresa)
-        sucesso, mensagem, agendamento = agendamento_service.criar_agendamento(
+        sucesso, mensagem, agendamento = await agendamento_service.acriar_agendamento(
             cliente, funcionario, servico, data_hora_inicio
         )
         
@@ -163,7 +371,7 @@ def criar_agendamento(request, empresa_id):
         return JsonResponse({"error": f"Erro interno: {str(e)}"}, status=500)
 
 
-def adicionar_fila_espera(request, empresa_id):
+async def adicionar_fila_espera(request, empresa_id):
     """View para adicionar cliente à fila de espera"""
     if request.method != "POST":
         return JsonResponse({"error": "Método não permitido"}, status=405)
@@ -188,15 +396,15 @@ def adicionar_fila_espera(request, empresa_id):
             return JsonResponse({"error": "Dados obrigatórios não fornecidos"}, status=400)
         
         # Obter objetos
-        empresa = get_object_or_404(Empresa, id=empresa_id, ativo=True)
+        empresa = await aget_object_or_404(Empresa, id=empresa_id, ativo=True)
         servico = None
         funcionario_preferido = None
         
         if servico_id:
-            servico = get_object_or_404(Servico, id=servico_id, empresa=empresa)
+            servico = await aget_object_or_404(Servico, id=servico_id, empresa=empresa)
         
         if funcionario_id:
-            funcionario_preferido = get_object_or_404(Funcionario, id=funcionario_id, empresa=empresa)
+            funcionario_preferido = await aget_object_or_404(Funcionario, id=funcionario_id, empresa=empresa)
         
         # Converter data
         data_desejada = datetime.strptime(data_desejada_str, "%Y-%m-%d").date()
@@ -206,18 +414,12 @@ def adicionar_fila_espera(request, empresa_id):
         if horario_desejado_str:
             horario_desejado = datetime.strptime(horario_desejado_str, "%H:%M").time()
         
-        # Buscar ou criar cliente
-        cliente, created = Cliente.objects.get_or_create(
-            email=cliente_email,
-            defaults={
-                "nome": cliente_nome,
-                "telefone": cliente_telefone or ""
-            }
-        )
+        # Criar o cliente ou atualizar nome e telefone, numa única instrução
+        cliente = await aresolver_cliente(cliente_email, cliente_nome, cliente_telefone)
         
         # Adicionar à fila de espera
         fila_service = FilaEsperaService(empresa)
-        sucesso, mensagem, fila_entry = fila_service.adicionar_a_fila(
+        sucesso, mensagem, fila_entry = await fila_service.aadicionar_a_fila(
             cliente=cliente,
             data_desejada=data_desejada,
             servico=servico,
@@ -252,8 +454,10 @@ def meus_agendamentos(request):
         })
     
     try:
-        cliente = Cliente.objects.get(email=email)
-        agendamentos = cliente.get_agendamentos_ativos()
+        cliente = Cliente.objects.get(email=normalizar_email(email))
+        agendamentos = cliente.get_agendamentos_ativos().select_related(
+            "servico", "funcionario", "empresa__parametros"
+        )
         
         context = {
             "titulo": "Meus Agendamentos",
@@ -272,6 +476,82 @@ def meus_agendamentos(request):
         }
         return render(request, "agendamentos/meus_agendamentos.html", context)
 
+
+def historico_agendamentos(request):
+    """
+    Histórico de agendamentos de um cliente (por email), do mais recente para
+    o mais antigo, em páginas navegadas pelo cursor da página anterior.
+    """
+    email = request.GET.get("email")
+    context = {"titulo": "Histórico de Agendamentos", "agendamentos": [], "email": email or ""}
+    if not email:
+        return render(request, "agendamentos/historico_agendamentos.html", context)
+    
+    cliente = Cliente.objects.filter(email=normalizar_email(email)).only("id", "nome").first()
+    if cliente is None:
+        context["erro"] = "Nenhum agendamento encontrado para este e-mail."
+        return render(request, "agendamentos/historico_agendamentos.html", context)
+    
+    try:
+        pagina = pagina_historico(cliente.id, request.GET.get("cursor"))
+    except CursorInvalido as e:
+        context["erro"] = str(e)
+        return render(request, "agendamentos/historico_agendamentos.html", context, status=400)
+    
+    context.update({
+        "cliente": cliente,
+        "agendamentos": pagina.agendamentos,
+        "proximo_cursor": pagina.proximo_cursor,
+        "primeira_pagina": not request.GET.get("cursor"),
+    })
+    return render(request, "agendamentos/historico_agendamentos.html", context)
+
+
+@require_http_methods(["GET"])
+def api_historico_agendamentos(request):
+    """
+    API do histórico de agendamentos de um cliente, paginado por cursor.
+    
+    Parâmetros (GET): email, cursor (proximo_cursor da resposta anterior;
+    ausente na primeira página) e tamanho (padrão 20, máximo 100).
+    """
+    email = request.GET.get("email")
+    if not email:
+        return JsonResponse({"error": "Informe o email"}, status=400)
+    try:
+        tamanho = int(request.GET.get("tamanho", TAMANHO_PAGINA))
+    except ValueError:
+        return JsonResponse({"error": "tamanho deve ser um número"}, status=400)
+    
+    cliente_id = Cliente.objects.filter(email=normalizar_email(email)).values_list("id", flat=True).first()
+    if cliente_id is None:
+        return JsonResponse({"success": True, "agendamentos": [], "proximo_cursor": None})
+    
+    try:
+        pagina = pagina_historico(cliente_id, request.GET.get("cursor"), tamanho)
+    except CursorInvalido as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    
+    return JsonResponse({
+        "success": True,
+        "agendamentos": [
+            {
+                "id": agendamento.id,
+                "empresa": agendamento.empresa.nome,
+                "servico": agendamento.servico.nome,
+                "funcionario": agendamento.funcionario.nome,
+                "datetime": agendamento.data_hora_inicio.isoformat(),
+                "display": timezone.localtime(agendamento.data_hora_inicio).strftime("%d/%m/%Y %H:%M"),
+                "status": agendamento.status,
+                "status_display": agendamento.get_status_display(),
+                "preco": str(agendamento.preco_cobrado),
+            }
+            for agendamento in pagina.agendamentos
+        ],
+        "proximo_cursor": pagina.proximo_cursor,
+    })
+
+
 @login_required
 def agenda_barbeiro(request, ano=None, mes=None, dia=None):
     """
@@ -279,7 +559,7 @@ def agenda_barbeiro(request, ano=None, mes=None, dia=None):
     Exibe os agendamentos para a semana da data selecionada ou do dia atual.
     """
     try:
-        funcionario = request.user.funcionario
+        funcionario = Funcionario.objects.select_related("empresa").get(user=request.user)
     except Funcionario.DoesNotExist:
         messages.error(request, "Você não está associado a um funcionário.")
         return redirect("agendamentos:home")
@@ -310,12 +590,12 @@ def agenda_barbeiro(request, ano=None, mes=None, dia=None):
 
     agendamentos_semana = funcionario.get_agendamentos_periodo(
         inicio_semana, fim_semana
-    )
+    ).select_related("cliente", "servico")
 
     # Organizar agendamentos por dia da semana
     agenda_semanal = { (inicio_semana + timedelta(days=i)): [] for i in range(7) }
     for agendamento in agendamentos_semana:
-        agenda_semanal[agendamento.data_hora_inicio.date()].append(agendamento)
+        agenda_semanal[timezone.localtime(agendamento.data_hora_inicio).date()].append(agendamento)
     
     # Preparar datas para navegação
     semana_anterior = data_base - timedelta(weeks=1)
@@ -332,12 +612,66 @@ def agenda_barbeiro(request, ano=None, mes=None, dia=None):
     }
     return render(request, "agendamentos/agenda_barbeiro.html", context)
 
+@login_required
+def agenda_barbeiro_mes(request, ano=None, mes=None):
+    """
+    View para o resumo mensal da agenda do barbeiro logado.
+    Exibe, para cada dia do mês, o número de agendamentos, o tempo reservado
+    e a receita, agregados pelo banco sem carregar os agendamentos.
+    """
+    try:
+        funcionario = Funcionario.objects.select_related("empresa").get(user=request.user)
+    except Funcionario.DoesNotExist:
+        messages.error(request, "Você não está associado a um funcionário.")
+        return redirect("agendamentos:home")
+
+    hoje = timezone.localdate()
+    try:
+        inicio_mes = date(int(ano), int(mes), 1) if ano and mes else hoje.replace(day=1)
+    except ValueError:
+        messages.error(request, "Data inválida.")
+        inicio_mes = hoje.replace(day=1)
+    fim_mes = inicio_mes.replace(day=calendar.monthrange(inicio_mes.year, inicio_mes.month)[1])
+
+    resumos = {}
+    for resumo in funcionario.get_resumo_por_dia(inicio_mes, fim_mes):
+        resumo["minutos"] = int(resumo["duracao"].total_seconds() // 60) if resumo["duracao"] else 0
+        resumos[resumo["dia"]] = resumo
+
+    # Semanas do calendário, começando no domingo como a agenda semanal
+    semanas = [
+        [
+            {"data": dia, "do_mes": dia.month == inicio_mes.month, "resumo": resumos.get(dia)}
+            for dia in semana
+        ]
+        for semana in calendar.Calendar(firstweekday=6).monthdatescalendar(inicio_mes.year, inicio_mes.month)
+    ]
+
+    totais = {
+        "agendamentos": sum(resumo["agendamentos"] for resumo in resumos.values()),
+        "cancelados": sum(resumo["cancelados"] for resumo in resumos.values()),
+        "minutos": sum(resumo["minutos"] for resumo in resumos.values()),
+        "receita": sum((resumo["receita"] or 0 for resumo in resumos.values()), Decimal("0")),
+    }
+
+    context = {
+        "titulo": f"Agenda Mensal de {funcionario.nome}",
+        "funcionario": funcionario,
+        "inicio_mes": inicio_mes,
+        "semanas": semanas,
+        "totais": totais,
+        "mes_anterior": inicio_mes - timedelta(days=1),
+        "proximo_mes": fim_mes + timedelta(days=1),
+    }
+    return render(request, "agendamentos/agenda_barbeiro_mes.html", context)
+
 @login_required
 @require_http_methods(["POST"])
 def cancelar_agendamento(request, agendamento_id):
     """
     Permite ao barbeiro cancelar um agendamento.
-    Envia notificação via WhatsApp ao cliente após o cancelamento.
+    Enfileira uma notificação via WhatsApp ao cliente sobre o cancelamento.
+    O horário liberado é oferecido à fila de espera por `manage.py processar_vagas`.
     """
     try:
         funcionario = request.user.funcionario
@@ -345,18 +679,22 @@ def cancelar_agendamento(request, agendamento_id):
         return JsonResponse({"success": False, "error": "Funcionário não encontrado."})
 
     try:
-        agendamento = Agendamento.objects.get(id=agendamento_id, funcionario=funcionario)
-        agendamento.status = "cancelado"
-        agendamento.save()
-
-        # Enviar notificação via WhatsApp ao cliente
-        mensagem = (
-            f"Olá {agendamento.cliente.nome}, seu horário com {agendamento.funcionario.nome} "
-            f"no dia {agendamento.data_hora_inicio.strftime('%d/%m/%Y')} às "
-            f"{agendamento.data_hora_inicio.strftime('%H:%M')} foi cancelado."
-        )
-        numero_cliente = f"whatsapp:+55{''.join(filter(str.isdigit, agendamento.cliente.telefone))}"
-        enviar_whatsapp(mensagem, numero_cliente)
+        with transaction.atomic():
+            agendamento = Agendamento.objects.select_related("cliente", "funcionario").get(
+                id=agendamento_id, funcionario=funcionario
+            )
+            agendamento.status = "cancelado"
+            agendamento.save()
+
+            # Notificação via WhatsApp ao cliente, gravada na caixa de saída na mesma transação
+            if agendamento.cliente.telefone:
+                inicio = timezone.localtime(agendamento.data_hora_inicio)
+                mensagem = (
+                    f"Olá {agendamento.cliente.nome}, seu horário com {agendamento.funcionario.nome} "
+                    f"no dia {inicio.strftime('%d/%m/%Y')} às "
+                    f"{inicio.strftime('%H:%M')} foi cancelado."
+                )
+                enfileirar_whatsapp(mensagem, agendamento.cliente.numero_whatsapp)
 
         messages.success(request, "Agendamento cancelado com sucesso!")
         return JsonResponse({"success": True, "message": "Agendamento cancelado com sucesso!"})
@@ -373,6 +711,36 @@ def cancelar_agendamento(request, agendamento_id):
         })
 
 
+@login_required
+@require_http_methods(["POST"])
+def marcar_nao_compareceu(request, agendamento_id):
+    """
+    Permite ao barbeiro registrar que o cliente não compareceu.
+    O restante do horário é oferecido à fila de espera por `manage.py processar_vagas`.
+    """
+    try:
+        funcionario = request.user.funcionario
+    except Funcionario.DoesNotExist:
+        return JsonResponse({"success": False, "error": "Funcionário não encontrado."})
+
+    try:
+        with transaction.atomic():
+            agendamento = Agendamento.objects.get(
+                id=agendamento_id,
+                funcionario=funcionario,
+                status__in=Agendamento.STATUS_OCUPAM_AGENDA,
+                data_hora_inicio__lte=timezone.now()
+            )
+            agendamento.status = "nao_compareceu"
+            agendamento.save()
+    except Agendamento.DoesNotExist:
+        return JsonResponse({
+            "success": False,
+            "error": "Agendamento não encontrado, ainda não iniciado ou já encerrado."
+        })
+
+    return JsonResponse({"success": True, "message": "Falta registrada com sucesso!"})
+
 @login_required
 @require_http_methods(["GET", "POST"] )
 def agendar_para_cliente(request):
@@ -415,19 +783,8 @@ def agendar_para_cliente(request):
         try:
             servico = get_object_or_404(Servico, id=servico_id, empresa=empresa)
             
-            # Buscar ou criar cliente
-            cliente, created = Cliente.objects.get_or_create(
-                email=cliente_email,
-                defaults={
-                    "nome": cliente_nome,
-                    "telefone": cliente_telefone
-                }
-            )
-            if not created:
-                # Atualiza nome e telefone se o cliente já existe
-                cliente.nome = cliente_nome
-                cliente.telefone = cliente_telefone
-                cliente.save()
+            # Criar o cliente ou atualizar nome e telefone, numa única instrução
+            cliente = resolver_cliente(cliente_email, cliente_nome, cliente_telefone)
 
             # Combinar data e hora
             data_agendamento = datetime.strptime(data_agendamento_str, "%Y-%m-%d")
@@ -462,6 +819,48 @@ def agendar_para_cliente(request):
     return render(request, "agendamentos/agendar_para_cliente.html", context)
 
 
+# Exportação de agendamentos
+
+@login_required
+@require_http_methods(["GET"])
+def exportar_agendamentos(request):
+    """
+    Exporta os agendamentos de um período em CSV ou NDJSON, como fluxo.
+
+    Parâmetros (GET): data_inicio e data_fim (AAAA-MM-DD), formato ("csv" ou
+    "ndjson") e empresa (ID, opcional). Usuários da equipe (is_staff) exportam
+    qualquer empresa ou todas; funcionários, apenas a própria empresa.
+    """
+    try:
+        data_inicio = datetime.strptime(request.GET.get("data_inicio", ""), "%Y-%m-%d").date()
+        data_fim = datetime.strptime(request.GET.get("data_fim", ""), "%Y-%m-%d").date()
+        empresa_id = int(request.GET["empresa"]) if request.GET.get("empresa") else None
+    except ValueError:
+        return JsonResponse({"error": "Informe data_inicio e data_fim no formato AAAA-MM-DD"}, status=400)
+    if data_fim < data_inicio:
+        return JsonResponse({"error": "data_fim deve ser posterior a data_inicio"}, status=400)
+
+    formato = request.GET.get("formato", "csv")
+    if formato not in exportacao.FORMATOS:
+        return JsonResponse({"error": "Formato deve ser csv ou ndjson"}, status=400)
+
+    if not request.user.is_staff:
+        funcionario = Funcionario.objects.filter(user=request.user).only("empresa_id").first()
+        if funcionario is None or empresa_id not in (None, funcionario.empresa_id):
+            return JsonResponse({"error": "Sem permissão para exportar estes agendamentos"}, status=403)
+        empresa_id = funcionario.empresa_id
+
+    tipo_conteudo, extensao = exportacao.FORMATOS[formato]
+    response = StreamingHttpResponse(
+        exportacao.exportar(formato, data_inicio, data_fim, empresa_id),
+        content_type=tipo_conteudo
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="agendamentos_{data_inicio:%Y%m%d}_{data_fim:%Y%m%d}.{extensao}"'
+    )
+    return response
+
+
 # Views de autenticação (login/logout)
 
 def login_view(request):
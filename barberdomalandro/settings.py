@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+load_dotenv()
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista, para medir também as consultas dos demais middlewares
+    'core.middleware.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,10 +85,46 @@ WSGI_APPLICATION = 'barberdomalandro.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# PRAGMAs executados em cada nova conexão SQLite (https://www.sqlite.org/pragma.html).
+# SQLITE_JOURNAL_MODE=WAL (recomendado em produção): leitores não esperam o
+# escritor nem o bloqueiam. O modo WAL fica gravado no arquivo do banco e cria
+# os arquivos -wal e -shm ao lado dele; por isso não é o padrão, que mantém o
+# db.sqlite3 de desenvolvimento intacto. Em WAL, synchronous=NORMAL não
+# sincroniza o disco a cada commit; uma queda de energia pode perder as
+# últimas transações, mas não corrompe o banco (fora do WAL vale o padrão
+# do SQLite, FULL). cache_size negativo é em KiB.
+# Um valor vazio no ambiente mantém o padrão do SQLite.
+# Sem SQLITE_* no ambiente valem os padrões do SQLite (rollback journal,
+# BEGIN DEFERRED). Comparar com o modo WAL (cenário "wal") com:
+# python manage.py benchmark_concorrencia
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', '')
+SQLITE_PRAGMAS = {
+    'journal_mode': SQLITE_JOURNAL_MODE,
+    'synchronous': os.getenv(
+        'SQLITE_SYNCHRONOUS', 'NORMAL' if SQLITE_JOURNAL_MODE.upper() == 'WAL' else ''
+    ),
+    'mmap_size': os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'cache_size': os.getenv('SQLITE_CACHE_SIZE', '-65536'),
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # Padrão do SQLite (DEFERRED): o lock de escrita só é obtido na
+            # primeira escrita. As reservas já começam escrevendo (TravaAgenda)
+            # e aguardam em fila pelo timeout. SQLITE_TRANSACTION_MODE=IMMEDIATE
+            # faz todo atomic() obter o lock no BEGIN, inclusive os que só leem
+            'transaction_mode': os.getenv('SQLITE_TRANSACTION_MODE', '') or None,
+            # Segundos que uma conexão aguarda o lock antes de "database is locked"
+            # (busy_timeout do SQLite)
+            'timeout': float(os.getenv('SQLITE_TIMEOUT', '20')),
+            'init_command': ';'.join(
+                f'PRAGMA {nome}={valor}' for nome, valor in SQLITE_PRAGMAS.items() if valor
+            ),
+        },
     }
 }
 
@@ -135,6 +178,73 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Configurações adicionais para o sistema de agendamento
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache (disponibilidade de horários, etc.)
+# O padrão (locmem) é por processo: com vários processos/workers use um cache
+# compartilhado, ex: CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# e CACHE_LOCATION=/var/tmp/barberdomalandro_cache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'barberdomalandro'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+        },
+    }
+}
+
+# O cache é visto por todos os processos (workers, importar_dados,
+# processar_vagas)? Os caches de disponibilidade e das páginas públicas são
+# invalidados por versões gravadas no cache; num cache local ao processo
+# (locmem, dummy) as invalidações feitas por outro processo não chegam aos
+# demais, e esses caches ficam desativados, assim como o do catálogo das
+# empresas (agendamentos/catalogo.py), que passa a ser lido do banco a cada
+# uso. Com um único processo, sem os comandos em execução,
+# CACHE_COMPARTILHADO=True reativa os caches sobre o locmem.
+CACHE_COMPARTILHADO = os.getenv(
+    'CACHE_COMPARTILHADO',
+    str(CACHES['default']['BACKEND'] not in (
+        'django.core.cache.backends.locmem.LocMemCache',
+        'django.core.cache.backends.dummy.DummyCache',
+    ))
+) == 'True'
+
+# Expor consultas SQL e tempos de cada requisição nos cabeçalhos
+# Server-Timing e X-Consultas-SQL (ver core/middleware.py)
+INSTRUMENTACAO_CABECALHOS = os.getenv('INSTRUMENTACAO_CABECALHOS', str(DEBUG)) == 'True'
+
+# Requisições acima destes limites são registradas com nível WARNING
+INSTRUMENTACAO_LIMITE_CONSULTAS = int(os.getenv('INSTRUMENTACAO_LIMITE_CONSULTAS', '50'))
+INSTRUMENTACAO_LIMITE_MS = int(os.getenv('INSTRUMENTACAO_LIMITE_MS', '1000'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INSTRUMENTACAO_LOG_NIVEL=INFO registra todas as requisições
+        'core.instrumentacao': {
+            'handlers': ['console'],
+            'level': os.getenv('INSTRUMENTACAO_LOG_NIVEL', 'WARNING'),
+        },
+    },
+}
+
+# Tempo máximo (segundos) dos horários disponíveis em cache; 0 desativa o cache
+DISPONIBILIDADE_CACHE_TTL = int(os.getenv('DISPONIBILIDADE_CACHE_TTL', '600'))
+
+# Tempo máximo (segundos) que navegadores e proxies reutilizam as respostas GET
+# de verificar_disponibilidade sem revalidar; nunca ultrapassa a próxima mudança
+# causada pela antecedência mínima
+DISPONIBILIDADE_HTTP_MAX_AGE = int(os.getenv('DISPONIBILIDADE_HTTP_MAX_AGE', '60'))
+
+# Tempo máximo (segundos) dos fragmentos das páginas públicas (lista de
+# empresas e página de agendamento) em cache; 0 desativa o cache. Os
+# fragmentos são invalidados por versão quando os dados mudam (ver
+# agendamentos/paginas.py)
+PAGINAS_CACHE_TTL = int(os.getenv('PAGINAS_CACHE_TTL', '600'))
+
 # Configurações de e-mail (para notificações)
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # Para desenvolvimento
 # EMAIL_HOST = 'smtp.gmail.com'
@@ -143,5 +253,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # EMAIL_HOST_USER = 'seu_email@gmail.com'
 # EMAIL_HOST_PASSWORD = 'sua_senha'
 
-from dotenv import load_dotenv
-load_dotenv()
\ No newline at end of file
+# Backend de envio de WhatsApp (ver core/whatsapp.py). Em desenvolvimento ou
+# testes de carga use core.whatsapp.ConsoleBackend, ArquivoBackend,
+# MemoriaBackend ou HttpBackend para não depender do Twilio.
+WHATSAPP_BACKEND = os.getenv('WHATSAPP_BACKEND', 'core.whatsapp.TwilioBackend')
+WHATSAPP_ARQUIVO = os.getenv('WHATSAPP_ARQUIVO', str(BASE_DIR / 'whatsapp.jsonl'))
+WHATSAPP_HTTP_URL = os.getenv('WHATSAPP_HTTP_URL', 'http://127.0.0.1:8025/mensagens')
+# Conexões simultâneas do pool HTTP usado no envio assíncrono
+# (processar_notificacoes --concorrencia)
+WHATSAPP_HTTP_CONEXOES = int(os.getenv('WHATSAPP_HTTP_CONEXOES', '20'))
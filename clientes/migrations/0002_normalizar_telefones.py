@@ -0,0 +1,41 @@
+from django.db import migrations
+
+TAMANHO_LOTE = 1000
+
+
+def normalizar_telefone(telefone):
+    # Cópia de clientes.services.normalizar_telefone no momento desta migração
+    digitos = "".join(filter(str.isdigit, telefone or ""))
+    if digitos.startswith("55") and len(digitos) in (12, 13):
+        # Código do país
+        digitos = digitos[2:]
+    elif digitos.startswith("0") and len(digitos) in (11, 12):
+        # Prefixo de operadora/discagem de longa distância
+        digitos = digitos[1:]
+    return digitos
+
+
+def normalizar_telefones(apps, schema_editor):
+    # Telefones gravados antes da normalização na escrita (ver clientes/services.py)
+    Cliente = apps.get_model("clientes", "Cliente")
+    alterados = []
+    for cliente in Cliente.objects.only("id", "telefone").iterator(chunk_size=TAMANHO_LOTE):
+        telefone = normalizar_telefone(cliente.telefone)
+        if telefone != cliente.telefone:
+            cliente.telefone = telefone
+            alterados.append(cliente)
+        if len(alterados) >= TAMANHO_LOTE:
+            Cliente.objects.bulk_update(alterados, ["telefone"])
+            alterados = []
+    Cliente.objects.bulk_update(alterados, ["telefone"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clientes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_telefones, migrations.RunPython.noop),
+    ]
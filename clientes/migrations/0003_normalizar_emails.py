@@ -0,0 +1,39 @@
+from django.db import migrations
+
+TAMANHO_LOTE = 1000
+
+
+def normalizar_email(email):
+    # Cópia de clientes.services.normalizar_email no momento desta migração
+    return (email or "").strip().lower()
+
+
+def normalizar_emails(apps, schema_editor):
+    # E-mails gravados antes da normalização na escrita (ver clientes/services.py).
+    # Um e-mail cuja forma normalizada já pertence a outro cliente é mantido
+    # como está, para não violar a unicidade; os dois cadastros devem ser
+    # unificados manualmente.
+    Cliente = apps.get_model("clientes", "Cliente")
+    usados = set(Cliente.objects.values_list("email", flat=True))
+    alterados = []
+    for cliente in Cliente.objects.only("id", "email").iterator(chunk_size=TAMANHO_LOTE):
+        email = normalizar_email(cliente.email)
+        if email != cliente.email and email not in usados:
+            usados.add(email)
+            cliente.email = email
+            alterados.append(cliente)
+        if len(alterados) >= TAMANHO_LOTE:
+            Cliente.objects.bulk_update(alterados, ["email"])
+            alterados = []
+    Cliente.objects.bulk_update(alterados, ["email"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clientes", "0002_normalizar_telefones"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_emails, migrations.RunPython.noop),
+    ]
@@ -45,6 +45,18 @@ class Cliente(models.Model):
     def __str__(self):
         return f"{self.nome} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        # Telefone e e-mail gravados já normalizados (ver clientes/services.py)
+        from .services import normalizar_email, normalizar_telefone
+        self.telefone = normalizar_telefone(self.telefone)
+        self.email = normalizar_email(self.email)
+        super().save(*args, **kwargs)
+
+    @property
+    def numero_whatsapp(self):
+        """Destino do WhatsApp do cliente. Ex: 'whatsapp:+5511987654321'"""
+        return f"whatsapp:+55{self.telefone}"
+
     def get_nome_display(self):
         """Retorna o nome do cliente ou do usuário associado"""
         if self.user and self.user.first_name:
@@ -60,6 +72,9 @@ class Cliente(models.Model):
         ).order_by("data_hora_inicio")
 
     def get_historico_agendamentos(self):
-        """Retorna histórico completo de agendamentos do cliente"""
+        """
+        Retorna histórico completo de agendamentos do cliente.
+        Para listar por páginas, use agendamentos.historico.pagina_historico.
+        """
         from agendamentos.models import Agendamento
-        return Agendamento.objects.filter(cliente=self).order_by("-data_hora_inicio")
+        return Agendamento.objects.filter(cliente=self).order_by("-data_hora_inicio", "-id")
@@ -0,0 +1,80 @@
+"""
+Identificação dos clientes nas reservas pelo e-mail.
+
+As reservas, a fila de espera e o agendamento feito pelo barbeiro recebem
+nome, e-mail e telefone digitados pelo cliente. Em vez de buscar o cliente,
+criá-lo se não existe e salvá-lo de novo com todos os campos, o cadastro é
+resolvido com uma única instrução INSERT ... ON CONFLICT (email) DO UPDATE,
+que grava apenas os campos informados. Isso encurta o tempo em que a reserva
+mantém o lock de escrita do SQLite.
+
+O telefone é normalizado uma única vez, ao ser gravado: apenas dígitos, com
+DDD e sem o código do país, de modo que o destino do WhatsApp é montado sem
+reprocessar o número (Cliente.numero_whatsapp). O e-mail é gravado e
+buscado em minúsculas (normalizar_email), de modo que "Ana@Email.com" e
+"ana@email.com" identificam o mesmo cliente em todas as buscas exatas.
+"""
+from typing import List, Optional, Tuple
+
+from .models import Cliente
+
+
+def normalizar_telefone(telefone: Optional[str]) -> str:
+    """
+    Normaliza um telefone brasileiro para apenas dígitos, com DDD.
+    Exemplos: '(11) 98765-4321' -> '11987654321'; '+55 11 98765-4321' -> '11987654321'
+    """
+    digitos = "".join(filter(str.isdigit, telefone or ""))
+    if digitos.startswith("55") and len(digitos) in (12, 13):
+        # Código do país
+        digitos = digitos[2:]
+    elif digitos.startswith("0") and len(digitos) in (11, 12):
+        # Prefixo de operadora/discagem de longa distância
+        digitos = digitos[1:]
+    return digitos
+
+
+def normalizar_email(email: Optional[str]) -> str:
+    """Normaliza um e-mail para a gravação e as buscas: sem espaços e em minúsculas."""
+    return (email or "").strip().lower()
+
+
+def _preparar(email: str, nome: str, telefone: Optional[str]) -> Tuple[Cliente, List[str]]:
+    cliente = Cliente(email=normalizar_email(email), nome=nome, telefone=normalizar_telefone(telefone))
+    # Um telefone não informado não apaga o já cadastrado
+    campos = ["nome", "telefone"] if cliente.telefone else ["nome"]
+    return cliente, campos
+
+
+def _nao_gravados(campos: List[str]) -> List[str]:
+    # Campos que a instrução não grava (telefone não informado, usuário,
+    # observações...), lidos do banco em seguida
+    gravados = {"id", "email", *campos}
+    return [campo.name for campo in Cliente._meta.concrete_fields if campo.name not in gravados]
+
+
+def resolver_cliente(email: str, nome: str, telefone: Optional[str] = None) -> Cliente:
+    """
+    Retorna o cliente do e-mail, criando-o ou atualizando nome e telefone
+    (se informado) com uma única instrução.
+
+    Os campos gravados são sempre escritos, mesmo que iguais aos do banco:
+    saber se mudaram exigiria lê-los antes, na mesma transação. Os demais
+    campos são lidos do banco depois da gravação.
+    """
+    cliente, campos = _preparar(email, nome, telefone)
+    Cliente.objects.bulk_create(
+        [cliente], update_conflicts=True, unique_fields=["email"], update_fields=campos
+    )
+    cliente.refresh_from_db(fields=_nao_gravados(campos))
+    return cliente
+
+
+async def aresolver_cliente(email: str, nome: str, telefone: Optional[str] = None) -> Cliente:
+    """Versão assíncrona de resolver_cliente, para views async."""
+    cliente, campos = _preparar(email, nome, telefone)
+    await Cliente.objects.abulk_create(
+        [cliente], update_conflicts=True, unique_fields=["email"], update_fields=campos
+    )
+    await cliente.arefresh_from_db(fields=_nao_gravados(campos))
+    return cliente
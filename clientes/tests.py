@@ -1,3 +1,39 @@
 from django.test import TestCase
 
-# Create your tests here.
+from core.testing import OrcamentoConsultasMixin
+from .models import Cliente
+from .services import normalizar_email, normalizar_telefone, resolver_cliente
+
+
+class ResolverClienteTest(OrcamentoConsultasMixin, TestCase):
+    """Cadastro dos clientes das reservas numa única instrução, pelo e-mail."""
+
+    def test_normalizar_telefone(self):
+        for telefone in ("(11) 98765-4321", "+55 11 98765-4321", "011 98765-4321", "11987654321"):
+            with self.subTest(telefone=telefone):
+                self.assertEqual(normalizar_telefone(telefone), "11987654321")
+        self.assertEqual(normalizar_telefone(None), "")
+
+    def test_email_normalizado(self):
+        self.assertEqual(normalizar_email(" Cliente@Teste.COM "), "cliente@teste.com")
+        cliente = resolver_cliente("Cliente@Teste.com", "Cliente")
+        self.assertEqual(resolver_cliente("cliente@teste.com ", "Cliente").pk, cliente.pk)
+        self.assertEqual(Cliente.objects.get().email, "cliente@teste.com")
+        outro = Cliente.objects.create(nome="Outro", email="Outro@Teste.com", telefone="11977777777")
+        self.assertEqual(outro.email, "outro@teste.com")
+
+    def test_cria_e_atualiza_numa_instrucao(self):
+        # A gravação (INSERT ... ON CONFLICT) e a leitura dos demais campos
+        with self.assertMaximoConsultas(2):
+            cliente = resolver_cliente("cliente@teste.com", "Cliente", "(11) 98765-4321")
+        self.assertEqual(cliente.numero_whatsapp, "whatsapp:+5511987654321")
+
+        with self.assertMaximoConsultas(2):
+            mesmo = resolver_cliente("cliente@teste.com", "Cliente Novo")
+        self.assertEqual(mesmo.pk, cliente.pk)
+        self.assertEqual(Cliente.objects.count(), 1)
+        # Telefone não informado: mantido e lido do banco
+        with self.assertMaximoConsultas(0):
+            self.assertEqual(mesmo.telefone, "11987654321")
+            self.assertTrue(mesmo.ativo)
+        self.assertEqual(Cliente.objects.get().nome, "Cliente Novo")
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Empresa, ParametrosEmpresa
+from .models import Empresa, ParametrosEmpresa, Notificacao
 
 @admin.register(Empresa)
 class EmpresaAdmin(admin.ModelAdmin):
@@ -10,3 +10,9 @@ class EmpresaAdmin(admin.ModelAdmin):
 @admin.register(ParametrosEmpresa)
 class ParametrosEmpresaAdmin(admin.ModelAdmin):
     list_display = ["empresa", "horario_abertura", "horario_fechamento", "intervalo_agendamento"]
+
+@admin.register(Notificacao)
+class NotificacaoAdmin(admin.ModelAdmin):
+    list_display = ["destino", "canal", "status", "tentativas", "proxima_tentativa", "data_criacao", "data_envio"]
+    list_filter = ["status", "canal", "data_criacao"]
+    search_fields = ["destino", "mensagem", "id_externo"]
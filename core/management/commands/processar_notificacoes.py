@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.notificacoes import MAX_TENTATIVAS, aprocessar_lote, processar_lote
+from core.whatsapp import get_backend
+
+
+class Command(BaseCommand):
+    help = "Envia as notificações pendentes da caixa de saída, em lotes, com novas tentativas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote", type=int, default=50,
+            help="Número máximo de mensagens por lote (padrão: 50)"
+        )
+        parser.add_argument(
+            "--max-tentativas", type=int, default=MAX_TENTATIVAS,
+            help=f"Tentativas antes de marcar a mensagem como falha (padrão: {MAX_TENTATIVAS})"
+        )
+        parser.add_argument(
+            "--continuo", action="store_true",
+            help="Continua processando até ser interrompido"
+        )
+        parser.add_argument(
+            "--intervalo", type=float, default=2.0,
+            help="Segundos de espera quando não há mensagens, no modo contínuo (padrão: 2)"
+        )
+        parser.add_argument(
+            "--concorrencia", type=int, default=1,
+            help="Mensagens enviadas ao mesmo tempo, pelo cliente HTTP assíncrono do backend (padrão: 1)"
+        )
+
+    def handle(self, *args, **options):
+        total = {"enviadas": 0, "reagendadas": 0, "falhas": 0}
+        try:
+            if options["concorrencia"] > 1:
+                asyncio.run(self._processar_async(total, options))
+            else:
+                self._processar(total, options)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Total - Enviadas: {total['enviadas']} | "
+            f"Reagendadas: {total['reagendadas']} | "
+            f"Falhas: {total['falhas']}"
+        ))
+
+    def _processar(self, total, options):
+        while True:
+            resultado = processar_lote(
+                limite=options["lote"],
+                max_tentativas=options["max_tentativas"]
+            )
+            if not self._continuar(total, resultado, options):
+                break
+            if not any(resultado.values()):
+                time.sleep(options["intervalo"])
+
+    async def _processar_async(self, total, options):
+        # O pool de conexões do backend é reaproveitado por todos os lotes
+        backend = get_backend()
+        try:
+            while True:
+                resultado = await aprocessar_lote(
+                    limite=options["lote"],
+                    enviar=backend.aenviar,
+                    max_tentativas=options["max_tentativas"],
+                    concorrencia=options["concorrencia"]
+                )
+                if not self._continuar(total, resultado, options):
+                    break
+                if not any(resultado.values()):
+                    await asyncio.sleep(options["intervalo"])
+        finally:
+            await backend.afechar()
+
+    def _continuar(self, total, resultado, options):
+        """Soma e exibe o resultado do lote; retorna se há mais lotes a processar."""
+        for chave, valor in resultado.items():
+            total[chave] += valor
+        if any(resultado.values()):
+            self.stdout.write(
+                f"Enviadas: {resultado['enviadas']} | "
+                f"Reagendadas: {resultado['reagendadas']} | "
+                f"Falhas: {resultado['falhas']}"
+            )
+        # Sem modo contínuo: esvaziar apenas o que está pronto agora
+        return options["continuo"] or sum(resultado.values()) >= options["lote"]
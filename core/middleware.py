@@ -0,0 +1,105 @@
+"""
+Instrumentação por requisição: número de consultas SQL, tempo gasto no banco
+e tempo total da view.
+
+As medidas são registradas no logger "core.instrumentacao" (nível INFO, ou
+WARNING quando a requisição passa de INSTRUMENTACAO_LIMITE_CONSULTAS consultas
+ou INSTRUMENTACAO_LIMITE_MS milissegundos) e, se
+settings.INSTRUMENTACAO_CABECALHOS for verdadeiro, expostas na resposta:
+
+- Server-Timing: db (tempo no banco) e app (tempo total), exibidos pelas
+  ferramentas de desenvolvedor dos navegadores
+- X-Consultas-SQL: número de consultas executadas
+
+O middleware funciona tanto em requisições síncronas quanto assíncronas, de
+modo que, sob ASGI, não obriga as views async a rodarem numa thread. As
+conexões do Django são por thread e, numa requisição async, as consultas são
+executadas pela thread de sync_to_async (thread_sensitive), a mesma durante
+toda a requisição; o medidor é instalado a partir dela.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("core.instrumentacao")
+
+
+class MedidorConsultas:
+    """
+    Wrapper de execução (connection.execute_wrapper) que conta as consultas
+    e acumula o tempo gasto em cada uma.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_banco = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo_banco += time.perf_counter() - inicio
+            self.consultas += 1
+
+    def medir(self):
+        """Context manager que instala o medidor em todas as conexões."""
+        pilha = ExitStack()
+        for conexao in connections.all():
+            pilha.enter_context(conexao.execute_wrapper(self))
+        return pilha
+
+
+class InstrumentacaoMiddleware:
+    """Registra consultas, tempo de banco e tempo da view de cada requisição."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medidor = MedidorConsultas()
+        inicio = time.perf_counter()
+        with medidor.medir():
+            response = self.get_response(request)
+        return self._registrar(request, response, medidor, inicio)
+
+    async def __acall__(self, request):
+        medidor = MedidorConsultas()
+        inicio = time.perf_counter()
+        # Nas conexões da thread que executará as consultas da requisição, e
+        # não nas da thread do event loop
+        with await sync_to_async(medidor.medir)():
+            response = await self.get_response(request)
+        return self._registrar(request, response, medidor, inicio)
+
+    def _registrar(self, request, response, medidor, inicio):
+        tempo_total = (time.perf_counter() - inicio) * 1000
+        tempo_banco = medidor.tempo_banco * 1000
+
+        excedeu = (
+            medidor.consultas > getattr(settings, "INSTRUMENTACAO_LIMITE_CONSULTAS", 50)
+            or tempo_total > getattr(settings, "INSTRUMENTACAO_LIMITE_MS", 1000)
+        )
+        logger.log(
+            logging.WARNING if excedeu else logging.INFO,
+            "%s %s %s - %d consultas, banco %.1f ms, total %.1f ms",
+            request.method, request.path, response.status_code,
+            medidor.consultas, tempo_banco, tempo_total
+        )
+        if getattr(settings, "INSTRUMENTACAO_CABECALHOS", settings.DEBUG):
+            response["Server-Timing"] = (
+                f'db;dur={tempo_banco:.1f};desc="{medidor.consultas} consultas", '
+                f"app;dur={tempo_total:.1f}"
+            )
+            response["X-Consultas-SQL"] = str(medidor.consultas)
+        return response
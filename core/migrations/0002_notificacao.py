@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canal', models.CharField(choices=[('whatsapp', 'WhatsApp')], default='whatsapp', max_length=20, verbose_name='Canal')),
+                ('destino', models.CharField(help_text='Ex: whatsapp:+5511987654321', max_length=50, verbose_name='Destino')),
+                ('mensagem', models.TextField(verbose_name='Mensagem')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('enviada', 'Enviada'), ('falhou', 'Falhou')], default='pendente', max_length=20, verbose_name='Status')),
+                ('tentativas', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now, help_text='Quando a mensagem pode ser (re)processada', verbose_name='Próxima Tentativa')),
+                ('lote', models.CharField(blank=True, help_text='Identificador do worker que reservou a mensagem', max_length=32, verbose_name='Lote')),
+                ('ultimo_erro', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('id_externo', models.CharField(blank=True, help_text='Identificador da mensagem no provedor', max_length=100, verbose_name='ID Externo')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('data_envio', models.DateTimeField(blank=True, null=True, verbose_name='Data de Envio')),
+            ],
+            options={
+                'verbose_name': 'Notificação',
+                'verbose_name_plural': 'Notificações',
+                'ordering': ['-data_criacao'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='notificacao_fila_idx')],
+            },
+        ),
+    ]
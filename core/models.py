@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Empresa(models.Model):
@@ -69,3 +70,71 @@ class ParametrosEmpresa(models.Model):
     def get_dias_funcionamento_list(self):
         """Retorna lista dos dias de funcionamento"""
         return [dia.strip() for dia in self.dias_funcionamento.split(',') if dia.strip()]
+
+
+class Notificacao(models.Model):
+    """
+    Caixa de saída de notificações (outbox).
+    As mensagens são gravadas na mesma transação da operação que as origina
+    e enviadas depois por um worker (manage.py processar_notificacoes).
+    """
+    CANAL_CHOICES = [
+        ("whatsapp", "WhatsApp"),
+    ]
+    STATUS_CHOICES = [
+        ("pendente", "Pendente"),
+        ("enviando", "Enviando"),
+        ("enviada", "Enviada"),
+        ("falhou", "Falhou"),
+    ]
+
+    canal = models.CharField(
+        max_length=20,
+        choices=CANAL_CHOICES,
+        default="whatsapp",
+        verbose_name="Canal"
+    )
+    destino = models.CharField(
+        max_length=50,
+        verbose_name="Destino",
+        help_text="Ex: whatsapp:+5511987654321"
+    )
+    mensagem = models.TextField(verbose_name="Mensagem")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="pendente",
+        verbose_name="Status"
+    )
+    tentativas = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    proxima_tentativa = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Próxima Tentativa",
+        help_text="Quando a mensagem pode ser (re)processada"
+    )
+    lote = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name="Lote",
+        help_text="Identificador do worker que reservou a mensagem"
+    )
+    ultimo_erro = models.TextField(blank=True, verbose_name="Último Erro")
+    id_externo = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="ID Externo",
+        help_text="Identificador da mensagem no provedor"
+    )
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
+    data_envio = models.DateTimeField(blank=True, null=True, verbose_name="Data de Envio")
+
+    class Meta:
+        verbose_name = "Notificação"
+        verbose_name_plural = "Notificações"
+        ordering = ["-data_criacao"]
+        indexes = [
+            models.Index(fields=["status", "proxima_tentativa"], name="notificacao_fila_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_canal_display()} para {self.destino} - {self.get_status_display()}"
@@ -0,0 +1,198 @@
+"""
+Caixa de saída (outbox) de notificações.
+
+As mensagens são gravadas com enfileirar_whatsapp() dentro da transação da
+operação que as origina (agendamento, cancelamento...) e enviadas fora da
+requisição por processar_lote(), executado pelo comando
+`manage.py processar_notificacoes`. Com --concorrencia, o comando usa
+aprocessar_lote(), que envia várias mensagens ao mesmo tempo pelo cliente
+HTTP assíncrono do backend.
+"""
+import asyncio
+import uuid
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notificacao
+from .whatsapp import get_backend
+
+# Número máximo de tentativas antes de a mensagem ir para o status "falhou"
+MAX_TENTATIVAS = 5
+
+# Espera antes da 1ª nova tentativa; dobra a cada falha, até ESPERA_MAXIMA
+ESPERA_INICIAL = timedelta(seconds=30)
+ESPERA_MAXIMA = timedelta(hours=1)
+
+# Tempo que uma mensagem fica reservada para um worker; após isso, se o worker
+# tiver morrido no meio do envio, a mensagem volta a ser processável
+DURACAO_RESERVA = timedelta(minutes=5)
+
+
+def enfileirar_whatsapp(mensagem: str, numero_destino: str) -> Notificacao:
+    """
+    Grava uma mensagem de WhatsApp na caixa de saída.
+    Deve ser chamada dentro da mesma transação da operação que a origina.
+    """
+    return Notificacao.objects.create(
+        canal="whatsapp",
+        destino=numero_destino,
+        mensagem=mensagem
+    )
+
+
+def enfileirar_whatsapp_lote(mensagens: Iterable[Tuple[str, str]]) -> List[Notificacao]:
+    """
+    Grava várias mensagens de WhatsApp na caixa de saída com um único INSERT.
+
+    Args:
+        mensagens: pares (mensagem, número de destino)
+    """
+    return Notificacao.objects.bulk_create([
+        Notificacao(canal="whatsapp", destino=numero_destino, mensagem=mensagem)
+        for mensagem, numero_destino in mensagens
+    ])
+
+
+def calcular_espera(tentativas: int) -> timedelta:
+    """Retorna a espera (backoff exponencial) após a n-ésima tentativa falha."""
+    return min(ESPERA_INICIAL * (2 ** (tentativas - 1)), ESPERA_MAXIMA)
+
+
+def _reservar_lote(limite: int):
+    """
+    Reserva até `limite` mensagens prontas para envio.
+
+    A reserva é feita com um UPDATE condicional, de modo que vários workers
+    podem rodar ao mesmo tempo sem enviar a mesma mensagem duas vezes.
+    """
+    agora = timezone.now()
+    prontas = (
+        Q(status="pendente", proxima_tentativa__lte=agora)
+        # Reservas expiradas de workers que pararam no meio do envio
+        | Q(status="enviando", proxima_tentativa__lte=agora)
+    )
+    ids = list(
+        Notificacao.objects.filter(prontas)
+        .order_by("proxima_tentativa")
+        .values_list("id", flat=True)[:limite]
+    )
+    if not ids:
+        return []
+
+    lote = uuid.uuid4().hex
+    Notificacao.objects.filter(prontas, id__in=ids).update(
+        status="enviando",
+        lote=lote,
+        proxima_tentativa=agora + DURACAO_RESERVA
+    )
+    return list(Notificacao.objects.filter(lote=lote, status="enviando").order_by("id"))
+
+
+def _registrar_resultado(
+    notificacao: Notificacao,
+    id_externo: Optional[str],
+    erro: str,
+    max_tentativas: int,
+    resultado: Dict[str, int]
+) -> None:
+    """Grava o resultado de uma tentativa de envio e atualiza os contadores."""
+    agora = timezone.now()
+    if not erro:
+        notificacao.status = "enviada"
+        notificacao.id_externo = id_externo
+        notificacao.data_envio = agora
+        resultado["enviadas"] += 1
+    elif notificacao.tentativas >= max_tentativas:
+        notificacao.status = "falhou"
+        resultado["falhas"] += 1
+    else:
+        notificacao.status = "pendente"
+        notificacao.proxima_tentativa = agora + calcular_espera(notificacao.tentativas)
+        resultado["reagendadas"] += 1
+
+    notificacao.ultimo_erro = erro
+    notificacao.lote = ""
+    notificacao.save(update_fields=[
+        "status", "tentativas", "proxima_tentativa", "lote",
+        "ultimo_erro", "id_externo", "data_envio"
+    ])
+
+
+def processar_lote(
+    limite: int = 50,
+    enviar: Optional[Callable[[str, str], Optional[str]]] = None,
+    max_tentativas: int = MAX_TENTATIVAS
+) -> Dict[str, int]:
+    """
+    Envia um lote de mensagens pendentes.
+
+    Args:
+        limite: Número máximo de mensagens processadas
+        enviar: Função de envio (mensagem, destino) -> id externo ou None em
+            caso de falha. Por padrão, o backend configurado em
+            settings.WHATSAPP_BACKEND, cujas exceções ficam em ultimo_erro.
+        max_tentativas: Tentativas antes de marcar a mensagem como "falhou"
+
+    Returns:
+        Contadores {"enviadas": n, "reagendadas": n, "falhas": n}
+    """
+    enviar = enviar or get_backend().enviar
+    resultado = {"enviadas": 0, "reagendadas": 0, "falhas": 0}
+
+    for notificacao in _reservar_lote(limite):
+        notificacao.tentativas += 1
+        try:
+            id_externo = enviar(notificacao.mensagem, notificacao.destino)
+            erro = "" if id_externo else "Envio não confirmado pelo provedor"
+        except Exception as e:
+            id_externo, erro = None, str(e)
+        _registrar_resultado(notificacao, id_externo, erro, max_tentativas, resultado)
+
+    return resultado
+
+
+async def aprocessar_lote(
+    limite: int = 50,
+    enviar: Optional[Callable[[str, str], Awaitable[Optional[str]]]] = None,
+    max_tentativas: int = MAX_TENTATIVAS,
+    concorrencia: int = 10
+) -> Dict[str, int]:
+    """
+    Versão assíncrona de processar_lote: envia até `concorrencia` mensagens
+    do lote ao mesmo tempo. A reserva e a gravação dos resultados são feitas
+    de uma vez, cada uma numa passagem para a thread de banco.
+
+    Args:
+        enviar: Corrotina de envio (mensagem, destino) -> id externo ou None.
+            Por padrão, aenviar() do backend configurado; quem chama deve
+            executar afechar() do backend ao terminar.
+
+    Returns:
+        Contadores {"enviadas": n, "reagendadas": n, "falhas": n}
+    """
+    enviar = enviar or get_backend().aenviar
+    resultado = {"enviadas": 0, "reagendadas": 0, "falhas": 0}
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def tentar(notificacao):
+        async with semaforo:
+            try:
+                id_externo = await enviar(notificacao.mensagem, notificacao.destino)
+                return id_externo, "" if id_externo else "Envio não confirmado pelo provedor"
+            except Exception as e:
+                return None, str(e)
+
+    notificacoes = await sync_to_async(_reservar_lote)(limite)
+    tentativas = await asyncio.gather(*(tentar(notificacao) for notificacao in notificacoes))
+
+    def registrar():
+        for notificacao, (id_externo, erro) in zip(notificacoes, tentativas):
+            notificacao.tentativas += 1
+            _registrar_resultado(notificacao, id_externo, erro, max_tentativas, resultado)
+
+    await sync_to_async(registrar)()
+    return resultado
@@ -0,0 +1,36 @@
+"""
+Utilitários para testes.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class OrcamentoConsultasMixin:
+    """
+    Mixin para TestCase com asserções de orçamento de consultas SQL.
+
+    Diferente de assertNumQueries, aceita qualquer número de consultas até o
+    máximo, de modo que o teste falha apenas em regressões (N+1) e não em
+    otimizações.
+
+    Exemplo:
+        with self.assertMaximoConsultas(4):
+            service.get_horarios_disponiveis(funcionario, servico, data)
+    """
+
+    @contextmanager
+    def assertMaximoConsultas(self, maximo, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as capturadas:
+            yield capturadas
+
+        executadas = len(capturadas)
+        if executadas > maximo:
+            consultas = "\n".join(
+                f"{i}. {consulta['sql']}"
+                for i, consulta in enumerate(capturadas.captured_queries, start=1)
+            )
+            self.fail(
+                f"{executadas} consultas executadas; o orçamento é de {maximo}.\n{consultas}"
+            )
@@ -1,3 +1,213 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .models import Notificacao
+from .notificacoes import (
+    ESPERA_INICIAL, ESPERA_MAXIMA, MAX_TENTATIVAS, aprocessar_lote, calcular_espera,
+    enfileirar_whatsapp, processar_lote
+)
+from .whatsapp import ArquivoBackend, ConsoleBackend, HttpBackend, MemoriaBackend, get_backend
+
+
+class FalhaBackend:
+    def enviar(self, mensagem, numero_destino):
+        raise RuntimeError("provedor indisponível")
+
+
+class EnvioLento:
+    """Envio assíncrono que registra quantas mensagens estão em andamento ao mesmo tempo."""
+
+    def __init__(self):
+        self.em_andamento = 0
+        self.maximo = 0
+
+    async def aenviar(self, mensagem, numero_destino):
+        self.em_andamento += 1
+        self.maximo = max(self.maximo, self.em_andamento)
+        await asyncio.sleep(0.01)
+        self.em_andamento -= 1
+        return f"lento-{numero_destino}"
+
+
+@override_settings(WHATSAPP_BACKEND="core.whatsapp.MemoriaBackend")
+class ProcessarNotificacoesTest(TestCase):
+
+    def setUp(self):
+        MemoriaBackend.caixa_saida.clear()
+
+    def test_envia_pelo_backend_configurado(self):
+        enfileirar_whatsapp("Olá!", "whatsapp:+5511999999999")
+
+        resultado = processar_lote()
+
+        self.assertEqual(resultado["enviadas"], 1)
+        self.assertEqual(
+            [(m["to"], m["body"]) for m in MemoriaBackend.caixa_saida],
+            [("whatsapp:+5511999999999", "Olá!")]
+        )
+        notificacao = Notificacao.objects.get()
+        self.assertEqual(notificacao.status, "enviada")
+        self.assertEqual(notificacao.id_externo, MemoriaBackend.caixa_saida[0]["id"])
+
+    def test_backend_criado_uma_unica_vez(self):
+        self.assertIs(get_backend(), get_backend())
+        self.assertIsInstance(get_backend(), MemoriaBackend)
+
+    @override_settings(WHATSAPP_BACKEND="core.tests.FalhaBackend")
+    def test_erro_do_backend_reagenda_mensagem(self):
+        enfileirar_whatsapp("Olá!", "whatsapp:+5511999999999")
+
+        resultado = processar_lote()
+
+        self.assertEqual(resultado["reagendadas"], 1)
+        notificacao = Notificacao.objects.get()
+        self.assertEqual(notificacao.status, "pendente")
+        self.assertEqual(notificacao.ultimo_erro, "provedor indisponível")
+
+    def test_espera_exponencial_limitada(self):
+        self.assertEqual(calcular_espera(1), ESPERA_INICIAL)
+        self.assertEqual(calcular_espera(2), ESPERA_INICIAL * 2)
+        self.assertEqual(calcular_espera(3), ESPERA_INICIAL * 4)
+        self.assertEqual(calcular_espera(20), ESPERA_MAXIMA)
+
+    @override_settings(WHATSAPP_BACKEND="core.tests.FalhaBackend")
+    def test_falhas_reagendam_com_espera_crescente_ate_falhou(self):
+        enfileirar_whatsapp("Olá!", "whatsapp:+5511999999999")
+
+        esperas = []
+        for tentativa in range(1, MAX_TENTATIVAS + 1):
+            if tentativa > 1:
+                # A mensagem reagendada só é processada após a espera
+                self.assertEqual(processar_lote(), {"enviadas": 0, "reagendadas": 0, "falhas": 0})
+            Notificacao.objects.update(proxima_tentativa=timezone.now() - timedelta(seconds=1))
+
+            antes = timezone.now()
+            resultado = processar_lote()
+            notificacao = Notificacao.objects.get()
+            self.assertEqual(notificacao.tentativas, tentativa)
+            self.assertEqual(notificacao.ultimo_erro, "provedor indisponível")
+            if tentativa < MAX_TENTATIVAS:
+                self.assertEqual(resultado["reagendadas"], 1)
+                self.assertEqual(notificacao.status, "pendente")
+                espera = notificacao.proxima_tentativa - antes
+                self.assertGreaterEqual(espera, calcular_espera(tentativa))
+                self.assertLess(espera, calcular_espera(tentativa) + timedelta(seconds=5))
+                esperas.append(espera)
+            else:
+                # Última tentativa: a mensagem não é mais reagendada
+                self.assertEqual(resultado["falhas"], 1)
+                self.assertEqual(notificacao.status, "falhou")
+        self.assertEqual(esperas, sorted(esperas))
+        self.assertEqual(processar_lote(), {"enviadas": 0, "reagendadas": 0, "falhas": 0})
+
+    def test_envio_assincrono_concorrente(self):
+        for i in range(6):
+            enfileirar_whatsapp(f"Olá {i}", f"whatsapp:+55119999999{i:02d}")
+        envio = EnvioLento()
+
+        resultado = async_to_sync(aprocessar_lote)(enviar=envio.aenviar, concorrencia=3)
+
+        self.assertEqual(resultado["enviadas"], 6)
+        self.assertEqual(envio.maximo, 3)
+        self.assertEqual(Notificacao.objects.filter(status="enviada", tentativas=1).count(), 6)
+
+    def test_envio_assincrono_pelo_backend_configurado(self):
+        enfileirar_whatsapp("Olá!", "whatsapp:+5511999999999")
+
+        resultado = async_to_sync(aprocessar_lote)()
+
+        self.assertEqual(resultado["enviadas"], 1)
+        self.assertEqual(Notificacao.objects.get().id_externo, MemoriaBackend.caixa_saida[0]["id"])
+
+
+class ServidorMensagens(BaseHTTPRequestHandler):
+    """
+    Servidor HTTP local para o HttpBackend: responde {"id": ...} com keep-alive,
+    500 para o destino "erro" e encerra a conexão, sem avisar, após
+    responder ao destino "fechar".
+    """
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        self.server.conexoes += 1
+        super().handle()
+
+    def do_POST(self):
+        dados = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.recebidas.append(dados)
+        status, corpo = (500, b"falha") if dados["to"] == "erro" else (200, json.dumps({"id": f"srv-{len(self.server.recebidas)}"}).encode())
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+        if dados["to"] == "fechar":
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class BackendsWhatsAppTest(SimpleTestCase):
+    """Backends de desenvolvimento e testes de carga."""
+
+    def test_console(self):
+        saida = io.StringIO()
+        id_mensagem = ConsoleBackend(stream=saida).enviar("Olá!", "whatsapp:+5511999999999")
+        self.assertTrue(id_mensagem.startswith("console-"))
+        self.assertEqual(saida.getvalue(), "[WhatsApp para whatsapp:+5511999999999] Olá!\n")
+
+    def test_arquivo_uma_linha_json_por_mensagem(self):
+        descritor, caminho = tempfile.mkstemp(suffix=".jsonl")
+        os.close(descritor)
+        self.addCleanup(os.remove, caminho)
+        backend = ArquivoBackend(caminho)
+        ids = [backend.enviar(f"Olá {i} ção", f"whatsapp:+55119999999{i:02d}") for i in range(2)]
+
+        with open(caminho, encoding="utf-8") as arquivo:
+            linhas = [json.loads(linha) for linha in arquivo]
+        self.assertEqual([linha["id"] for linha in linhas], ids)
+        self.assertEqual(linhas[1]["to"], "whatsapp:+5511999999901")
+        self.assertEqual(linhas[1]["body"], "Olá 1 ção")
+        self.assertIn("data", linhas[0])
+
+    def _servidor(self):
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), ServidorMensagens)
+        servidor.conexoes = 0
+        servidor.recebidas = []
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        return servidor, f"http://127.0.0.1:{servidor.server_address[1]}/mensagens"
+
+    def test_http_reutiliza_a_conexao_e_reconecta(self):
+        servidor, url = self._servidor()
+        backend = HttpBackend(url, timeout=5)
+
+        self.assertEqual(backend.enviar("Um", "whatsapp:+5511999999999"), "srv-1")
+        self.assertEqual(backend.enviar("Dois", "fechar"), "srv-2")
+        self.assertEqual(servidor.conexoes, 1)
+        # O servidor encerrou a conexão keep-alive: uma nova é aberta
+        self.assertEqual(backend.enviar("Três", "whatsapp:+5511999999999"), "srv-3")
+        self.assertEqual(servidor.conexoes, 2)
+        self.assertEqual(
+            servidor.recebidas[0], {"to": "whatsapp:+5511999999999", "body": "Um"}
+        )
+
+    def test_http_status_de_erro(self):
+        _, url = self._servidor()
+        backend = HttpBackend(url, timeout=5)
+        with self.assertRaisesMessage(RuntimeError, "Servidor HTTP respondeu 500"):
+            backend.enviar("Olá!", "erro")
+        # A conexão continua utilizável após a resposta de erro
+        self.assertEqual(backend.enviar("Olá!", "whatsapp:+5511999999999"), "srv-2")
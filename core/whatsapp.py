@@ -1,24 +1,238 @@
+"""
+Envio de mensagens via WhatsApp.
+
+O backend de envio é escolhido em settings.WHATSAPP_BACKEND (caminho da
+classe), no mesmo estilo do EMAIL_BACKEND do Django:
+
+- core.whatsapp.TwilioBackend: envio real pela API do Twilio
+- core.whatsapp.ConsoleBackend: escreve as mensagens na saída padrão
+- core.whatsapp.ArquivoBackend: acrescenta as mensagens (JSON por linha) em WHATSAPP_ARQUIVO
+- core.whatsapp.MemoriaBackend: guarda as mensagens em memória (testes)
+- core.whatsapp.HttpBackend: envia para um servidor HTTP local (WHATSAPP_HTTP_URL)
+
+O backend é criado apenas no primeiro envio e reutilizado pelo processo.
+
+Além de enviar(), cada backend oferece aenviar() para o processamento
+assíncrono da caixa de saída (ver core/notificacoes.aprocessar_lote): o
+TwilioBackend e o HttpBackend usam um cliente HTTP assíncrono com pool de
+conexões, aberto no primeiro envio e fechado por afechar(); os demais
+executam enviar() num pool de threads.
+"""
+import http.client
+import json
 import os
-from twilio.rest import Client
+import sys
+import threading
+import uuid
+from functools import lru_cache
+from urllib.parse import urlsplit
 
-TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
-TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
-TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
 
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+BACKEND_PADRAO = "core.whatsapp.TwilioBackend"
 
-def enviar_whatsapp(mensagem, numero_destino):
+
+class WhatsAppBackend:
     """
-    Envia uma mensagem via WhatsApp usando Twilio.
-    Exemplo de número: 'whatsapp:+5511987654321'
+    Interface dos backends de envio.
+    enviar() retorna o identificador da mensagem e lança exceção em caso de falha.
     """
-    try:
-        message = client.messages.create(
-            from_=TWILIO_WHATSAPP_NUMBER,
+
+    def enviar(self, mensagem, numero_destino):
+        raise NotImplementedError
+
+    async def aenviar(self, mensagem, numero_destino):
+        """Versão assíncrona de enviar(); por padrão, executa enviar() numa thread."""
+        return await sync_to_async(self.enviar, thread_sensitive=False)(mensagem, numero_destino)
+
+    async def afechar(self):
+        """Fecha os recursos assíncronos (sessões HTTP) abertos por aenviar()."""
+
+
+class TwilioBackend(WhatsAppBackend):
+    """
+    Envio pela API do Twilio.
+    O cliente (e a sessão HTTP que ele mantém) é criado no primeiro envio.
+    """
+
+    def __init__(self):
+        self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+        self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+        self.numero_origem = os.getenv("TWILIO_WHATSAPP_NUMBER")
+        self._client = None
+        self._client_async = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client
+                    self._client = Client(self.account_sid, self.auth_token)
+        return self._client
+
+    def enviar(self, mensagem, numero_destino):
+        message = self.client.messages.create(
+            from_=self.numero_origem,
+            body=mensagem,
+            to=numero_destino
+        )
+        return message.sid
+
+    async def aenviar(self, mensagem, numero_destino):
+        if self._client_async is None:
+            from twilio.http.async_http_client import AsyncTwilioHttpClient
+            from twilio.rest import Client
+            self._client_async = Client(
+                self.account_sid, self.auth_token, http_client=AsyncTwilioHttpClient()
+            )
+        message = await self._client_async.messages.create_async(
+            from_=self.numero_origem,
             body=mensagem,
             to=numero_destino
         )
         return message.sid
-    except Exception as e:
-        print("Erro ao enviar WhatsApp:", e)
-        return None
+
+    async def afechar(self):
+        if self._client_async is not None:
+            await self._client_async.http_client.close()
+            self._client_async = None
+
+
+class ConsoleBackend(WhatsAppBackend):
+    """Escreve as mensagens na saída padrão (desenvolvimento)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def enviar(self, mensagem, numero_destino):
+        id_mensagem = f"console-{uuid.uuid4().hex}"
+        with self._lock:
+            self.stream.write(f"[WhatsApp para {numero_destino}] {mensagem}\n")
+            self.stream.flush()
+        return id_mensagem
+
+
+class ArquivoBackend(WhatsAppBackend):
+    """Acrescenta cada mensagem, como uma linha JSON, ao arquivo WHATSAPP_ARQUIVO."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or getattr(settings, "WHATSAPP_ARQUIVO", "whatsapp.jsonl")
+        self._lock = threading.Lock()
+
+    def enviar(self, mensagem, numero_destino):
+        id_mensagem = f"arquivo-{uuid.uuid4().hex}"
+        linha = json.dumps({
+            "id": id_mensagem,
+            "to": numero_destino,
+            "body": mensagem,
+            "data": timezone.now().isoformat(),
+        }, ensure_ascii=False)
+        with self._lock, open(self.caminho, "a", encoding="utf-8") as arquivo:
+            arquivo.write(linha + "\n")
+        return id_mensagem
+
+
+class MemoriaBackend(WhatsAppBackend):
+    """
+    Guarda as mensagens em MemoriaBackend.caixa_saida (testes).
+    Cada item é um dicionário com "id", "to" e "body".
+    """
+    caixa_saida = []
+
+    def enviar(self, mensagem, numero_destino):
+        id_mensagem = f"memoria-{len(self.caixa_saida) + 1}"
+        self.caixa_saida.append({"id": id_mensagem, "to": numero_destino, "body": mensagem})
+        return id_mensagem
+
+
+class HttpBackend(WhatsAppBackend):
+    """
+    Envia as mensagens por POST (JSON {"to", "body"}) para WHATSAPP_HTTP_URL.
+    Útil com um servidor local de testes de carga. Cada thread reutiliza a
+    sua conexão HTTP (keep-alive); aenviar() usa uma sessão aiohttp com até
+    WHATSAPP_HTTP_CONEXOES conexões.
+    """
+
+    def __init__(self, url=None, timeout=None):
+        url = url or getattr(settings, "WHATSAPP_HTTP_URL", "http://127.0.0.1:8025/mensagens")
+        partes = urlsplit(url)
+        self.https = partes.scheme == "https"
+        self.host = partes.netloc
+        self.caminho = partes.path or "/"
+        self.url = url
+        self.timeout = timeout or getattr(settings, "WHATSAPP_HTTP_TIMEOUT", 10)
+        self.conexoes = getattr(settings, "WHATSAPP_HTTP_CONEXOES", 20)
+        self._local = threading.local()
+        self._sessao = None
+
+    def _get_conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            classe = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conexao = classe(self.host, timeout=self.timeout)
+            self._local.conexao = conexao
+        return conexao
+
+    def _post(self, corpo):
+        conexao = self._get_conexao()
+        conexao.request("POST", self.caminho, body=corpo, headers={"Content-Type": "application/json"})
+        resposta = conexao.getresponse()
+        return resposta.status, resposta.read()
+
+    def enviar(self, mensagem, numero_destino):
+        corpo = json.dumps({"to": numero_destino, "body": mensagem}).encode("utf-8")
+        try:
+            status, conteudo = self._post(corpo)
+        except (http.client.HTTPException, ConnectionError):
+            # Conexão keep-alive encerrada pelo servidor: reconectar uma vez
+            self._local.conexao.close()
+            self._local.conexao = None
+            status, conteudo = self._post(corpo)
+
+        return self._ler_resposta(status, conteudo)
+
+    def _ler_resposta(self, status, conteudo):
+        if status >= 400:
+            raise RuntimeError(f"Servidor HTTP respondeu {status}: {conteudo[:200]!r}")
+        try:
+            return json.loads(conteudo).get("id") or f"http-{uuid.uuid4().hex}"
+        except ValueError:
+            return f"http-{uuid.uuid4().hex}"
+
+    async def aenviar(self, mensagem, numero_destino):
+        if self._sessao is None:
+            import aiohttp
+            self._sessao = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.conexoes),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        async with self._sessao.post(self.url, json={"to": numero_destino, "body": mensagem}) as resposta:
+            return self._ler_resposta(resposta.status, await resposta.read())
+
+    async def afechar(self):
+        if self._sessao is not None:
+            await self._sessao.close()
+            self._sessao = None
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """Retorna a instância (única por processo) do backend configurado."""
+    caminho = getattr(settings, "WHATSAPP_BACKEND", BACKEND_PADRAO)
+    return import_string(caminho)()
+
+
+@receiver(setting_changed)
+def _recarregar_backend(setting, **kwargs):
+    # Permite trocar o backend com override_settings nos testes
+    if setting.startswith("WHATSAPP_"):
+        get_backend.cache_clear()
+
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Funcionario, DisponibilidadeFuncionario
+from .models import Funcionario, DisponibilidadeFuncionario, RegraDisponibilidade
 
 @admin.register(Funcionario)
 class FuncionarioAdmin(admin.ModelAdmin):
@@ -14,3 +14,10 @@ class DisponibilidadeFuncionarioAdmin(admin.ModelAdmin):
     list_filter = ["funcionario", "data", "tipo"]
     search_fields = ["funcionario__nome"]
     raw_id_fields = ["funcionario"]
+
+@admin.register(RegraDisponibilidade)
+class RegraDisponibilidadeAdmin(admin.ModelAdmin):
+    list_display = ["funcionario", "dia_semana", "horario_inicio", "horario_fim", "tipo", "valido_de", "valido_ate"]
+    list_filter = ["funcionario", "dia_semana", "tipo"]
+    search_fields = ["funcionario__nome"]
+    raw_id_fields = ["funcionario"]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funcionarios', '0002_alter_funcionario_unique_together_funcionario_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegraDisponibilidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Segunda-feira'), (1, 'Terça-feira'), (2, 'Quarta-feira'), (3, 'Quinta-feira'), (4, 'Sexta-feira'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Dia da Semana')),
+                ('horario_inicio', models.TimeField(verbose_name='Horário de Início')),
+                ('horario_fim', models.TimeField(verbose_name='Horário de Fim')),
+                ('tipo', models.CharField(choices=[('trabalho', 'Trabalho'), ('almoco', 'Almoço'), ('pausa', 'Pausa'), ('folga', 'Folga'), ('outro', 'Outro')], default='trabalho', max_length=20, verbose_name='Tipo')),
+                ('valido_de', models.DateField(blank=True, help_text='Primeiro dia em que a regra vale (vazio = sem início)', null=True, verbose_name='Válido De')),
+                ('valido_ate', models.DateField(blank=True, help_text='Último dia em que a regra vale (vazio = sem fim)', null=True, verbose_name='Válido Até')),
+                ('observacao', models.TextField(blank=True, verbose_name='Observação')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regras_disponibilidade', to='funcionarios.funcionario', verbose_name='Funcionário')),
+            ],
+            options={
+                'verbose_name': 'Regra de Disponibilidade',
+                'verbose_name_plural': 'Regras de Disponibilidade',
+                'ordering': ['funcionario', 'dia_semana', 'horario_inicio'],
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
 from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import datetime, time, timedelta
 from core.models import Empresa
 
 
@@ -63,12 +67,41 @@ class Funcionario(models.Model):
     def get_agendamentos_periodo(self, data_inicio, data_fim):
         """Retorna agendamentos do funcionário para um período"""
         from agendamentos.models import Agendamento
+        # Intervalo de datetimes (e não __date) para permitir o uso de índices
+        inicio = timezone.make_aware(datetime.combine(data_inicio, time.min))
+        fim = timezone.make_aware(datetime.combine(data_fim + timedelta(days=1), time.min))
         return Agendamento.objects.filter(
             funcionario=self,
-            data_hora_inicio__date__range=[data_inicio, data_fim],
-            status__in=['confirmado', 'em_andamento']
+            data_hora_inicio__gte=inicio,
+            data_hora_inicio__lt=fim,
+            status__in=Agendamento.STATUS_OCUPAM_AGENDA
         ).order_by('data_hora_inicio')
 
+    def get_resumo_por_dia(self, data_inicio, data_fim):
+        """
+        Retorna os totais de cada dia do período que possui agendamentos,
+        calculados pelo banco em uma única consulta.
+
+        Cada item é um dicionário com "dia", "agendamentos" e "receita"
+        (sem cancelados e faltas), "cancelados" e "duracao" (timedelta reservado).
+        """
+        from agendamentos.models import Agendamento
+        inicio = timezone.make_aware(datetime.combine(data_inicio, time.min))
+        fim = timezone.make_aware(datetime.combine(data_fim + timedelta(days=1), time.min))
+        validos = ~Q(status__in=['cancelado', 'nao_compareceu'])
+        return Agendamento.objects.filter(
+            funcionario=self,
+            data_hora_inicio__gte=inicio,
+            data_hora_inicio__lt=fim
+        ).annotate(
+            dia=TruncDate('data_hora_inicio')
+        ).values('dia').annotate(
+            agendamentos=Count('id', filter=validos),
+            cancelados=Count('id', filter=Q(status='cancelado')),
+            duracao=Sum(F('data_hora_fim') - F('data_hora_inicio'), filter=validos),
+            receita=Sum('preco_cobrado', filter=validos)
+        ).order_by('dia')
+
 
 class DisponibilidadeFuncionario(models.Model):
     """
@@ -124,3 +157,82 @@ class DisponibilidadeFuncionario(models.Model):
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
+
+
+class RegraDisponibilidade(models.Model):
+    """
+    Regra semanal de disponibilidade do funcionário (ex: toda terça, das 9h
+    às 18h; almoço de segunda a sexta, das 12h às 13h).
+
+    As regras são expandidas em memória para cada data consultada, sem gravar
+    uma linha por dia. As DisponibilidadeFuncionario de uma data funcionam como
+    exceções: períodos de trabalho na data substituem todas as regras do dia;
+    bloqueios na data (almoço, pausa, folga...) somam-se aos das regras.
+    """
+    DIA_SEMANA_CHOICES = [
+        (0, 'Segunda-feira'),
+        (1, 'Terça-feira'),
+        (2, 'Quarta-feira'),
+        (3, 'Quinta-feira'),
+        (4, 'Sexta-feira'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+
+    funcionario = models.ForeignKey(
+        Funcionario,
+        on_delete=models.CASCADE,
+        related_name='regras_disponibilidade',
+        verbose_name="Funcionário"
+    )
+    dia_semana = models.PositiveSmallIntegerField(
+        choices=DIA_SEMANA_CHOICES,
+        verbose_name="Dia da Semana"
+    )
+    horario_inicio = models.TimeField(verbose_name="Horário de Início")
+    horario_fim = models.TimeField(verbose_name="Horário de Fim")
+    tipo = models.CharField(
+        max_length=20,
+        choices=DisponibilidadeFuncionario.TIPO_CHOICES,
+        default='trabalho',
+        verbose_name="Tipo"
+    )
+    valido_de = models.DateField(
+        blank=True,
+        null=True,
+        verbose_name="Válido De",
+        help_text="Primeiro dia em que a regra vale (vazio = sem início)"
+    )
+    valido_ate = models.DateField(
+        blank=True,
+        null=True,
+        verbose_name="Válido Até",
+        help_text="Último dia em que a regra vale (vazio = sem fim)"
+    )
+    observacao = models.TextField(blank=True, verbose_name="Observação")
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
+
+    class Meta:
+        verbose_name = "Regra de Disponibilidade"
+        verbose_name_plural = "Regras de Disponibilidade"
+        ordering = ['funcionario', 'dia_semana', 'horario_inicio']
+
+    def __str__(self):
+        return (
+            f"{self.funcionario.nome} - {self.get_dia_semana_display()} "
+            f"({self.horario_inicio}-{self.horario_fim}) - {self.get_tipo_display()}"
+        )
+
+    def clean(self):
+        """Validação personalizada"""
+        from django.core.exceptions import ValidationError
+
+        if self.horario_inicio >= self.horario_fim:
+            raise ValidationError("Horário de início deve ser anterior ao horário de fim.")
+        if self.valido_de and self.valido_ate and self.valido_de > self.valido_ate:
+            raise ValidationError("O início da validade deve ser anterior ao fim.")
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        super().save(*args, **kwargs)
+